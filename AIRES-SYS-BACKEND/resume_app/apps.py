@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class ResumeAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'resume_app'
+
+    def ready(self):
+        from django.conf import settings
+        from django.core.signals import request_started
+
+        if getattr(settings, 'JOB_WORKERS_IN_PROCESS', True):
+            from .jobs import START_WORKERS_UID, start_in_process_workers
+            request_started.connect(start_in_process_workers, dispatch_uid=START_WORKERS_UID)
@@ -0,0 +1,204 @@
+"""
+Async versions of the LLM-bound endpoints, for ASGI deployments.
+
+They accept the same requests and return the same JSON as their synchronous
+counterparts in views.py, but await the inference call on the event loop
+instead of blocking a thread on it, so a single ASGI worker can keep hundreds
+of inference requests in flight. Served under /api/async/...; run with an
+ASGI server, e.g.
+
+    uvicorn smart_resume_scanner.asgi:application
+"""
+import json
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import Throttled, ValidationError
+
+from .inference import run_async
+from .pdf_extraction import PDFExtractionError
+from .serializers import parse_fields
+from .services import arun_analysis, arun_chat, arun_revision, arun_rewrite
+from .throttling import InferenceRateThrottle, Overloaded, async_admission
+from .uploads import PDFUploadHandler, UploadRejected
+from .views import ResumeValidator
+
+
+class InvalidToken(Exception):
+    pass
+
+
+async def authenticate(request):
+    """
+    Resolves the caller like DRF's TokenAuthentication / SessionAuthentication
+    do for the synchronous views. Returns the user, or None for anonymous
+    requests; raises InvalidToken for an unknown or inactive token.
+    """
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Token '):
+        try:
+            token = await Token.objects.select_related('user').aget(key=header[len('Token '):].strip())
+        except Token.DoesNotExist:
+            raise InvalidToken()
+        if not token.user.is_active:
+            raise InvalidToken()
+        return token.user
+
+    user = await request.auser()
+    return user if user.is_authenticated else None
+
+
+def request_data(request):
+    # JSON bodies like DRF's JSONParser, everything else as form data.
+    if request.content_type == 'application/json':
+        return json.loads(request.body or b'{}')
+    return request.POST
+
+
+def async_api_view(view=None, *, pdf_upload=False):
+    """
+    Wraps an async view taking (request, data, user): POST only, CSRF exempt
+    like DRF's APIView, with the parsed body and authenticated user passed in.
+    The body is parsed in a worker thread. With pdf_upload, uploads go
+    through PDFUploadHandler, as in the synchronous upload views.
+    """
+    if view is None:
+        return lambda view: async_api_view(view, pdf_upload=pdf_upload)
+
+    @csrf_exempt
+    @require_POST
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if pdf_upload:
+            request.upload_handlers = [PDFUploadHandler(request)]
+        try:
+            data = await sync_to_async(request_data)(request)
+        except UploadRejected as e:
+            return JsonResponse(e.detail, status=e.status_code)
+        except ValueError as e:
+            return JsonResponse({"detail": f"JSON parse error - {e}"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            user = await authenticate(request)
+        except InvalidToken:
+            return JsonResponse({"detail": "Invalid token."}, status=status.HTTP_401_UNAUTHORIZED)
+        return await view(request, data, user, *args, **kwargs)
+    return wrapper
+
+
+def too_many_requests(detail, wait):
+    response = JsonResponse({"detail": detail}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+    response['Retry-After'] = '%d' % wait
+    return response
+
+
+def inference_limited(view):
+    """
+    Applies InferenceRateThrottle and runs the view in a slot of
+    async_admission, answering 429 with Retry-After like the synchronous
+    views.
+    """
+    @wraps(view)
+    async def wrapper(request, data, user, *args, **kwargs):
+        throttle = InferenceRateThrottle()
+        if not throttle.check(request, user):
+            error = Throttled(throttle.wait())
+            return too_many_requests(error.detail, error.wait)
+        try:
+            async with async_admission.aslot():
+                return await view(request, data, user, *args, **kwargs)
+        except Overloaded as e:
+            return too_many_requests(e.detail, e.wait)
+    return wrapper
+
+
+@async_api_view(pdf_upload=True)
+async def validate_resume(request, data, user):
+    file = request.FILES.get('file')
+    if not file:
+        return JsonResponse({"error": "No file uploaded"}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Make sure it's a PDF
+    if not file.name.lower().endswith('.pdf'):
+        return JsonResponse({"error": "File must be a PDF"}, status=status.HTTP_400_BAD_REQUEST)
+
+    validator = ResumeValidator()
+
+    try:
+        pages, is_valid, results = await run_async(validator.validate_flow(file, materialize=False))
+
+        return JsonResponse({
+            'is_resume': is_valid,
+            'confidence': results.get('confidence', 0),
+            'top_label': results.get('top_label', ''),
+            'details': results
+        })
+    except PDFExtractionError as e:
+        return JsonResponse({"error": "Error processing PDF", "details": str(e)},
+                            status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return JsonResponse(
+            {"error": "Error validating document", "details": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@async_api_view
+@inference_limited
+async def analyze_resume(request, data, user):
+    resume_id = data.get("resume_id")
+    if not resume_id:
+        return JsonResponse({"error": "No resume_id provided"}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        fields = parse_fields(request.GET.get("fields"))
+    except ValidationError as e:
+        return JsonResponse(e.detail, status=status.HTTP_400_BAD_REQUEST)
+    result, status_code = await arun_analysis(resume_id, fields)
+    return JsonResponse(result, status=status_code)
+
+
+@async_api_view
+@inference_limited
+async def chat(request, data, user):
+    resume_id = data.get("resume_id")
+    message = data.get("message")
+
+    if not resume_id or not message:
+        return JsonResponse({"error": "Missing resume_id or message"}, status=status.HTTP_400_BAD_REQUEST)
+
+    result, status_code = await arun_chat(resume_id, message, user)
+    return JsonResponse(result, status=status_code)
+
+
+@async_api_view
+@inference_limited
+async def rewrite_resume(request, data, user):
+    resume_id = data.get('resume_id')
+    if not resume_id:
+        return JsonResponse({'error': 'Resume ID not provided'}, status=status.HTTP_400_BAD_REQUEST)
+
+    result, status_code = await arun_rewrite(resume_id)
+    return JsonResponse(result, status=status_code)
+
+
+@async_api_view
+@inference_limited
+async def revise_resume(request, data, user):
+    resume_id = data.get('resume_id')
+    feedback = data.get('feedback')
+
+    if not resume_id:
+        return JsonResponse({'error': 'Resume ID not provided'}, status=status.HTTP_400_BAD_REQUEST)
+
+    if not feedback:
+        return JsonResponse({'error': 'Feedback not provided'}, status=status.HTTP_400_BAD_REQUEST)
+
+    result, status_code = await arun_revision(
+        resume_id, feedback, data.get('current_version'), data.get('version')
+    )
+    return JsonResponse(result, status=status_code)
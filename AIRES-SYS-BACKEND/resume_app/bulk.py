@@ -0,0 +1,272 @@
+"""
+Batch upload of many resumes in one request (BulkUploadView).
+
+Files arrive as zip archives and/or several multipart files. Each document is
+extracted whole by one worker of the PDF process pool, classified on a
+bounded thread pool (most documents are decided by the local classifier; the
+rest wait on the remote model), and accepted resumes are inserted with
+bulk_create. A result is produced for every file as soon as it is known.
+"""
+import hashlib
+import os
+import time
+import zipfile
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+
+from .caching import extraction_cache
+from .log import get_logger
+from .models import Resume
+from .pdf_extraction import (
+    PDFExtractionError, join_pages, started_extractions, stop_extractions, submit_extraction,
+)
+from .throttling import Overloaded
+
+logger = get_logger('pdf')
+
+
+class BulkUploadError(Exception):
+    """Raised when a batch as a whole is rejected (too many files or bytes)."""
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def collect_files(uploads):
+    """
+    Returns one dict per document: {'file': name, 'data': bytes}, or
+    {'file': name, 'error': message} for a file that cannot be processed.
+    Zip archives are expanded to the PDFs they contain; sizes are checked
+    from the archive directory before anything is decompressed.
+    """
+    max_files = _setting('BULK_UPLOAD_MAX_FILES', 1000)
+    max_file_bytes = _setting('BULK_UPLOAD_MAX_FILE_BYTES', 10 * 1024 * 1024)
+    max_bytes = _setting('BULK_UPLOAD_MAX_BYTES', 256 * 1024 * 1024)
+    files = []
+    total = 0
+
+    def add(name, size, read):
+        nonlocal total
+        if len(files) >= max_files:
+            raise BulkUploadError(f"A batch may contain at most {max_files} files.")
+        if not name.lower().endswith('.pdf'):
+            files.append({'file': name, 'error': "File must be a PDF"})
+        elif size > max_file_bytes:
+            files.append({'file': name, 'error': f"File is larger than {max_file_bytes} bytes"})
+        else:
+            total += size
+            if total > max_bytes:
+                raise BulkUploadError(f"A batch may contain at most {max_bytes} bytes.")
+            try:
+                files.append({'file': name, 'data': read()})
+            except (zipfile.BadZipFile, zlib.error, EOFError, RuntimeError, NotImplementedError) as e:
+                # A corrupt (bad CRC, truncated), encrypted or unsupported
+                # archive member fails alone, not the whole batch.
+                total -= size
+                files.append({'file': name, 'error': f"Could not read it from the archive: {e}"})
+
+    for upload in uploads:
+        if not upload.name.lower().endswith('.zip'):
+            add(upload.name, upload.size, upload.read)
+            continue
+        try:
+            archive = zipfile.ZipFile(upload)
+        except zipfile.BadZipFile:
+            files.append({'file': upload.name, 'error': "Not a valid zip archive"})
+            continue
+        with archive:
+            for info in archive.infolist():
+                if info.is_dir() or info.filename.startswith('__MACOSX/'):
+                    continue
+                add(info.filename, info.file_size, lambda info=info: archive.read(info))
+    return files
+
+
+def process_batch(files, classify, user=None):
+    """
+    Extracts, classifies and stores a batch from collect_files(). `classify`
+    takes a document's text and returns (is_valid, results) like
+    ResumeValidator.is_resume(). Yields one result dict per file, in
+    completion order, then a final {'summary': ...}.
+
+    A document gets PDF_EXTRACTION_TIME_BUDGET seconds from the moment a
+    worker picks it up. One still running after that, e.g. hung on a page in
+    PyPDF2, is reported as an error and its worker is stopped by recycling
+    the pool; the batch's other documents in flight are submitted again.
+    """
+    started = time.monotonic()
+    create_batch_size = _setting('BULK_CREATE_BATCH_SIZE', 50)
+    time_budget = _setting('PDF_EXTRACTION_TIME_BUDGET', 20)
+    counts = {'created': 0, 'rejected': 0, 'error': 0}
+    to_create = []
+    # Extraction cache entries for the batch, written together on flush.
+    to_cache = {}
+
+    def done(result):
+        counts[result['status']] += 1
+        return result
+
+    def flush():
+        extraction_cache.store_many(to_cache)
+        to_cache.clear()
+        Resume.bulk_create_with_content([resume for resume, _ in to_create])
+        for resume, result in to_create:
+            result['resume_id'] = resume.pk
+            yield done(result)
+        to_create.clear()
+
+    def flush_full():
+        # Inserts once a batch is complete, so no bulk_create() is larger.
+        if max(len(to_create), len(to_cache)) >= create_batch_size:
+            yield from flush()
+
+    extracting = {}
+    # Extraction future -> deadline, set once a worker is seen to pick it up.
+    deadlines = {}
+    classifying = {}
+    classifier_pool = ThreadPoolExecutor(
+        max_workers=_setting('BULK_CLASSIFY_CONCURRENCY', 8), thread_name_prefix='bulk-classify'
+    )
+
+    def start_extraction(item):
+        extracting[submit_extraction(item['data'])] = item
+
+    def expire_extractions():
+        now = time.monotonic()
+        for future in started_extractions(extracting):
+            deadlines.setdefault(future, now + time_budget)
+        expired = [future for future, deadline in deadlines.items() if deadline <= now and not future.done()]
+        for future in expired:
+            del deadlines[future]
+            item = extracting.pop(future)
+            yield done({'file': item['file'], 'status': 'error',
+                        'error': f"PDF text extraction exceeded the {time_budget}s time budget."})
+        if expired and stop_extractions(expired):
+            for future, item in list(extracting.items()):
+                if not future.done():
+                    future.cancel()
+                    del extracting[future]
+                    deadlines.pop(future, None)
+                    start_extraction(item)
+
+    def start_classification(item, pages):
+        item['pages'] = pages
+        classifying[classifier_pool.submit(classify, join_pages(pages))] = item
+
+    def finish(item, is_valid, results):
+        if "is_resume" in results:
+            to_cache[item['digest']] = (item['pages'], results)
+        else:
+            # Failed classifications are not cached so the next attempt retries.
+            to_cache[item['digest']] = (item['pages'], None)
+            return done({'file': item['file'], 'status': 'error',
+                         'error': "Classification failed", 'details': results.get('details')})
+        summary = {
+            'file': item['file'],
+            'is_resume': is_valid,
+            'confidence': results.get('confidence', 0),
+            'top_label': results.get('top_label', ''),
+        }
+        if not is_valid:
+            return done({**summary, 'status': 'rejected'})
+        resume = Resume(
+            file=ContentFile(item['data'], name=os.path.basename(item['file'])),
+            text=join_pages(item['pages']),
+            pages=item['pages'],
+            user=user,
+        )
+        to_create.append((resume, {**summary, 'status': 'created'}))
+        return None
+
+    try:
+        # Identical bytes reuse earlier extraction and classification.
+        for item in files:
+            if 'data' in item:
+                item['digest'] = hashlib.sha256(item['data']).hexdigest()
+        cache_hits = extraction_cache.get_many([item['digest'] for item in files if 'digest' in item])
+
+        for item in files:
+            if 'error' in item:
+                yield done({'file': item['file'], 'status': 'error', 'error': item['error']})
+                continue
+            cached = cache_hits.get(item['digest'])
+            if cached and cached['pages'] is not None and cached['classification'] is not None:
+                item['pages'] = cached['pages']
+                result = finish(item, cached['classification']['is_resume'], cached['classification'])
+                if result is not None:
+                    yield result
+                yield from flush_full()
+            elif cached and cached['pages'] is not None:
+                start_classification(item, cached['pages'])
+            else:
+                start_extraction(item)
+
+        while extracting or classifying:
+            yield from expire_extractions()
+            if not (extracting or classifying):
+                break
+            # Wake up for the next deadline, and to notice documents a worker
+            # has just picked up.
+            timeout = None
+            if extracting:
+                now = time.monotonic()
+                timeout = max(0.0, min([1.0] + [deadline - now for deadline in deadlines.values()]))
+            finished, _ = wait(list(extracting) + list(classifying), timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in finished:
+                yield from flush_full()
+                if future in extracting:
+                    item = extracting.pop(future)
+                    deadlines.pop(future, None)
+                    try:
+                        start_classification(item, future.result())
+                    except BrokenProcessPool:
+                        # The pool was recycled under this document, by
+                        # another batch or request; it gets one more try.
+                        if not item.get('retried'):
+                            item['retried'] = True
+                            start_extraction(item)
+                        else:
+                            yield done({'file': item['file'], 'status': 'error',
+                                        'error': "Could not read the PDF file: its worker stopped."})
+                    except PDFExtractionError as e:
+                        yield done({'file': item['file'], 'status': 'error', 'error': str(e)})
+                    except Exception as e:
+                        yield done({'file': item['file'], 'status': 'error',
+                                    'error': f"Could not read the PDF file: {e}"})
+                else:
+                    item = classifying.pop(future)
+                    try:
+                        is_valid, results = future.result()
+                    except Overloaded as e:
+                        # Turned away by admission control; the client may retry the file.
+                        yield done({'file': item['file'], 'status': 'error', 'error': str(e.detail)})
+                        continue
+                    except Exception as e:
+                        logger.exception("Classification of %s failed", item['file'])
+                        yield done({'file': item['file'], 'status': 'error', 'error': str(e)})
+                        continue
+                    result = finish(item, is_valid, results)
+                    if result is not None:
+                        yield result
+            yield from flush_full()
+        # Whatever is left once nothing is in flight.
+        if to_create or to_cache:
+            yield from flush()
+    finally:
+        for future in extracting:
+            future.cancel()
+        classifier_pool.shutdown(wait=False, cancel_futures=True)
+
+    elapsed = time.monotonic() - started
+    total = sum(counts.values())
+    yield {'summary': {
+        'files': total,
+        **counts,
+        'seconds': round(elapsed, 3),
+        'files_per_second': round(total / elapsed, 1) if elapsed else None,
+    }}
@@ -0,0 +1,306 @@
+import hashlib
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .pdf_extraction import join_pages
+
+
+def file_digest(file):
+    """
+    Returns the SHA-256 hex digest of an uploaded file's bytes.
+    The file is rewound afterwards so it can be read again. Files streamed
+    in by PDFUploadHandler were hashed on the way and are not read again.
+    """
+    if getattr(file, 'sha256', None):
+        return file.sha256
+    hasher = hashlib.sha256()
+    file.seek(0)
+    for chunk in file.chunks():
+        hasher.update(chunk)
+    file.seek(0)
+    return hasher.hexdigest()
+
+
+class LRUCache:
+    """
+    Thread-safe in-memory LRU cache bounded by the total size of its values.
+    `sizeof` returns the cost of a value; the least recently used entries are
+    evicted until the total fits in `max_size`. With `ttl` (seconds), entries
+    also expire that long after they were stored; set() can give an entry a
+    shorter lifetime of its own.
+    """
+
+    def __init__(self, max_size, sizeof=len, ttl=None):
+        self.max_size = max_size
+        self.sizeof = sizeof
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            value, size, expires_at = self._entries[key]
+            if expires_at is not None and time.monotonic() >= expires_at:
+                del self._entries[key]
+                self._size -= size
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        size = self.sizeof(value)
+        ttl = ttl if ttl is not None else self.ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            if key in self._entries:
+                self._size -= self._entries.pop(key)[1]
+            if size > self.max_size:
+                # Never let one oversized value flush the whole cache.
+                return
+            self._entries[key] = (value, size, expires_at)
+            self._size += size
+            while self._size > self.max_size:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._size -= self._entries.pop(key)[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'size': self._size,
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _document_size(entry):
+    # The text and its per-page copy dominate the footprint of a document.
+    return 2 * len(entry.get('text') or '') + 256
+
+
+class ExtractionCache:
+    """
+    Two-tier cache of extracted resume text and classification results,
+    keyed by the SHA-256 of the uploaded file. The memory tier is per process;
+    the ExtractedDocument table is shared by every worker and survives restarts.
+    """
+
+    def __init__(self, max_bytes):
+        self._memory = LRUCache(max_bytes, sizeof=_document_size)
+        self.db_hits = 0
+        self.misses = 0
+
+    def get(self, digest):
+        """
+        Returns a dict with 'text', 'pages' and 'classification' keys, or None
+        on a miss. 'pages' and 'text' are None when only a prefix of the
+        document was parsed for classification.
+        """
+        entry = self._memory.get(digest)
+        if entry is not None:
+            return entry
+
+        from .models import ExtractedDocument
+        document = ExtractedDocument.objects.filter(sha256=digest).first()
+        if document is None:
+            self.misses += 1
+            return None
+        self.db_hits += 1
+        return self._remember(document)
+
+    def get_many(self, digests):
+        """Like get() for many files at once; returns {digest: entry} for the hits only."""
+        from .models import ExtractedDocument
+        entries = {}
+        missing = []
+        for digest in digests:
+            entry = self._memory.get(digest)
+            if entry is not None:
+                entries[digest] = entry
+            else:
+                missing.append(digest)
+        if missing:
+            for document in ExtractedDocument.objects.filter(sha256__in=missing):
+                entries[document.sha256] = self._remember(document)
+            self.db_hits += len(entries) - (len(digests) - len(missing))
+            self.misses += len(digests) - len(entries)
+        return entries
+
+    def _remember(self, document):
+        entry = {
+            'text': document.text if document.pages else None,
+            'pages': document.pages or None,
+            'classification': document.classification,
+        }
+        self._memory.set(document.sha256, entry)
+        return entry
+
+    def _store_memory(self, digest, pages, classification):
+        entry = {
+            'text': join_pages(pages) if pages is not None else None,
+            'pages': pages,
+            'classification': classification,
+        }
+        self._memory.set(digest, entry)
+        return entry
+
+    def store(self, digest, pages, classification=None):
+        from .models import ExtractedDocument
+        entry = self._store_memory(digest, pages, classification)
+        ExtractedDocument.objects.update_or_create(
+            sha256=digest,
+            defaults={'text': entry['text'] or '', 'pages': pages, 'classification': classification},
+        )
+        return entry
+
+    def store_many(self, items):
+        """Like store() for many files, in one upsert. `items` maps digest -> (pages, classification)."""
+        from .models import ExtractedDocument
+        documents = []
+        for digest, (pages, classification) in items.items():
+            entry = self._store_memory(digest, pages, classification)
+            documents.append(ExtractedDocument(
+                sha256=digest, text=entry['text'] or '', pages=pages, classification=classification,
+            ))
+        ExtractedDocument.objects.bulk_create(
+            documents, update_conflicts=True, unique_fields=['sha256'],
+            update_fields=['text', 'pages', 'classification', 'updated_at'],
+        )
+
+    def prune(self, max_age, dry_run=False):
+        """
+        Deletes the stored documents not written for `max_age` seconds;
+        returns how many there were. Resumes keep their own copy of the
+        text, so a pruned file is only extracted again if uploaded again.
+        """
+        from .models import ExtractedDocument
+        stale = ExtractedDocument.objects.filter(updated_at__lt=timezone.now() - timedelta(seconds=max_age))
+        if dry_run:
+            return stale.count()
+        return stale.delete()[0]
+
+    def stats(self):
+        return {'memory': self._memory.stats(), 'db_hits': self.db_hits, 'misses': self.misses}
+
+
+extraction_cache = ExtractionCache(
+    getattr(settings, 'EXTRACTION_CACHE_MAX_BYTES', 32 * 1024 * 1024)
+)
+
+
+def normalized_text_hash(text):
+    """
+    SHA-256 of resume text after Unicode (NFKC) and whitespace normalization,
+    so the same CV extracted with different spacing maps to one key.
+    """
+    normalized = " ".join(unicodedata.normalize('NFKC', text).split())
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+class AnalysisCache:
+    """
+    Cache of generated analyses keyed by (normalized text hash, prompt version,
+    model id), so re-clicking Analyze, or analyzing the same CV uploaded under
+    another Resume row, skips the LLM call. Entries expire after `ttl` seconds;
+    the memory tier is an LRU and the AnalysisResult table is shared by all
+    workers.
+    """
+
+    def __init__(self, max_bytes, ttl):
+        self.ttl = ttl
+        self._memory = LRUCache(max_bytes, ttl=ttl)
+        self.db_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(text, prompt_version, model_id):
+        raw = f"{normalized_text_hash(text)}:{prompt_version}:{model_id}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        analysis = self._memory.get(key)
+        if analysis is not None:
+            return analysis
+
+        from .models import AnalysisResult
+        result = AnalysisResult.objects.filter(cache_key=key).first()
+        if result is None:
+            self.misses += 1
+            return None
+        age = (timezone.now() - result.created_at).total_seconds()
+        if age >= self.ttl:
+            result.delete()
+            self.misses += 1
+            return None
+        self.db_hits += 1
+        # Expires from memory when the row does, not a full ttl from now.
+        self._memory.set(key, result.analysis, ttl=self.ttl - age)
+        return result.analysis
+
+    def store(self, key, analysis, prompt_version, model_id):
+        from .models import AnalysisResult
+        AnalysisResult.objects.update_or_create(
+            cache_key=key,
+            defaults={
+                'analysis': analysis,
+                'prompt_version': prompt_version,
+                'model_id': model_id,
+                'created_at': timezone.now(),
+            },
+        )
+        self._memory.set(key, analysis)
+
+    def prune(self, dry_run=False):
+        """Deletes the expired rows, which get() only removes when asked for; returns how many there were."""
+        from .models import AnalysisResult
+        expired = AnalysisResult.objects.filter(created_at__lte=timezone.now() - timedelta(seconds=self.ttl))
+        if dry_run:
+            return expired.count()
+        return expired.delete()[0]
+
+    def stats(self):
+        memory = self._memory.stats()
+        lookups = memory['hits'] + self.db_hits + self.misses
+        return {
+            'memory': memory,
+            'db_hits': self.db_hits,
+            'misses': self.misses,
+            'hit_rate': (memory['hits'] + self.db_hits) / lookups if lookups else 0.0,
+        }
+
+
+analysis_cache = AnalysisCache(
+    getattr(settings, 'ANALYSIS_CACHE_MAX_BYTES', 16 * 1024 * 1024),
+    getattr(settings, 'ANALYSIS_CACHE_TTL', 7 * 24 * 60 * 60),
+)
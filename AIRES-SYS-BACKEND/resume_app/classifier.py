@@ -0,0 +1,189 @@
+"""
+Local, CPU-only pre-classifier for uploaded documents.
+
+A small linear model over a handful of cheap features decides the obvious
+cases (a CV with Experience/Education/Skills headings, an email address and
+date ranges; an invoice or a manual) in a millisecond or two. Only
+documents it is unsure about are escalated to the remote zero-shot model.
+"""
+import math
+import re
+import threading
+import time
+
+from django.conf import settings
+
+
+# Short lines that consist of a section title, e.g. "WORK EXPERIENCE" or
+# "Skills:". Each group counts once however often it appears.
+SECTION_HEADINGS = {
+    'experience': r"(?:work |professional |relevant )?experience|employment(?: history)?|work history|career history",
+    'education': r"education(?:al background)?|academic (?:background|qualifications)|qualifications",
+    'skills': r"(?:technical |key |core )?skills|core competencies|competencies|technologies",
+    'summary': r"(?:professional )?summary|profile|(?:career )?objective|about me",
+    'projects': r"(?:personal |selected )?projects",
+    'certifications': r"certifications?|licen[cs]es(?: (?:&|and) certifications)?|courses",
+    'awards': r"awards|honou?rs|achievements|accomplishments",
+    'languages': r"languages",
+    'references': r"references|referees",
+    'activities': r"volunteer(?:ing| experience)?|interests|hobbies|extracurricular activities",
+}
+_HEADING_RE = re.compile(
+    r"^[ \t]*(?:%s)[ \t]*:?[ \t]*$" % "|".join(
+        f"(?P<{name}>{pattern})" for name, pattern in SECTION_HEADINGS.items()
+    ),
+    re.IGNORECASE | re.MULTILINE,
+)
+
+_EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+_PHONE_RE = re.compile(r"(?:\+?\d{1,3}[\s.-]?)?(?:\(\d{2,4}\)|\d{2,4})[\s.-]?\d{3,4}[\s.-]?\d{3,4}")
+_PROFILE_RE = re.compile(r"linkedin\.com/|github\.com/", re.IGNORECASE)
+# "2019 - Present", "Jan 2020 – Mar 2022"; anchored on the first year so the
+# scan does not start a match at every word.
+_DATE_RANGE_RE = re.compile(
+    r"\b(?:19|20)\d{2}\s*(?:-|–|—|to)\s*"
+    r"(?:(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?\s+)?"
+    r"(?:(?:19|20)\d{2}|present|current|now|date)\b",
+    re.IGNORECASE,
+)
+_WORD_RE = re.compile(r"[a-z]+")
+
+# Bag-of-words weights; each word counts once per document. Vocabulary of
+# academic papers and cover letters is deliberately absent: the remote model
+# accepts those labels, so such documents should be escalated, not rejected.
+KEYWORD_WEIGHTS = {
+    # resume vocabulary
+    'resume': 0.8, 'curriculum': 0.6, 'vitae': 0.6, 'cv': 0.6,
+    'responsible': 0.3, 'managed': 0.3, 'developed': 0.3, 'led': 0.3, 'implemented': 0.3,
+    'designed': 0.2, 'collaborated': 0.3, 'coordinated': 0.3, 'achieved': 0.3,
+    'proficient': 0.4, 'intern': 0.4, 'internship': 0.4, 'bachelor': 0.5, 'master': 0.2,
+    'bsc': 0.5, 'msc': 0.4, 'degree': 0.3, 'gpa': 0.5, 'university': 0.3, 'college': 0.2,
+    'graduated': 0.4, 'certified': 0.3, 'linkedin': 0.4, 'github': 0.3, 'portfolio': 0.3,
+    # non-resume vocabulary (invoices, manuals, reports, articles)
+    'invoice': -1.5, 'subtotal': -1.2, 'vat': -0.6, 'payment': -0.5, 'due': -0.3,
+    'warranty': -1.2, 'installation': -0.8, 'troubleshooting': -0.8, 'manual': -0.6,
+    'warning': -0.5, 'caution': -0.6, 'chapter': -0.8, 'contents': -0.5, 'appendix': -0.5,
+    'quarterly': -0.6, 'revenue': -0.3, 'shareholders': -0.8, 'fiscal': -0.6,
+    'agreement': -0.6, 'hereby': -0.8, 'pursuant': -0.8, 'herein': -0.8, 'tenant': -0.8,
+    'ingredients': -1.2, 'recipe': -1.2, 'reporter': -0.6, 'published': -0.2,
+}
+
+BIAS = -2.0
+WEIGHTS = {
+    'headings': 1.3,         # distinct section headings, capped at 6
+    'email': 1.2,
+    'phone': 0.8,
+    'profile_url': 0.6,
+    'date_ranges': 0.5,      # capped at 6
+    'keywords': 1.0,         # keyword score, clipped to [-4, 4]
+}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _sigmoid(z):
+    return 1.0 / (1.0 + math.exp(-z))
+
+
+class LocalResumeClassifier:
+    """
+    Scores documents locally and decides when the score is decisive.
+    classify() returns results in the same shape as the remote classifier,
+    or None when the document should be escalated.
+    """
+
+    # Only the start of the document is scored.
+    max_chars = 6000
+
+    def __init__(self, accept_threshold=None, reject_threshold=None):
+        self.accept_threshold = accept_threshold
+        self.reject_threshold = reject_threshold
+        self._lock = threading.Lock()
+        self.accepted = 0
+        self.rejected = 0
+        self.escalated = 0
+        self.total_seconds = 0.0
+
+    def features(self, text):
+        text = text[:self.max_chars]
+        headings = {match.lastgroup for match in _HEADING_RE.finditer(text)}
+
+        words = set(_WORD_RE.findall(text.lower()))
+        keyword_score = sum(KEYWORD_WEIGHTS.get(word, 0.0) for word in words)
+
+        return {
+            'headings': len(headings),
+            'heading_names': sorted(headings),
+            'email': 1 if _EMAIL_RE.search(text) else 0,
+            'phone': 1 if _PHONE_RE.search(text) else 0,
+            'profile_url': 1 if _PROFILE_RE.search(text) else 0,
+            'date_ranges': len(_DATE_RANGE_RE.findall(text)),
+            'keywords': round(keyword_score, 2),
+        }
+
+    def score(self, features):
+        """Probability that the document is a resume."""
+        z = BIAS
+        z += WEIGHTS['headings'] * min(features['headings'], 6)
+        z += WEIGHTS['email'] * features['email']
+        z += WEIGHTS['phone'] * features['phone']
+        z += WEIGHTS['profile_url'] * features['profile_url']
+        z += WEIGHTS['date_ranges'] * min(features['date_ranges'], 6)
+        z += WEIGHTS['keywords'] * max(-4.0, min(4.0, features['keywords']))
+        return _sigmoid(z)
+
+    def classify(self, text):
+        started = time.perf_counter()
+        features = self.features(text)
+        probability = self.score(features)
+
+        accept = self.accept_threshold
+        if accept is None:
+            accept = _setting('RESUME_CLASSIFIER_ACCEPT', 0.95)
+        reject = self.reject_threshold
+        if reject is None:
+            reject = _setting('RESUME_CLASSIFIER_REJECT', 0.05)
+        if probability >= accept:
+            is_valid, confidence = True, probability
+        elif probability <= reject:
+            is_valid, confidence = False, 1 - probability
+        else:
+            is_valid = None
+
+        with self._lock:
+            self.total_seconds += time.perf_counter() - started
+            if is_valid is None:
+                self.escalated += 1
+            elif is_valid:
+                self.accepted += 1
+            else:
+                self.rejected += 1
+
+        if is_valid is None:
+            return None
+        return {
+            "is_resume": is_valid,
+            "confidence": round(confidence, 4),
+            "top_label": "resume" if is_valid else "other",
+            "details": {
+                "classifier": "local",
+                "score": round(probability, 4),
+                "features": features,
+            },
+        }
+
+    def stats(self):
+        with self._lock:
+            decisions = self.accepted + self.rejected + self.escalated
+            return {
+                'accepted': self.accepted,
+                'rejected': self.rejected,
+                'escalated': self.escalated,
+                'escalation_rate': self.escalated / decisions if decisions else 0.0,
+                'avg_ms': self.total_seconds * 1000 / decisions if decisions else 0.0,
+            }
+
+
+local_classifier = LocalResumeClassifier()
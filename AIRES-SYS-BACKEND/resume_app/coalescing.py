@@ -0,0 +1,217 @@
+"""
+Single-flight coalescing of duplicate LLM requests.
+
+A double click on Analyze or Rewrite, or two tabs on the same resume, send
+the same request twice. The first one to take the lease (a row of
+InflightRequest, keyed by endpoint, resume id and a hash of the inputs)
+calls the model; the others wait for its result, stored in that row, and
+return it as their own. The lease is claimed with an INSERT on the unique
+key, or a conditional UPDATE when it has expired, so this works across
+worker processes on any database, like the job queue's claims.
+
+A leader that dies leaves a running lease behind; once it expires the
+next waiter takes over. Results stay in the row for COALESCE_RESULT_TTL
+seconds, so a repeat arriving just after the leader finished gets them too.
+"""
+import asyncio
+import hashlib
+import json
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, transaction
+from django.utils import timezone
+
+from .log import get_logger
+
+logger = get_logger('llm')
+
+LEAD, WAIT, DONE = 'lead', 'wait', 'done'
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def request_key(endpoint, resume_id, inputs=None):
+    """The coalescing key of a request: endpoint, resume id and a hash of its other inputs."""
+    digest = hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    return f"{endpoint}:{resume_id}:{digest[:32]}"
+
+
+class Coalescer:
+    """
+    Runs a request once for all its concurrent duplicates. Waiters in the
+    leader's own process are woken as soon as it finishes; others poll the
+    lease row, backing off up to COALESCE_POLL_INTERVAL seconds.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._finished = {}   # key -> Event set when the local leader is done
+        self.leaders = 0
+        self.followers = 0
+        self.takeovers = 0
+        self.errors = 0
+
+    def _lease(self):
+        return timezone.now() + timedelta(seconds=_setting('COALESCE_LEASE', 300))
+
+    def _acquire(self, key):
+        """Takes the lease on `key` or reports it taken: (LEAD, owner), (WAIT, None) or (DONE, result)."""
+        from .models import InflightRequest
+
+        owner = uuid.uuid4().hex
+        try:
+            with transaction.atomic():
+                InflightRequest.objects.create(key=key, owner=owner, lease_until=self._lease())
+        except IntegrityError:
+            return self._check(key)
+        self._lead(key)
+        return LEAD, owner
+
+    def _check(self, key):
+        """Looks at the lease of a request someone else started; takes it over once expired."""
+        from .models import InflightRequest
+
+        row = InflightRequest.objects.filter(key=key).values(
+            'owner', 'status', 'result', 'result_status', 'lease_until'
+        ).first()
+        if row is None:
+            # The leader gave up; start over.
+            return self._acquire(key)
+        if row['lease_until'] > timezone.now():
+            if row['status'] == InflightRequest.STATUS_DONE:
+                return DONE, (row['result'], row['result_status'])
+            return WAIT, None
+        owner = uuid.uuid4().hex
+        taken = InflightRequest.objects.filter(key=key, owner=row['owner']).update(
+            owner=owner, status=InflightRequest.STATUS_RUNNING, result=None, result_status=None,
+            lease_until=self._lease(),
+        )
+        if not taken:
+            return WAIT, None
+        if row['status'] == InflightRequest.STATUS_RUNNING:
+            logger.warning("Took over the expired lease of %s", key)
+            with self._lock:
+                self.takeovers += 1
+        self._lead(key)
+        return LEAD, owner
+
+    def _lead(self, key):
+        with self._lock:
+            self._finished[key] = threading.Event()
+            self.leaders += 1
+
+    def _release(self, key, owner, result=None):
+        """Stores the leader's (data, status_code), or drops the lease when it failed."""
+        from .models import InflightRequest
+
+        leases = InflightRequest.objects.filter(key=key, owner=owner)
+        try:
+            if result is not None:
+                now = timezone.now()
+                try:
+                    leases.update(
+                        status=InflightRequest.STATUS_DONE, result=result[0], result_status=result[1],
+                        lease_until=now + timedelta(seconds=_setting('COALESCE_RESULT_TTL', 5)),
+                    )
+                except (TypeError, ValueError):
+                    logger.exception("Could not store the result of %s for its duplicates", key)
+                    result = None
+                # Leases of requests not repeated for a while.
+                InflightRequest.objects.filter(lease_until__lt=now - timedelta(hours=1)).delete()
+            if result is None:
+                leases.delete()
+        except DatabaseError:
+            logger.exception("Could not release the lease of %s", key)
+        finally:
+            with self._lock:
+                event = self._finished.pop(key, None)
+            if event is not None:
+                event.set()
+
+    def _intervals(self):
+        interval, limit = 0.05, _setting('COALESCE_POLL_INTERVAL', 0.5)
+        while True:
+            yield interval
+            interval = min(interval * 2, limit)
+
+    def _start(self, key):
+        try:
+            state, value = self._acquire(key)
+        except DatabaseError:
+            logger.exception("Could not take the lease of %s; running it uncoalesced", key)
+            with self._lock:
+                self.errors += 1
+            return None, None
+        if state != LEAD:
+            with self._lock:
+                self.followers += 1
+        return state, value
+
+    def run(self, key, call):
+        """Returns call() (a (data, status_code) pair), or the result of a duplicate already running."""
+        if not _setting('COALESCE_REQUESTS', True):
+            return call()
+        state, value = self._start(key)
+        if state is None:
+            return call()
+        intervals = self._intervals()
+        while state == WAIT:
+            with self._lock:
+                event = self._finished.get(key)
+            if event is not None:
+                event.wait(next(intervals))
+            else:
+                time.sleep(next(intervals))
+            state, value = self._check(key)
+        if state == DONE:
+            return value
+        try:
+            result = call()
+        except BaseException:
+            self._release(key, value)
+            raise
+        self._release(key, value, result)
+        return result
+
+    async def arun(self, key, call):
+        """run() for async code: awaits call(), and the lease queries run in a worker thread."""
+        if not _setting('COALESCE_REQUESTS', True):
+            return await call()
+        state, value = await sync_to_async(self._start)(key)
+        if state is None:
+            return await call()
+        intervals = self._intervals()
+        check = sync_to_async(self._check)
+        while state == WAIT:
+            await asyncio.sleep(next(intervals))
+            state, value = await check(key)
+        if state == DONE:
+            return value
+        release = sync_to_async(self._release)
+        try:
+            result = await call()
+        except BaseException:
+            await release(key, value)
+            raise
+        await release(key, value, result)
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                'leaders': self.leaders,
+                'followers': self.followers,
+                'takeovers': self.takeovers,
+                'errors': self.errors,
+                'in_flight': len(self._finished),
+            }
+
+
+coalescer = Coalescer()
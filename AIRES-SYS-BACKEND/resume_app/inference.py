@@ -0,0 +1,438 @@
+"""
+Shared client for the Hugging Face inference API.
+
+Every call goes through one keep-alive requests.Session, so connections (and
+their TLS handshakes) are reused across requests and threads. Calls get a
+per-endpoint timeout, jittered exponential backoff on 429/503 responses and a
+per-model circuit breaker that fails fast while the upstream is down.
+
+Service code describes an LLM round trip as a generator "flow" that yields an
+InferenceCall and receives the decoded response (or has the error thrown into
+it). run_sync() drives a flow on the calling thread; run_async() drives the
+same flow from async views, awaiting the HTTP call on the event loop so no
+thread is held while the model generates.
+"""
+import asyncio
+import json
+import random
+import threading
+import time
+import weakref
+from collections import namedtuple
+from contextlib import nullcontext
+
+import requests
+from asgiref.sync import sync_to_async
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+from .log import get_logger
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+logger = get_logger('llm')
+
+HF_API_KEY = getattr(settings, 'HF_API_KEY', "PUT-YOUR-HUGGINGFACE-API-KEY")
+
+MISTRAL_MODEL = "mistralai/Mistral-7B-Instruct-v0.2"
+BART_MNLI_MODEL = "facebook/bart-large-mnli"
+
+# Read timeouts in seconds, per calling endpoint.
+DEFAULT_TIMEOUTS = {
+    'classify': 15,
+    'analyze': 60,
+    'chat': 30,
+    'rewrite': 45,
+    'revise': 45,
+}
+CONNECT_TIMEOUT = 5
+RETRY_STATUSES = (429, 503)
+
+
+class InferenceError(requests.exceptions.RequestException):
+    """
+    Base error for failed inference calls. Subclasses RequestException so
+    existing `except requests.exceptions.RequestException` handlers keep
+    working; `response` is set when the upstream answered.
+    """
+
+
+class UpstreamError(InferenceError):
+    """The upstream answered with a non-success status after all retries."""
+
+    def __init__(self, message, response=None):
+        super().__init__(message, response=response)
+        try:
+            self.payload = response.json() if response is not None else None
+        except ValueError:
+            self.payload = None
+
+
+class CircuitOpenError(InferenceError):
+    """The circuit breaker for this model is open; the call was not attempted."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive upstream failures and rejects
+    calls for `reset_timeout` seconds. After that a single trial call is let
+    through (half-open); success closes the circuit, failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def release(self):
+        """Ends a call that says nothing about the upstream's health, freeing a half-open trial."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+def _settle(breaker, healthy):
+    """
+    Reports how a call left the upstream: True or False when it answered or
+    failed, None when the call ended for another reason (a cancelled
+    request, a bug). That last case still frees the breaker's half-open
+    trial, which would otherwise stay taken and keep the circuit open.
+    """
+    if healthy is True:
+        breaker.record_success()
+    elif healthy is False:
+        breaker.record_failure()
+    else:
+        breaker.release()
+
+
+class InferenceClient:
+    def __init__(self, base_url=None, api_key=None, pool_size=None, max_retries=None,
+                 backoff_base=None, backoff_max=None, timeouts=None):
+        self.base_url = (base_url or getattr(
+            settings, 'HF_INFERENCE_BASE_URL', "https://api-inference.huggingface.co/models"
+        )).rstrip('/')
+        self.max_retries = max_retries if max_retries is not None else getattr(settings, 'HF_MAX_RETRIES', 3)
+        self.backoff_base = backoff_base if backoff_base is not None else getattr(settings, 'HF_BACKOFF_BASE', 0.5)
+        self.backoff_max = backoff_max if backoff_max is not None else getattr(settings, 'HF_BACKOFF_MAX', 8)
+        self.timeouts = {**DEFAULT_TIMEOUTS, **getattr(settings, 'HF_TIMEOUTS', {}), **(timeouts or {})}
+
+        pool_size = pool_size or getattr(settings, 'HF_POOL_SIZE', 20)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_key or HF_API_KEY}",
+            "Content-Type": "application/json",
+        })
+
+        self._breakers = {}
+        self._breakers_lock = threading.Lock()
+
+    def breaker(self, model):
+        with self._breakers_lock:
+            if model not in self._breakers:
+                self._breakers[model] = CircuitBreaker(
+                    failure_threshold=getattr(settings, 'HF_CIRCUIT_FAILURE_THRESHOLD', 5),
+                    reset_timeout=getattr(settings, 'HF_CIRCUIT_RESET_TIMEOUT', 30),
+                )
+            return self._breakers[model]
+
+    def url(self, model):
+        return f"{self.base_url}/{model}"
+
+    def _backoff(self, attempt, response=None):
+        # Honour Retry-After when the upstream sends one, capped at backoff_max.
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        # "Full jitter": a random delay up to the exponential ceiling.
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def post(self, model, payload, endpoint='chat', **kwargs):
+        """
+        POSTs `payload` to `model` and returns the decoded JSON body.
+        Retries 429/503 responses and connection errors with jittered
+        exponential backoff. Raises CircuitOpenError without calling the
+        upstream while the model's circuit is open, and UpstreamError (or
+        InferenceError for network failures) once retries are exhausted.
+        """
+        response = self.request(model, payload, endpoint=endpoint, **kwargs)
+        return response.json()
+
+    def stream(self, model, payload, endpoint='chat'):
+        """
+        Calls `model` with token streaming enabled and yields each generated
+        token's text as it arrives. The upstream answers with Server-Sent
+        Events whose data is JSON like {"token": {"text": ...}}; the final
+        event also carries "generated_text". Connection-level retries and the
+        circuit breaker apply until the first byte; errors after that raise
+        InferenceError.
+        """
+        response = self.request(model, {**payload, "stream": True}, endpoint=endpoint, stream=True)
+        try:
+            # chunk_size=None hands over each chunk as it arrives instead of
+            # waiting for a fixed-size buffer to fill.
+            for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                try:
+                    event = json.loads(data)
+                except ValueError:
+                    continue
+                if "error" in event:
+                    raise InferenceError(f"Inference stream from {model} failed: {event['error']}")
+                token = event.get("token") or {}
+                if token.get("special"):
+                    continue
+                if token.get("text"):
+                    yield token["text"]
+        except requests.exceptions.RequestException as e:
+            if isinstance(e, InferenceError):
+                raise
+            raise InferenceError(f"Inference stream from {model} was interrupted: {e}") from e
+        finally:
+            response.close()
+
+    def request(self, model, payload, endpoint='chat', stream=False):
+        breaker = self.breaker(model)
+        if not breaker.allow():
+            raise CircuitOpenError(f"Inference upstream for {model} is unavailable (circuit open).")
+
+        timeout = (CONNECT_TIMEOUT, self.timeouts.get(endpoint, 30))
+        attempt = 0
+        healthy = None
+        try:
+            while True:
+                try:
+                    response = self.session.post(self.url(model), json=payload, timeout=timeout, stream=stream)
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                    if attempt >= self.max_retries or isinstance(e, requests.exceptions.ReadTimeout):
+                        # A read timeout already cost the full budget; do not multiply it.
+                        healthy = False
+                        raise InferenceError(f"Inference request to {model} failed: {e}") from e
+                    delay = self._backoff(attempt)
+                except requests.exceptions.RequestException as e:
+                    # Redirect loops, broken chunked responses and the like are not retried.
+                    healthy = False
+                    raise InferenceError(f"Inference request to {model} failed: {e}") from e
+                else:
+                    if response.status_code < 400:
+                        healthy = True
+                        return response
+                    if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                        # 4xx means the upstream is healthy but rejected the request.
+                        healthy = not (response.status_code >= 500 or response.status_code == 429)
+                        raise UpstreamError(
+                            f"Inference request to {model} failed with status {response.status_code}: "
+                            f"{response.text[:500]}",
+                            response=response,
+                        )
+                    delay = self._backoff(attempt, response)
+                    response.close()
+
+                logger.warning("Retrying inference request to %s in %.2fs (attempt %d)", model, delay, attempt + 1)
+                time.sleep(delay)
+                attempt += 1
+        finally:
+            _settle(breaker, healthy)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Returns the process-wide InferenceClient."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = InferenceClient()
+        return _client
+
+
+class AsyncInferenceClient:
+    """
+    asyncio counterpart of InferenceClient built on httpx. It shares the
+    synchronous client's settings, auth headers and circuit breakers, so both
+    code paths see the same upstream health. Without httpx installed, calls
+    fall back to the synchronous client on a worker thread.
+    """
+
+    def __init__(self, client, max_connections=None):
+        self.client = client
+        self.max_connections = max_connections or getattr(settings, 'HF_ASYNC_MAX_CONNECTIONS', 200)
+        # httpx connections belong to the event loop that opened them.
+        self._sessions = weakref.WeakKeyDictionary()
+
+    def _session(self):
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None:
+            session = httpx.AsyncClient(
+                headers=dict(self.client.session.headers),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+            self._sessions[loop] = session
+        return session
+
+    async def post(self, model, payload, endpoint='chat'):
+        """Async version of InferenceClient.post(); same retries and errors."""
+        if httpx is None:
+            return await sync_to_async(self.client.post, thread_sensitive=False)(
+                model, payload, endpoint=endpoint
+            )
+
+        client = self.client
+        breaker = client.breaker(model)
+        if not breaker.allow():
+            raise CircuitOpenError(f"Inference upstream for {model} is unavailable (circuit open).")
+
+        timeout = httpx.Timeout(client.timeouts.get(endpoint, 30), connect=CONNECT_TIMEOUT)
+        attempt = 0
+        healthy = None
+        try:
+            while True:
+                try:
+                    response = await self._session().post(client.url(model), json=payload, timeout=timeout)
+                except httpx.TransportError as e:
+                    if attempt >= client.max_retries or isinstance(e, httpx.ReadTimeout):
+                        healthy = False
+                        raise InferenceError(f"Inference request to {model} failed: {e!r}") from e
+                    delay = client._backoff(attempt)
+                except httpx.HTTPError as e:
+                    healthy = False
+                    raise InferenceError(f"Inference request to {model} failed: {e!r}") from e
+                else:
+                    if response.status_code < 400:
+                        healthy = True
+                        return response.json()
+                    if response.status_code not in RETRY_STATUSES or attempt >= client.max_retries:
+                        healthy = not (response.status_code >= 500 or response.status_code == 429)
+                        raise UpstreamError(
+                            f"Inference request to {model} failed with status {response.status_code}: "
+                            f"{response.text[:500]}",
+                            response=response,
+                        )
+                    delay = client._backoff(attempt, response)
+
+                logger.warning("Retrying inference request to %s in %.2fs (attempt %d)", model, delay, attempt + 1)
+                await asyncio.sleep(delay)
+                attempt += 1
+        finally:
+            _settle(breaker, healthy)
+
+
+_async_client = None
+
+
+def get_async_client():
+    """Returns the process-wide AsyncInferenceClient."""
+    global _async_client
+    client = get_client()
+    with _client_lock:
+        if _async_client is None:
+            _async_client = AsyncInferenceClient(client)
+        return _async_client
+
+
+# What a flow yields when it needs the model: the decoded response is sent
+# back into the flow, and a failed call is thrown into it as an exception.
+InferenceCall = namedtuple('InferenceCall', ['model', 'payload', 'endpoint'])
+
+
+def _advance(flow, value=None, error=None):
+    # Runs the flow up to its next InferenceCall. Returns (call, None), or
+    # (None, result) once the flow has returned.
+    try:
+        call = flow.throw(error) if error is not None else flow.send(value)
+    except StopIteration as stop:
+        return None, stop.value
+    return call, None
+
+
+def run_sync(flow, call_context=None):
+    """
+    Drives a flow on the current thread with the blocking client. When
+    given, `call_context()` is entered around each inference call (say,
+    throttling.admission.slot); its errors are thrown into the flow too.
+    """
+    call, result = _advance(flow)
+    while call is not None:
+        try:
+            with call_context() if call_context is not None else nullcontext():
+                response = get_client().post(call.model, call.payload, endpoint=call.endpoint)
+        except Exception as e:
+            call, result = _advance(flow, error=e)
+        else:
+            call, result = _advance(flow, response)
+    return result
+
+
+async def run_async(flow):
+    """
+    Drives a flow from async code. The flow's own steps (ORM queries, PDF
+    parsing) run in a worker thread through sync_to_async, exactly like
+    Django's async ORM methods; the inference calls in between are awaited
+    on the event loop.
+    """
+    advance = sync_to_async(_advance)
+    call, result = await advance(flow)
+    while call is not None:
+        try:
+            response = await get_async_client().post(call.model, call.payload, endpoint=call.endpoint)
+        except Exception as e:
+            call, result = await advance(flow, error=e)
+        else:
+            call, result = await advance(flow, response)
+    return result
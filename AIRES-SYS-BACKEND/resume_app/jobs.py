@@ -0,0 +1,207 @@
+"""
+DB-backed job queue for the slow LLM endpoints.
+
+Jobs are rows in the Job table. Any number of worker threads, in the web
+process or in dedicated `manage.py run_job_workers` processes, claim queued
+rows with a conditional UPDATE, so no external broker is needed and a job is
+only ever run by one worker.
+"""
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import close_old_connections, connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .log import get_logger
+from .models import Job
+from .services import run_analysis, run_rewrite, run_revision
+
+logger = get_logger('llm')
+
+
+# Handlers receive the job params and return (data, status_code), exactly like
+# the synchronous endpoints.
+JOB_HANDLERS = {
+    'analyze': lambda params: run_analysis(params['resume_id']),
+    'rewrite': lambda params: run_rewrite(params['resume_id']),
+    'revise': lambda params: run_revision(
+        params['resume_id'], params['feedback'], params.get('current_version'), params.get('version')
+    ),
+}
+
+REQUIRED_PARAMS = {
+    'analyze': ('resume_id',),
+    'rewrite': ('resume_id',),
+    'revise': ('resume_id', 'feedback'),
+}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def submit_job(job_type, params, user=None):
+    """Queues a job and wakes up a local worker. Returns the Job row."""
+    job = Job.objects.create(job_type=job_type, params=params, user=user)
+    if _setting('JOB_WORKERS_IN_PROCESS', True):
+        worker_pool.start()
+    worker_pool.notify()
+    return job
+
+
+START_WORKERS_UID = 'resume_app.start_job_workers'
+
+
+def start_in_process_workers(**kwargs):
+    """
+    request_started receiver (see apps.py): starts this process's workers
+    when it serves its first request, so jobs left queued by a restart are
+    picked up without waiting for a new submission. Management commands
+    such as migrate never serve a request and so never start them.
+    """
+    request_started.disconnect(dispatch_uid=START_WORKERS_UID)
+    worker_pool.start()
+
+
+def _claimable():
+    # Queued jobs, plus running jobs whose worker died without finishing them:
+    # their heartbeat (or, for jobs claimed before heartbeats, their start)
+    # is older than JOB_STALE_AFTER.
+    stale_before = timezone.now() - timedelta(seconds=_setting('JOB_STALE_AFTER', 300))
+    return Q(status=Job.STATUS_QUEUED) | Q(status=Job.STATUS_RUNNING) & (
+        Q(heartbeat_at__lt=stale_before) | Q(heartbeat_at__isnull=True, started_at__lt=stale_before)
+    )
+
+
+def claim_next_job():
+    """
+    Atomically moves the oldest claimable job to 'running' and returns it, or
+    returns None when the queue is empty. The conditional UPDATE means two
+    workers racing for the same row cannot both win.
+    """
+    candidates = list(
+        Job.objects.filter(_claimable()).order_by('created_at').values_list('id', flat=True)[:10]
+    )
+    for job_id in candidates:
+        now = timezone.now()
+        claimed = Job.objects.filter(_claimable(), id=job_id).update(
+            status=Job.STATUS_RUNNING, started_at=now, heartbeat_at=now
+        )
+        if claimed:
+            return Job.objects.get(id=job_id)
+    return None
+
+
+def run_job(job):
+    try:
+        data, status_code = JOB_HANDLERS[job.job_type](job.params)
+        job.result = data
+        job.result_status = status_code
+        job.status = Job.STATUS_SUCCEEDED if status_code < 400 else Job.STATUS_FAILED
+    except Exception as e:
+        logger.exception("Job %s (%s) crashed", job.id, job.job_type)
+        job.status = Job.STATUS_FAILED
+        job.error = str(e)
+    job.finished_at = timezone.now()
+    job.save(update_fields=['result', 'result_status', 'status', 'error', 'finished_at'])
+
+
+class JobWorkerPool:
+    """
+    A fixed number of daemon threads that claim and run jobs. Workers sleep
+    on a condition variable and are woken by notify() on submit, falling back
+    to polling every JOB_POLL_INTERVAL seconds for jobs queued elsewhere.
+
+    One more thread refreshes the heartbeat of the jobs being run every
+    third of JOB_STALE_AFTER, so a job that outlives it (a coalesced request
+    waiting on another, upstream retries) is not taken for orphaned and run
+    a second time.
+    """
+
+    def __init__(self):
+        self._threads = []
+        self._running = set()   # ids of the jobs this pool's workers are running
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        self._stopping = threading.Event()
+
+    def start(self, concurrency=None):
+        with self._lock:
+            if self._threads:
+                return
+            concurrency = concurrency or _setting('JOB_WORKER_CONCURRENCY', 4)
+            self._stopping.clear()
+            for i in range(concurrency):
+                thread = threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            thread = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+            logger.info("Started %d job workers", concurrency)
+
+    def stop(self):
+        self._stopping.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        with self._lock:
+            for thread in self._threads:
+                thread.join()
+            self._threads = []
+
+    def notify(self):
+        with self._wakeup:
+            self._wakeup.notify()
+
+    def join(self):
+        for thread in list(self._threads):
+            thread.join()
+
+    def _run(self):
+        poll_interval = _setting('JOB_POLL_INTERVAL', 1.0)
+        try:
+            while not self._stopping.is_set():
+                close_old_connections()
+                try:
+                    job = claim_next_job()
+                except Exception:
+                    logger.exception("Could not claim a job")
+                    job = None
+
+                if job is None:
+                    with self._wakeup:
+                        self._wakeup.wait(poll_interval)
+                    continue
+                with self._lock:
+                    self._running.add(job.id)
+                try:
+                    run_job(job)
+                finally:
+                    with self._lock:
+                        self._running.discard(job.id)
+        finally:
+            connection.close()
+
+    def _heartbeat(self):
+        interval = _setting('JOB_STALE_AFTER', 300) / 3
+        try:
+            while not self._stopping.wait(interval):
+                with self._lock:
+                    running = list(self._running)
+                if not running:
+                    continue
+                close_old_connections()
+                try:
+                    Job.objects.filter(id__in=running, status=Job.STATUS_RUNNING).update(
+                        heartbeat_at=timezone.now()
+                    )
+                except Exception:
+                    logger.exception("Could not refresh the heartbeat of running jobs")
+        finally:
+            connection.close()
+
+
+worker_pool = JobWorkerPool()
@@ -0,0 +1,248 @@
+"""
+Recovers the JSON object in a language model's reply.
+
+Replies wrap the object in prose or code fences, put raw newlines and
+invalid escapes inside strings, and stop mid-object when they run into the
+token limit. JSONExtractor scans a reply as it arrives, whole or token by
+token, for the first balanced object that parses, repairing those errors,
+and at the end closes an object the reply was cut off in.
+"""
+import json
+import re
+
+_CLOSERS = {'{': '}', '[': ']'}
+_STRUCTURE_RE = re.compile(r'[{}\[\]"]')
+_STRING_SPECIAL_RE = re.compile(r'["\\]')
+_PLAIN_RE = re.compile(r'[^"\\\x00-\x1f]+')
+_BARE_RE = re.compile(r'[A-Za-z0-9_.+-]+')
+_HEX4_RE = re.compile(r'[0-9a-fA-F]{4}')
+_VALID_ESCAPES = frozenset('"\\/bfnrt')
+_CONTROL_ESCAPES = {'\n': '\\n', '\r': '\\r', '\t': '\\t', '\b': '\\b', '\f': '\\f'}
+_LITERALS = {'True': 'true', 'False': 'false', 'None': 'null'}
+_FAILED = object()
+
+
+class JSONExtractionError(ValueError):
+    """The reply holds no JSON object that could be recovered."""
+
+
+def _repair_string(text, i, out):
+    """
+    Copies the string starting after the quote at text[i - 1] to `out` as
+    valid JSON. Returns (index after it, whether its closing quote was found).
+    """
+    parts = ['"']
+    n = len(text)
+    while i < n:
+        match = _PLAIN_RE.match(text, i)
+        if match:
+            parts.append(match.group())
+            i = match.end()
+            continue
+        c = text[i]
+        if c == '"':
+            # Only a quote followed by what may follow a string ends it;
+            # others were meant as part of the text.
+            following = text[i + 1:i + 80].lstrip()
+            if not following or following[0] in ',:}]':
+                parts.append('"')
+                out.append(''.join(parts))
+                return i + 1, True
+            parts.append('\\"')
+            i += 1
+        elif c == '\\':
+            escaped = text[i + 1:i + 2]
+            if escaped in _VALID_ESCAPES:
+                parts.append(text[i:i + 2])
+                i += 2
+            elif escaped == 'u' and _HEX4_RE.match(text, i + 2):
+                parts.append(text[i:i + 6])
+                i += 6
+            elif escaped in ("'", '\n'):
+                parts.append("'" if escaped == "'" else '\\n')
+                i += 2
+            elif not escaped:
+                i += 1  # a reply cut off after a backslash
+            else:
+                parts.append('\\\\')
+                i += 1
+        else:
+            parts.append(_CONTROL_ESCAPES.get(c, '\\u%04x' % ord(c)))
+            i += 1
+    parts.append('"')
+    out.append(''.join(parts))
+    return n, False
+
+
+def repair_json(text):
+    """
+    Rewrites almost-JSON `text` (an object or array) as valid JSON text:
+    control characters in strings are escaped, invalid escapes become
+    literal backslashes, quotes inside strings that cannot end them are
+    escaped, trailing commas are dropped and Python's True/False/None are
+    translated. A text that stops early has its last, unfinished value
+    completed (or replaced with null) and its open strings and containers
+    closed.
+    """
+    out = []
+    stack = []
+    last, last_at = '', -1   # last significant token outside strings, and its index in out
+    key = False              # whether that token is an object key
+    i, n = 0, len(text)
+    while i < n:
+        c = text[i]
+        if c == '"':
+            is_key = bool(stack) and stack[-1] == '{' and last in ('{', ',')
+            i, _ = _repair_string(text, i + 1, out)
+            last, last_at, key = '"', len(out) - 1, is_key
+            continue
+        if c in _CLOSERS:
+            stack.append(c)
+        elif c in '}]':
+            if not stack or _CLOSERS[stack[-1]] != c:
+                i += 1  # a stray closer
+                continue
+            if last == ',':
+                out[last_at] = ''
+            stack.pop()
+        elif c in ',:':
+            pass
+        elif c.isspace():
+            out.append(c)
+            i += 1
+            continue
+        else:
+            match = _BARE_RE.match(text, i)
+            if not match:
+                i += 1  # a stray character, such as a code fence backtick
+                continue
+            out.append(_LITERALS.get(match.group(), match.group()))
+            last, last_at, key = 'value', len(out) - 1, False
+            i = match.end()
+            continue
+        out.append(c)
+        last, last_at, key = c, len(out) - 1, False
+        i += 1
+        if not stack:
+            break
+
+    # Complete a text that stopped early.
+    if last == 'value':
+        try:
+            json.loads(out[last_at])
+        except ValueError:
+            value = out[last_at].rstrip('.eE+-')
+            try:
+                json.loads(value)
+            except ValueError:
+                value = 'null'
+            out[last_at] = value
+    elif last == ',':
+        out[last_at] = ''
+    elif last == ':':
+        out.append('null')
+    elif last == '"' and key:
+        out.append(':null')
+    out.extend(_CLOSERS[opener] for opener in reversed(stack))
+    return ''.join(out)
+
+
+def _parse(text):
+    try:
+        return json.loads(text, strict=False)
+    except ValueError:
+        pass
+    try:
+        return json.loads(repair_json(text))
+    except ValueError:
+        return _FAILED
+
+
+class JSONExtractor:
+    """
+    Finds the first JSON object in a reply fed to it in pieces. Each piece
+    is scanned once; feed() returns the object as soon as it is complete.
+    """
+
+    def __init__(self):
+        self._buffer = ''
+        self._position = 0
+        self._start = -1       # where the candidate object starts, -1 while looking for one
+        self._stack = []
+        self._in_string = False
+        self.value = None
+        self.done = False
+        # Whether the object had to be closed because the reply ended inside it.
+        self.truncated = False
+
+    def feed(self, chunk):
+        """Consumes the next piece of the reply; returns the object once it is complete, else None."""
+        if self.done:
+            return self.value
+        self._buffer += chunk
+        buffer = self._buffer
+        position = self._position
+        while True:
+            if self._start < 0:
+                position = buffer.find('{', position)
+                if position < 0:
+                    position = len(buffer)
+                    break
+                self._start = position
+                self._stack = ['{']
+                position += 1
+            elif self._in_string:
+                match = _STRING_SPECIAL_RE.search(buffer, position)
+                if not match:
+                    position = len(buffer)
+                    break
+                if match.group() == '"':
+                    self._in_string = False
+                elif match.end() == len(buffer):
+                    # The escaped character is in the next piece.
+                    position = match.start()
+                    break
+                position = match.end() + (match.group() == '\\')
+            else:
+                match = _STRUCTURE_RE.search(buffer, position)
+                if not match:
+                    position = len(buffer)
+                    break
+                c = match.group()
+                position = match.end()
+                if c == '"':
+                    self._in_string = True
+                elif c in _CLOSERS:
+                    self._stack.append(c)
+                elif _CLOSERS[self._stack[-1]] == c:
+                    self._stack.pop()
+                    if not self._stack:
+                        value = _parse(buffer[self._start:position])
+                        if value is not _FAILED:
+                            self.value, self.done = value, True
+                            return value
+                        # Not JSON after all (say, braces in prose); look further on.
+                        position = self._start + 1
+                        self._start = -1
+        self._position = position
+        return None
+
+    def finish(self):
+        """
+        Returns the object: the first complete one, or else the one the
+        reply ended in, closed. Raises JSONExtractionError when there is none.
+        """
+        if not self.done and self._start >= 0:
+            value = _parse(self._buffer[self._start:])
+            if value is not _FAILED:
+                self.value, self.done, self.truncated = value, True, True
+        if not self.done:
+            raise JSONExtractionError("No JSON object could be recovered from the reply.")
+        return self.value
+
+
+def extract_json(text):
+    """The first JSON object in `text`, repaired if need be; raises JSONExtractionError."""
+    extractor = JSONExtractor()
+    extractor.feed(text)
+    return extractor.finish()
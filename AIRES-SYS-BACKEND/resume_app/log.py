@@ -0,0 +1,93 @@
+"""
+Logging plumbing for the resume app, wired up by LOGGING in settings.py.
+
+Records are grouped into categories (child loggers of "resume_app"), each with
+its own level:
+
+    resume_app.llm       inference calls and handling of model output
+    resume_app.pdf       PDF extraction and rendering
+    resume_app.auth      signup, login and account endpoints
+    resume_app.payloads  full request and model payloads (resume text, raw
+                         LLM output); silent unless LOG_FULL_PAYLOADS is on
+
+Modules log through get_logger(category) rather than logging.getLogger(__name__),
+so every record lands in one of these categories. The handler only enqueues records; a background thread does the writing, so
+request threads never block on stdout. Long arguments are truncated and DEBUG
+records are sampled unless full-payload debug mode is enabled.
+"""
+import atexit
+import logging
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+
+payload_logger = logging.getLogger('resume_app.payloads')
+
+
+def get_logger(category):
+    return logging.getLogger(f'resume_app.{category}')
+
+
+class TruncateFilter(logging.Filter):
+    """
+    Shortens string arguments (and long literal messages) to `max_chars`,
+    noting how much was cut. max_chars=None disables truncation.
+    """
+
+    def __init__(self, max_chars=500):
+        super().__init__()
+        self.max_chars = max_chars
+
+    def _truncate(self, value):
+        if isinstance(value, str) and len(value) > self.max_chars:
+            return f"{value[:self.max_chars]}... [{len(value) - self.max_chars} more chars]"
+        return value
+
+    def filter(self, record):
+        if self.max_chars is None:
+            return True
+        if isinstance(record.args, tuple):
+            record.args = tuple(self._truncate(arg) for arg in record.args)
+        elif isinstance(record.args, dict):
+            record.args = {key: self._truncate(value) for key, value in record.args.items()}
+        if not record.args:
+            record.msg = self._truncate(record.msg)
+        return True
+
+
+class SampleFilter(logging.Filter):
+    """Lets through only a `rate` fraction of records at or below `max_level`."""
+
+    def __init__(self, rate=1.0, max_level='DEBUG'):
+        super().__init__()
+        self.rate = rate
+        self.max_level = logging.getLevelName(max_level) if isinstance(max_level, str) else max_level
+
+    def filter(self, record):
+        if record.levelno > self.max_level or self.rate >= 1:
+            return True
+        return random.random() < self.rate
+
+
+class QueueingHandler(QueueHandler):
+    """
+    Formats records on the calling thread and hands them to a QueueListener
+    that writes them to `stream` (stderr by default). When the queue is full
+    records are dropped and counted instead of blocking the caller.
+    """
+
+    def __init__(self, stream=None, maxsize=10000):
+        super().__init__(queue.Queue(maxsize))
+        target = logging.StreamHandler(stream or sys.stderr)
+        self.listener = QueueListener(self.queue, target)
+        self.listener.start()
+        self.dropped = 0
+        atexit.register(self.listener.stop)
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
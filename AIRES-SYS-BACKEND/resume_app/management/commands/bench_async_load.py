@@ -0,0 +1,78 @@
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Fires concurrent POSTs at one or more endpoints and reports throughput "
+        "and latency, e.g. the WSGI /api/chat/ against the ASGI /api/async/chat/. "
+        "Start the fake_inference_server command first so the upstream latency "
+        "is fixed and identical for every deployment."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', action='append', required=True,
+                            help="Endpoint to load; repeat to compare several.")
+        parser.add_argument('--resume-id', type=int, required=True)
+        parser.add_argument('--message', default="What are my strongest skills?")
+        parser.add_argument('--payload', default=None,
+                            help="JSON body to send instead of resume_id/message.")
+        parser.add_argument('--concurrency', type=int, default=100)
+        parser.add_argument('--requests', type=int, default=300)
+        parser.add_argument('--timeout', type=float, default=120)
+
+    def handle(self, *args, **options):
+        if options['payload']:
+            payload = json.loads(options['payload'])
+        else:
+            payload = {'resume_id': options['resume_id'], 'message': options['message']}
+
+        self.stdout.write(
+            f"{options['requests']} requests, {options['concurrency']} concurrent\n"
+            f"{'url':<45} {'ok':>5} {'err':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}"
+        )
+        for url in options['url']:
+            ok, errors, elapsed, latencies = self.load(url, payload, options)
+            latencies.sort()
+            p50 = statistics.median(latencies) if latencies else 0
+            p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+            peak = latencies[-1] if latencies else 0
+            self.stdout.write(
+                f"{url:<45} {ok:>5} {errors:>5} {ok / elapsed:>8.1f} "
+                f"{p50 * 1000:>8.0f} {p95 * 1000:>8.0f} {peak * 1000:>8.0f}"
+            )
+
+    def load(self, url, payload, options):
+        local = threading.local()
+        latencies = []
+        errors = 0
+        lock = threading.Lock()
+
+        def one(_):
+            nonlocal errors
+            session = getattr(local, 'session', None)
+            if session is None:
+                session = local.session = requests.Session()
+            started = time.perf_counter()
+            try:
+                response = session.post(url, json=payload, timeout=options['timeout'])
+                succeeded = response.status_code < 400
+            except requests.exceptions.RequestException:
+                succeeded = False
+            took = time.perf_counter() - started
+            with lock:
+                if succeeded:
+                    latencies.append(took)
+                else:
+                    errors += 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            list(pool.map(one, range(options['requests'])))
+        return len(latencies), errors, time.perf_counter() - started, latencies
@@ -0,0 +1,104 @@
+import io
+import tempfile
+import time
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+from resume_app.bulk import process_batch
+from resume_app.models import Resume
+from resume_app.pdf_extraction import extract_pages, join_pages
+from resume_app.views import ResumeValidator
+
+
+def build_document(index, is_resume, pages=2):
+    """A small PDF: a CV with the usual sections, or an invoice."""
+    if is_resume:
+        lines = [
+            f"Candidate {index}", f"candidate{index}@example.com | +254 700 {index:06d}",
+            "Summary", "Backend engineer building Django services.",
+            "Experience", f"Senior Engineer, Company {index % 17}  2019 - Present",
+            "Developed and led the migration of services to PostgreSQL.",
+            "Education", "BSc Computer Science, University of Nairobi  2012 - 2016",
+            "Skills", "Python, Django, React, SQL",
+        ]
+    else:
+        lines = [
+            f"INVOICE #{index}", "Bill to: Acme Ltd", "Description  Qty  Amount",
+            "Consulting services  10  1,000.00", "Subtotal 1,000.00  VAT 160.00",
+            "Payment due within 30 days.",
+        ]
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=letter)
+    for page in range(pages):
+        y = 750
+        for line in lines * 3:
+            pdf.drawString(50, y, line)
+            y -= 15
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures bulk-upload throughput: a batch of synthetic PDFs (mostly CVs, "
+        "some invoices) through process_batch(), against the one-file-at-a-time "
+        "upload path. Nothing is kept: rows are rolled back and files go to a "
+        "temporary MEDIA_ROOT. With --remote every document is classified by the "
+        "remote model; start fake_inference_server and point HF_INFERENCE_BASE_URL "
+        "at it first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--files', type=int, default=500)
+        parser.add_argument('--non-resume-share', type=float, default=0.2)
+        parser.add_argument('--skip-serial', action='store_true')
+        parser.add_argument('--remote', action='store_true',
+                            help="Disable the local pre-classifier.")
+
+    def handle(self, *args, **options):
+        every = max(1, round(1 / options['non_resume_share'])) if options['non_resume_share'] else 0
+        self.stdout.write(f"Building {options['files']} PDFs...")
+        files = [
+            {'file': f"cv_{i}.pdf", 'data': build_document(i, not (every and i % every == 0))}
+            for i in range(options['files'])
+        ]
+        validator = ResumeValidator()
+
+        overrides = {'RESUME_CLASSIFIER_LOCAL': False} if options['remote'] else {}
+        with tempfile.TemporaryDirectory() as media_root, \
+                override_settings(MEDIA_ROOT=media_root, **overrides):
+            if not options['skip_serial']:
+                elapsed = self.run_rolled_back(lambda: self.serial(files, validator))
+                self.report("serial (upload_resume path)", len(files), elapsed)
+            elapsed = self.run_rolled_back(lambda: self.bulk(files, validator))
+            self.report("bulk_upload", len(files), elapsed)
+
+    def run_rolled_back(self, func):
+        with transaction.atomic():
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+            transaction.set_rollback(True)
+        return elapsed
+
+    def serial(self, files, validator):
+        for item in files:
+            pages = extract_pages(item['data'])
+            is_valid, _ = validator.is_resume(join_pages(pages))
+            if is_valid:
+                Resume.objects.create(file=ContentFile(item['data'], name=item['file']),
+                                      text=join_pages(pages), pages=pages)
+
+    def bulk(self, files, validator):
+        for result in process_batch([dict(item) for item in files], validator.is_resume):
+            if 'summary' in result:
+                self.stdout.write(f"  {result['summary']}")
+
+    def report(self, label, count, elapsed):
+        self.stdout.write(f"{label:<30} {count:>5} files {elapsed:>8.2f} s {count / elapsed:>8.1f} files/s")
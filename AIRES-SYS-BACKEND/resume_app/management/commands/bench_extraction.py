@@ -0,0 +1,89 @@
+import io
+import os
+import time
+from contextlib import nullcontext
+
+import PyPDF2
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+from resume_app.pdf_extraction import _worker_count, extract_text
+
+
+def build_pdf(page_count, lines_per_page=45):
+    """Builds a text-heavy PDF resembling a long multi-page CV."""
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=letter)
+    for page in range(page_count):
+        y = 750
+        for line in range(lines_per_page):
+            pdf.drawString(
+                50, y,
+                f"Page {page + 1} line {line + 1}: Senior Software Engineer, "
+                f"led migration of services to Django and PostgreSQL."
+            )
+            y -= 15
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+def legacy_extract(data):
+    # The loop previously copied into every view.
+    pdf_reader = PyPDF2.PdfReader(io.BytesIO(data))
+    text = ""
+    for page in pdf_reader.pages:
+        text += page.extract_text() or ""
+    return text
+
+
+class Command(BaseCommand):
+    help = "Compares the legacy PyPDF2 loop with the shared page-level extraction engine."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, nargs='+', default=[1, 5, 20])
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Processes of the parallel path (defaults to PDF_EXTRACTION_WORKERS).")
+
+    def handle(self, *args, **options):
+        with override_settings(PDF_EXTRACTION_WORKERS=options['workers']) if options['workers'] else nullcontext():
+            self.run(options)
+
+    def run(self, options):
+        repeat = options['repeat']
+        workers = _worker_count()
+        self.stdout.write(f"{workers} extraction worker(s), {os.cpu_count()} CPU(s)")
+        if workers < 2:
+            self.stdout.write(
+                "With one worker extract_pages() takes the serial path, so no parallel timings "
+                "are taken; pass --workers 2 or more."
+            )
+        elif workers > (os.cpu_count() or 1):
+            self.stdout.write("More workers than CPUs: the parallel timings measure overhead, not speed-up.")
+
+        def best_of(func, data):
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                func(data)
+                timings.append(time.perf_counter() - started)
+            return min(timings) * 1000
+
+        self.stdout.write(f"{'pages':>6} {'legacy ms':>10} {'serial ms':>10} {'parallel ms':>12}")
+        for page_count in options['pages']:
+            data = build_pdf(page_count)
+            legacy = best_of(legacy_extract, data)
+            with override_settings(PDF_PARALLEL_MIN_PAGES=10 ** 6, PDF_MAX_PAGES=10 ** 6):
+                serial = best_of(extract_text, data)
+            if workers < 2 or page_count < 2:
+                # Single pages are never split across workers.
+                self.stdout.write(f"{page_count:>6} {legacy:>10.1f} {serial:>10.1f} {'n/a':>12}")
+                continue
+            with override_settings(PDF_PARALLEL_MIN_PAGES=2, PDF_MAX_PAGES=10 ** 6):
+                # Warm the process pool so worker start-up is not measured.
+                extract_text(data)
+                parallel = best_of(extract_text, data)
+            self.stdout.write(f"{page_count:>6} {legacy:>10.1f} {serial:>10.1f} {parallel:>12.1f}")
@@ -0,0 +1,223 @@
+import json
+import random
+import re
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from resume_app.json_extraction import JSONExtractionError, JSONExtractor, extract_json
+
+SEED_FILE = Path(__file__).resolve().parents[2] / 'ex-prompt-result.json'
+
+REWRITE_SEED = {
+    'rewritten_markdown': (
+        "# Jane Doe\nNairobi, Kenya | jane@example.com\n\n## Summary\nData engineer with 6+ years of "
+        "experience.\n\n## Experience\n### Senior Engineer\n**Acme** | 2020 – Present\n*   Cut ETL "
+        "runtime by 40% using Spark.\n*   Led a team of 5 \"data champions\".\n\n## Education\n### BSc "
+        "Computer Science\n**University of Nairobi** | 2016\n"
+    ),
+}
+
+
+def legacy_extract(text):
+    """The slicing and cleaning the flows used before json_extraction.py, for comparison."""
+    start, end = text.find('{'), text.rfind('}')
+    if start == -1 or end <= start:
+        raise ValueError("no JSON markers")
+    cleaned = re.sub(r'[\x00-\x1F\x7F]', '', text[start:end + 1].replace('\\\n', '\n'))
+    return json.loads(cleaned)
+
+
+def _strings(value, path=()):
+    """(path, string) for every string in a JSON value."""
+    if isinstance(value, str):
+        yield path, value
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            yield from _strings(item, path + (key,))
+    elif isinstance(value, list):
+        for index, item in enumerate(value):
+            yield from _strings(item, path + (index,))
+
+
+def _replace(value, path, new):
+    if not path:
+        return new
+    value = value.copy()
+    value[path[0]] = _replace(value[path[0]], path[1:], new)
+    return value
+
+
+def _leaves(value):
+    if isinstance(value, dict):
+        return [leaf for item in value.values() for leaf in _leaves(item)]
+    if isinstance(value, list):
+        return [leaf for item in value for leaf in _leaves(item)]
+    return [value]
+
+
+def _sample_strings(value, rng, count=3):
+    strings = list(_strings(value))
+    return rng.sample(strings, min(count, len(strings)))
+
+
+# Each mutation returns (reply text, the value it should parse to, or None
+# when the reply is cut off and only part of the value can come back).
+
+def m_clean(seed, rng):
+    return json.dumps(seed, indent=rng.choice([None, 2, 4]), ensure_ascii=False), seed
+
+
+def m_prose(seed, rng):
+    text = json.dumps(seed, indent=2, ensure_ascii=False)
+    before = rng.choice(["", "Here is the JSON {as requested}:\n", "Sure! ", "AI: "])
+    fence = rng.choice([("", ""), ("```json\n", "\n```"), ("```\n", "\n```")])
+    after = rng.choice(["", "\nLet me know if you need changes.", "\n\nNote: scores are {estimates}."])
+    return before + fence[0] + text + fence[1] + after, seed
+
+
+def m_raw_newlines(seed, rng):
+    expected = seed
+    for path, value in _sample_strings(seed, rng):
+        words = value.split(' ')
+        cut = rng.randrange(len(words) + 1)
+        expected = _replace(expected, path, ' '.join(words[:cut]) + '\n' + ' '.join(words[cut:]))
+    return json.dumps(expected, indent=2, ensure_ascii=False).replace('\\n', '\n'), expected
+
+
+def m_bad_escapes(seed, rng):
+    expected = seed
+    for path, value in _sample_strings(seed, rng):
+        expected = _replace(expected, path, value + rng.choice([' \\d+', ' C:\\Users\\cv', ' \\q']))
+    text = json.dumps(expected, indent=2, ensure_ascii=False).replace('\\\\', '\\')
+    return text, expected
+
+
+def m_inner_quotes(seed, rng):
+    text = json.dumps(seed, indent=2, ensure_ascii=False)
+    expected = json.loads(text.replace("'", '\\"'))
+    return text.replace("'", '"'), expected
+
+
+def m_trailing_commas(seed, rng):
+    text = json.dumps(seed, indent=2, ensure_ascii=False)
+    text = re.sub(r'(["\d\]}])(\n\s*[\]}])', lambda m: m.group(1) + ',' + m.group(2) if rng.random() < 0.5
+                  else m.group(0), text)
+    return text, seed
+
+
+def m_truncated(seed, rng):
+    text = json.dumps(seed, indent=2, ensure_ascii=False)
+    return text[:rng.randrange(len(text) // 10, len(text) - 1)], None
+
+
+def m_combined(seed, rng):
+    text, expected = m_raw_newlines(seed, rng)
+    text = "Here is the result:\n```json\n" + re.sub(r'(\d)(\n\s*})', r'\1,\2', text) + "\n```"
+    return text, expected
+
+
+MUTATIONS = {
+    'clean': m_clean,
+    'prose': m_prose,
+    'raw newlines': m_raw_newlines,
+    'bad escapes': m_bad_escapes,
+    'inner quotes': m_inner_quotes,
+    'trailing commas': m_trailing_commas,
+    'truncated': m_truncated,
+    'combined': m_combined,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Fuzzes json_extraction.py with replies mutated from ex-prompt-result.json "
+        "and a rewrite reply: prose and code fences around the object, raw "
+        "newlines, invalid escapes, unescaped quotes, trailing commas, cut-off "
+        "output. Reports how many are recovered, against the slicing the flows "
+        "used before, and the parse time whole and fed token by token."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--samples', type=int, default=200, help="Replies per mutation and seed.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--save', metavar='DIR', help="Write the corpus there, one reply per file.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        seeds = {'analysis': json.loads(SEED_FILE.read_text(encoding='utf-8')), 'rewrite': REWRITE_SEED}
+        corpus = [
+            (mutation, *MUTATIONS[mutation](seed, rng), seed)
+            for mutation in MUTATIONS
+            for seed in seeds.values()
+            for _ in range(options['samples'])
+        ]
+        if options['save']:
+            directory = Path(options['save'])
+            directory.mkdir(parents=True, exist_ok=True)
+            for number, (mutation, text, _, _) in enumerate(corpus):
+                (directory / f"{number:05d}-{mutation.replace(' ', '_')}.txt").write_text(text, encoding='utf-8')
+            self.stdout.write(f"Wrote {len(corpus)} replies to {directory}")
+
+        self.stdout.write(f"{'mutation':<16} {'replies':>7} {'recovered':>10} {'before':>8} {'leaves kept':>12}")
+        for mutation in MUTATIONS:
+            cases = [case for case in corpus if case[0] == mutation]
+            recovered = legacy = 0
+            kept = []
+            for _, text, expected, seed in cases:
+                try:
+                    value = extract_json(text)
+                except JSONExtractionError:
+                    value = None
+                try:
+                    legacy += legacy_extract(text) == (expected or seed)
+                except ValueError:
+                    pass
+                if expected is not None:
+                    recovered += value == expected
+                elif isinstance(value, dict):
+                    # A cut-off reply counts when everything before the value it
+                    # stopped in came back as it was.
+                    leaves, seed_leaves = _leaves(value), _leaves(seed)
+                    recovered += all(a == b for a, b in zip(leaves[:-1], seed_leaves))
+                    kept.append(len(leaves) / len(seed_leaves))
+            kept_share = f"{sum(kept) / len(kept):.0%}" if kept else ''
+            self.stdout.write(f"{mutation:<16} {len(cases):>7} {recovered / len(cases):>10.0%} "
+                              f"{legacy / len(cases):>8.0%} {kept_share:>12}")
+
+        texts = [text for _, text, _, _ in corpus]
+        size = sum(len(text) for text in texts) / 1024
+        for label, parse in (('whole reply', self.parse_whole), ('4-char tokens', self.parse_streamed),
+                             ('before (whole)', self.parse_legacy)):
+            started = time.perf_counter()
+            for text in texts:
+                parse(text)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"{label:<16} {elapsed * 1e6 / len(texts):>8.0f} µs per reply, "
+                              f"{size / elapsed / 1024:>6.1f} MB/s")
+
+    @staticmethod
+    def parse_whole(text):
+        try:
+            extract_json(text)
+        except JSONExtractionError:
+            pass
+
+    @staticmethod
+    def parse_streamed(text):
+        extractor = JSONExtractor()
+        for i in range(0, len(text), 4):
+            if extractor.feed(text[i:i + 4]) is not None:
+                return
+        try:
+            extractor.finish()
+        except JSONExtractionError:
+            pass
+
+    @staticmethod
+    def parse_legacy(text):
+        try:
+            legacy_extract(text)
+        except ValueError:
+            pass
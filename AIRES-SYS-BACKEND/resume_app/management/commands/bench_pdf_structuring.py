@@ -0,0 +1,82 @@
+import re
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from resume_app.pdf_render import preprocess_markdown, renderer_available, structure_html
+
+
+def build_markdown(roles, bullets=6):
+    """A long multi-role resume in the markdown layout the rewrite prompt asks for."""
+    lines = [
+        "# Jane Doe",
+        "Nairobi, Kenya | +254 700 000 000 | jane@example.com",
+        "",
+        "## Summary",
+        "Engineer with a long career across many teams.",
+        "",
+        "## Experience",
+    ]
+    for role in range(roles):
+        lines += [
+            f"### Senior Engineer {role % 7}",
+            f"**Company {role % 5}** | Nairobi | Jan {2000 + role % 20} – Dec {2001 + role % 20}",
+        ]
+        lines += [f"* Delivered project {bullet} with measurable impact." for bullet in range(bullets)]
+        lines.append("")
+    lines += ["## Education"]
+    for degree in range(max(2, roles // 10)):
+        lines += [f"### BSc Computer Science {degree}", "**University of Nairobi** | 2015", ""]
+    lines += ["## Projects", "### Resume Analyzer", "* Django and React.", ""]
+    return "\n".join(lines)
+
+
+def legacy_structure(html_content):
+    # The findall + replace loops generate_pdf used before structure_html().
+    html_content = re.sub(r'<h3>(.*?)</h3>', r'<h3 class="job-title">\1</h3>', html_content)
+    sections = re.findall(r'<h3 class="job-title">.*?(?=<h3 class="job-title">|<h2|$)', html_content, re.DOTALL)
+    for section in sections:
+        html_content = html_content.replace(section, f'<div class="job-entry">{section}</div>')
+    html_content = re.sub(r'<h3>(.*?University.*?|.*?College.*?|.*?School.*?|.*?Institute.*?)</h3>',
+                          r'<h3 class="education-title">\1</h3>', html_content)
+    sections = re.findall(r'<h3 class="education-title">.*?(?=<h3|<h2|$)', html_content, re.DOTALL)
+    for section in sections:
+        html_content = html_content.replace(section, f'<div class="education-entry">{section}</div>')
+    return html_content
+
+
+class Command(BaseCommand):
+    help = "Compares the legacy findall/replace HTML structuring with the single-pass structure_html()."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--roles', type=int, nargs='+', default=[5, 20, 80, 200])
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        if not renderer_available():
+            raise CommandError("markdown and xhtml2pdf must be installed.")
+        from markdown import markdown
+
+        def best_of(func, html):
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                func(html)
+                timings.append(time.perf_counter() - started)
+            return min(timings) * 1000
+
+        self.stdout.write(
+            f"{'roles':>6} {'html KB':>8} {'legacy ms':>10} {'single ms':>10} "
+            f"{'legacy divs':>12} {'single divs':>12}"
+        )
+        for roles in options['roles']:
+            html = markdown(preprocess_markdown(build_markdown(roles)), extensions=['fenced_code', 'tables', 'nl2br'])
+            legacy = best_of(legacy_structure, html)
+            single = best_of(structure_html, html)
+            # Repeated identical roles get wrapped again on every replace().
+            legacy_divs = legacy_structure(html).count('<div class=')
+            single_divs = structure_html(html).count('<div class=')
+            self.stdout.write(
+                f"{roles:>6} {len(html) / 1024:>8.1f} {legacy:>10.2f} {single:>10.2f} "
+                f"{legacy_divs:>12} {single_divs:>12}"
+            )
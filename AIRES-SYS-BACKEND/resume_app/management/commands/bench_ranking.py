@@ -0,0 +1,149 @@
+import math
+import statistics
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from resume_app.models import Resume, ResumeTermVector
+from resume_app.ranking import RankingIndex, pack_terms, term_counts
+
+SKILLS = """
+python django flask fastapi java spring kotlin scala go rust c++ c# .net javascript typescript
+react angular vue node.js html css sql postgresql mysql mongodb redis elasticsearch kafka rabbitmq
+aws azure gcp docker kubernetes terraform ansible jenkins git linux bash pandas numpy spark hadoop
+airflow tableau excel sap salesforce jira agile scrum kanban devops ci/cd microservices rest graphql
+machine learning tensorflow pytorch nlp statistics accounting audit cpa budgeting forecasting payroll
+recruitment onboarding marketing seo sem copywriting sales negotiation crm nursing pharmacy logistics
+procurement inventory autocad solidworks matlab figma photoshop illustrator ux ui leadership mentoring
+""".split()
+
+
+def synthetic_documents(count, rng, vocab_size=20000, length=350):
+    """Term counts of `count` resume-like documents: Zipf-distributed filler words plus some skills."""
+    docs = []
+    for _ in range(count):
+        words = rng.zipf(1.2, size=length) % vocab_size
+        terms, counts = np.unique(words, return_counts=True)
+        doc = {f"w{term}": int(n) for term, n in zip(terms, counts)}
+        for skill in rng.choice(SKILLS, size=rng.integers(5, 25), replace=False):
+            doc[str(skill)] = int(rng.integers(1, 4))
+        docs.append(doc)
+    return docs
+
+
+def job_description(rng, vocab_size=20000):
+    skills = rng.choice(SKILLS, size=rng.integers(4, 12), replace=False)
+    words = [f"w{term}" for term in rng.zipf(1.2, size=30) % vocab_size]
+    return " ".join(list(skills) * 2 + words)
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(share * len(values)))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures job-description ranking over a synthetic corpus: building the "
+        "in-memory BM25 index, ranking latency, incremental additions, and a "
+        "pure-Python scan of the same vectors for comparison. With --db the "
+        "vectors are written to the database (rolled back afterwards) and the "
+        "index is loaded from there, as a worker process does on its first ranking."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--resumes', type=int, default=100000)
+        parser.add_argument('--queries', type=int, default=50)
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--incremental', type=int, default=1000,
+                            help="Resumes added one at a time after the initial build.")
+        parser.add_argument('--db', action='store_true')
+        parser.add_argument('--skip-baseline', action='store_true')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        self.stdout.write(f"Generating {options['resumes']} documents...")
+        docs = synthetic_documents(options['resumes'], rng)
+        queries = [job_description(rng) for _ in range(options['queries'])]
+
+        if options['db']:
+            with transaction.atomic():
+                index, elapsed = self.load_from_db(docs)
+                transaction.set_rollback(True)
+            self.stdout.write(f"load from database      {elapsed:>8.2f} s")
+        else:
+            index = RankingIndex()
+            started = time.perf_counter()
+            index.add([(i + 1, sum(doc.values()), doc) for i, doc in enumerate(docs)])
+            self.stdout.write(f"build index             {time.perf_counter() - started:>8.2f} s")
+        self.stdout.write(f"index                   {index.stats()}")
+        self.report_queries("rank", index, queries, options['limit'])
+
+        extra = synthetic_documents(options['incremental'], rng)
+        timings = []
+        for i, doc in enumerate(extra):
+            started = time.perf_counter()
+            index.add([(len(docs) + i + 1, sum(doc.values()), doc)])
+            timings.append(time.perf_counter() - started)
+        if timings:
+            self.stdout.write(
+                f"add one resume          mean {statistics.mean(timings) * 1000:.2f} ms, "
+                f"max {max(timings) * 1000:.1f} ms; segments now {index.stats()['segments']}"
+            )
+            self.report_queries("rank after additions", index, queries, options['limit'])
+
+        if not options['skip_baseline']:
+            self.report_baseline(docs, queries[:3], options['limit'])
+
+    def load_from_db(self, docs):
+        resumes = Resume.objects.bulk_create(
+            [Resume(file=f"resumes/bench_{i}.pdf") for i in range(len(docs))], batch_size=2000
+        )
+        ResumeTermVector.objects.bulk_create([
+            ResumeTermVector(resume_id=resume.pk, length=sum(doc.values()), data=pack_terms(doc))
+            for resume, doc in zip(resumes, docs)
+        ], batch_size=2000)
+        index = RankingIndex()
+        started = time.perf_counter()
+        index.sync()
+        return index, time.perf_counter() - started
+
+    def report_queries(self, label, index, queries, limit):
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            index.rank(query, limit)
+            timings.append((time.perf_counter() - started) * 1000)
+        self.stdout.write(
+            f"{label:<23} p50 {percentile(timings, 0.5):.1f} ms, p95 {percentile(timings, 0.95):.1f} ms, "
+            f"max {max(timings):.1f} ms over {len(queries)} job descriptions"
+        )
+
+    def report_baseline(self, docs, queries, limit, k1=1.2, b=0.75):
+        # The same BM25 scores, computed by looping over every document.
+        df = {}
+        for doc in docs:
+            for term in doc:
+                df[term] = df.get(term, 0) + 1
+        lengths = [sum(doc.values()) for doc in docs]
+        avg_length = sum(lengths) / len(lengths)
+        timings = []
+        for query in queries:
+            counts = term_counts(query)[0]
+            started = time.perf_counter()
+            scores = []
+            for doc, length in zip(docs, lengths):
+                score = 0.0
+                for term, count in counts.items():
+                    tf = doc.get(term)
+                    if tf:
+                        idf = math.log(1 + (len(docs) - df[term] + 0.5) / (df[term] + 0.5))
+                        score += idf * (1 + math.log(count)) * tf * (k1 + 1) / (
+                            tf + k1 * (1 - b + b * length / avg_length))
+                scores.append(score)
+            sorted(range(len(scores)), key=scores.__getitem__, reverse=True)[:limit]
+            timings.append((time.perf_counter() - started) * 1000)
+        self.stdout.write(f"pure-Python scan         mean {statistics.mean(timings):.1f} ms")
@@ -0,0 +1,109 @@
+import statistics
+import time
+from collections import Counter
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from resume_app.management.commands.bench_ranking import SKILLS
+from resume_app.models import Resume, ResumeTermVector
+from resume_app.ranking import RankingIndex
+from resume_app.search import parse_query, search_resumes, use_postgres
+
+EMPLOYERS = "acme globex initech umbrella hooli vandelay stark wayne wonka soylent".split()
+
+QUERIES = [
+    'python',
+    'python django',
+    'react or angular',
+    '"machine learning"',
+    'java -spring',
+    'kubernetes terraform aws',
+    'globex',
+    'accounting cpa -intern',
+    'w3',
+    'w19000',
+]
+
+
+def synthetic_texts(count, rng, vocab_size=20000, length=120):
+    """Resume-like texts: Zipf-distributed filler words, some skills and an employer."""
+    vocabulary = np.array([f"w{i}" for i in range(vocab_size)])
+    texts = []
+    for _ in range(count):
+        words = vocabulary[rng.zipf(1.2, size=length) % vocab_size].tolist()
+        words += rng.choice(SKILLS, size=rng.integers(5, 15), replace=False).tolist()
+        words += rng.choice(EMPLOYERS, size=rng.integers(1, 3), replace=False).tolist()
+        if rng.random() < 0.05:
+            words.append('intern')
+        texts.append(" ".join(words))
+    return texts
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures full-text search latency over synthetic resumes at growing "
+        "corpus sizes, on the backend search.py uses: the GIN-indexed tsvector "
+        "column on PostgreSQL (rows are rolled back afterwards), the in-process "
+        "index elsewhere. Each query returns the match count and the first page."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+        parser.add_argument('--backend', choices=['auto', 'postgres', 'index'], default='auto')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        postgres = use_postgres() if options['backend'] == 'auto' else options['backend'] == 'postgres'
+        self.stdout.write(f"backend: {'postgres tsvector/GIN' if postgres else 'in-process index'}")
+        rng = np.random.default_rng(options['seed'])
+        if postgres:
+            with transaction.atomic():
+                self.run(options, rng, self.insert_rows, lambda query: search_resumes(query, options['limit']))
+                transaction.set_rollback(True)
+        else:
+            index = RankingIndex()
+
+            def add(texts, first_id):
+                index.add([
+                    (first_id + i, len(text.split()), Counter(text.split())) for i, text in enumerate(texts)
+                ])
+
+            def search(query):
+                groups, excluded = parse_query(query)
+                return index.search(groups, excluded, options['limit'])
+
+            self.run(options, rng, add, search)
+            self.stdout.write(f"index: {index.stats()}")
+
+    def run(self, options, rng, add, search):
+        loaded = 0
+        for size in sorted(options['sizes']):
+            started = time.perf_counter()
+            while loaded < size:
+                batch = min(20000, size - loaded)
+                add(synthetic_texts(batch, rng), loaded + 1)
+                loaded += batch
+            self.stdout.write(f"\n{size} resumes (loaded in {time.perf_counter() - started:.1f} s)")
+
+            medians = []
+            for query in QUERIES:
+                timings = []
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    count, _ = search(query)
+                    timings.append((time.perf_counter() - started) * 1000)
+                medians.append(statistics.median(timings))
+                self.stdout.write(f"  {query:<28} {count:>8} matches {medians[-1]:>8.2f} ms")
+            self.stdout.write(f"  {'median over queries':<28} {'':>16} {statistics.median(medians):>8.2f} ms")
+
+    def insert_rows(self, texts, first_id):
+        resumes = Resume.objects.bulk_create(
+            [Resume(file=f"resumes/bench_{first_id + i}.pdf") for i in range(len(texts))], batch_size=2000
+        )
+        ResumeTermVector.objects.bulk_create(
+            [ResumeTermVector.build(resume.pk, text) for resume, text in zip(resumes, texts)], batch_size=500
+        )
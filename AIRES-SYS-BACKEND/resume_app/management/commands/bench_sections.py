@@ -0,0 +1,63 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from resume_app.models import ResumeContent
+from resume_app.pdf_extraction import PDFExtractionError, extract_text
+from resume_app.sections import format_sections, parse_sections, sections_for_question
+from resume_app.services import ANALYSIS_SECTIONS
+
+QUESTIONS = [
+    'What skills should I add for a data engineering role?',
+    'How can I make my work experience more impactful?',
+    'Is my education section strong enough?',
+    'Which projects should I highlight?',
+    'How would you rate this CV overall?',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the resume text each LLM prompt carries: the raw extracted "
+        "text sent before, against the parsed sections sent now (all but "
+        "references for analysis, all for rewrites, the ones a question is "
+        "about for chat). Reads the PDFs given, or the stored resumes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='*', help="PDF files; defaults to stored resume text.")
+        parser.add_argument('--limit', type=int, default=1000, help="Stored resumes to read.")
+
+    def handle(self, *args, **options):
+        if options['files']:
+            texts = []
+            for path in options['files']:
+                try:
+                    with open(path, 'rb') as f:
+                        texts.append(extract_text(f))
+                except (OSError, PDFExtractionError) as e:
+                    raise CommandError(f"{path}: {e}")
+        else:
+            ids = ResumeContent.objects.filter(kind='text').values_list('resume_id', flat=True)[:options['limit']]
+            texts = list(ResumeContent.load_many(list(ids), 'text').values())
+        if not texts:
+            raise CommandError("No resume text to measure.")
+
+        raw = analysis = rewrite = chat = 0
+        timings = []
+        for text in texts:
+            started = time.perf_counter()
+            sections = parse_sections(text)
+            timings.append((time.perf_counter() - started) * 1000)
+            raw += len(text)
+            analysis += len(format_sections(sections, ANALYSIS_SECTIONS))
+            rewrite += len(format_sections(sections))
+            chat += sum(len(format_sections(sections, sections_for_question(q))) for q in QUESTIONS) / len(QUESTIONS)
+
+        self.stdout.write(f"{len(texts)} resumes, parse median {statistics.median(timings):.2f} ms, "
+                          f"max {max(timings):.2f} ms")
+        self.stdout.write(f"{'prompt':<10} {'raw chars':>10} {'sections':>10} {'saved':>7}  (~4 chars per token)")
+        for label, size in (('analysis', analysis), ('rewrite', rewrite), ('chat', chat)):
+            self.stdout.write(f"{label:<10} {raw / len(texts):>10.0f} {size / len(texts):>10.0f} "
+                              f"{1 - size / raw:>7.0%}")
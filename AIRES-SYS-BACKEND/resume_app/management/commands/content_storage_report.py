@@ -0,0 +1,64 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+from django.db.models.functions import Length
+
+from resume_app.models import Resume, ResumeContent
+
+
+class Command(BaseCommand):
+    help = (
+        "Reports the bytes saved by storing resume text, page text, sections, "
+        "analyses and rewrites compressed in ResumeContent, and times a resume "
+        "list query with and without reading those blobs, as every list query "
+        "did when they were columns of the resume row."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        totals = (
+            ResumeContent.objects.values('kind')
+            .annotate(rows=Count('id'), raw=Sum('size'), stored=Sum(Length('data')))
+            .order_by('kind')
+        )
+        self.stdout.write(f"{'kind':<18} {'rows':>6} {'raw KB':>10} {'stored KB':>10} {'saved':>7}")
+        raw_total = stored_total = 0
+        for row in totals:
+            raw_total += row['raw']
+            stored_total += row['stored']
+            self.stdout.write(
+                f"{row['kind']:<18} {row['rows']:>6} {row['raw'] / 1024:>10.1f} "
+                f"{row['stored'] / 1024:>10.1f} {1 - row['stored'] / row['raw']:>7.1%}"
+            )
+        if raw_total:
+            self.stdout.write(
+                f"{'total':<18} {'':>6} {raw_total / 1024:>10.1f} "
+                f"{stored_total / 1024:>10.1f} {1 - stored_total / raw_total:>7.1%}"
+            )
+
+        def best_of(func):
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                func()
+                timings.append(time.perf_counter() - started)
+            return min(timings) * 1000
+
+        def list_rows():
+            return list(Resume.objects.order_by('-uploaded_at'))
+
+        def list_rows_with_blobs():
+            # What the wide rows carried: every blob, uncompressed.
+            rows = list_rows()
+            for codec, data in ResumeContent.objects.values_list('codec', 'data').iterator():
+                ResumeContent.unpack(codec, data)
+            return rows
+
+        self.stdout.write(
+            f"\n{Resume.objects.count()} resumes\n"
+            f"list query, narrow row:       {best_of(list_rows):>8.2f} ms\n"
+            f"list query, with text blobs:  {best_of(list_rows_with_blobs):>8.2f} ms"
+        )
@@ -0,0 +1,106 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+
+GENERATED_TEXT = json.dumps({
+    "rewritten_markdown": "# Jane Doe\n## Experience\n*   Built things.",
+    "revised_markdown": "# Jane Doe\n## Experience\n*   Built better things.",
+    "scores": {"skills": 80, "experience": 75, "education": 70, "overall": 76},
+})
+
+
+def sse_body(text):
+    """The events of a streamed generation of `text`, one token per word, as the API sends them."""
+    words = text.split(' ')
+    events = [{"token": {"text": word if i == 0 else ' ' + word, "special": False}} for i, word in enumerate(words)]
+    events.append({"token": {"text": "</s>", "special": True}, "generated_text": text})
+    return "".join(f"data: {json.dumps(event)}\n\n" for event in events).encode('utf-8')
+
+
+def make_handler(latency, failures=(), retry_after=None, generated_text=None):
+    """
+    Handler class for the fake API. The first calls are answered with the
+    statuses in `failures` (with a Retry-After header when `retry_after` is
+    set), the rest succeed. Calls are recorded, in order, in the class's
+    `calls` list as (path, payload).
+    """
+    failures = list(failures)
+    lock = threading.Lock()
+    generated_text = generated_text if generated_text is not None else "AI: " + GENERATED_TEXT
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        calls = []
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, data, content_type='application/json', headers=None):
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'null')
+            with lock:
+                Handler.calls.append((self.path, payload))
+                failure = failures.pop(0) if failures else None
+            if failure is not None:
+                headers = {'Retry-After': f"{retry_after:g}"} if retry_after is not None else None
+                self._send(failure, json.dumps({"error": f"Fake failure {failure}"}).encode('utf-8'), headers=headers)
+                return
+            # Simulates the time the model spends generating.
+            time.sleep(latency)
+            if 'bart' in self.path:
+                body = {"labels": ["resume", "other"], "scores": [0.93, 0.07]}
+            elif isinstance(payload, dict) and payload.get('stream'):
+                self._send(200, sse_body(generated_text), content_type='text/event-stream')
+                return
+            else:
+                body = [{"generated_text": generated_text}]
+            self._send(200, json.dumps(body).encode('utf-8'))
+
+    return Handler
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs a stand-in for the Hugging Face inference API that answers every "
+        "call after a fixed latency. Point HF_INFERENCE_BASE_URL at "
+        "http://<host>:<port>/models to load-test without the real API. "
+        "--fail answers the first calls with error statuses, to try the "
+        "client's retries and circuit breaker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency', type=float, default=2.0,
+                            help="Seconds each call takes to answer.")
+        parser.add_argument('--fail', type=int, nargs='*', default=[],
+                            help="Statuses for the first calls, in order, e.g. --fail 503 503 429.")
+        parser.add_argument('--retry-after', type=float, default=None,
+                            help="Retry-After header sent with the --fail responses.")
+
+    def handle(self, *args, **options):
+        handler = make_handler(options['latency'], options['fail'], options['retry_after'])
+        server = ThreadingHTTPServer((options['host'], options['port']), handler)
+        server.daemon_threads = True
+        self.stdout.write(
+            f"Fake inference API on http://{options['host']}:{options['port']}/models "
+            f"({options['latency']}s latency)"
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
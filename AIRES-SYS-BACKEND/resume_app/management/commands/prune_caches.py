@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from resume_app.caching import analysis_cache, extraction_cache
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes expired rows of the persistent cache tables: analyses older "
+        "than ANALYSIS_CACHE_TTL and extracted documents not written for "
+        "EXTRACTION_CACHE_MAX_AGE seconds. Meant to run daily, e.g. from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--extraction-max-age', type=int,
+            default=getattr(settings, 'EXTRACTION_CACHE_MAX_AGE', 30 * 24 * 60 * 60),
+            help="Seconds after which a stored extraction is deleted.",
+        )
+        parser.add_argument('--dry-run', action='store_true', help="Only count the rows that would be deleted.")
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        analyses = analysis_cache.prune(dry_run=dry_run)
+        documents = extraction_cache.prune(options['extraction_max_age'], dry_run=dry_run)
+        verb = "Would delete" if dry_run else "Deleted"
+        self.stdout.write(f"{verb} {analyses} expired analyses and {documents} stale extracted documents.")
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from resume_app.jobs import worker_pool
+
+
+class Command(BaseCommand):
+    help = "Runs background job workers for queued analyze / rewrite / revise jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=None,
+                            help="Number of worker threads (defaults to JOB_WORKER_CONCURRENCY).")
+
+    def handle(self, *args, **options):
+        worker_pool.start(options['concurrency'])
+        self.stdout.write("Job workers running. Press Ctrl+C to stop.")
+        try:
+            worker_pool.join()
+        except KeyboardInterrupt:
+            worker_pool.stop()
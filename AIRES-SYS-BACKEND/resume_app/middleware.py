@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+
+
+class JSONGZipMiddleware(GZipMiddleware):
+    """
+    GZipMiddleware limited to JSON responses of at least GZIP_MIN_BYTES.
+    Resume text, analyses and rewrites compress several times over; PDFs are
+    already compressed and event streams must reach the client unbuffered,
+    so both are passed through untouched.
+    """
+
+    def process_response(self, request, response):
+        if response.streaming or not response.get('Content-Type', '').startswith('application/json'):
+            return response
+        if len(response.content) < getattr(settings, 'GZIP_MIN_BYTES', 1024):
+            return response
+        return super().process_response(request, response)
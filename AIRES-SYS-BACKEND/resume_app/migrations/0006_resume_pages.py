@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resume_app', '0005_extracteddocument'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='extracteddocument',
+            name='pages',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='resume',
+            name='pages',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
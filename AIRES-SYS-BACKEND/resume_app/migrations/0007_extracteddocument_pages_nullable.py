@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resume_app', '0006_resume_pages'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='extracteddocument',
+            name='pages',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resume_app', '0009_analysisresult'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['resume', 'created_at', 'id'], name='chatmessage_resume_created'),
+        ),
+    ]
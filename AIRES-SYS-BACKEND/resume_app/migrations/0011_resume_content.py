@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:35
+
+import zlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+CONTENT_FIELDS = ('text', 'analysis', 'rewritten_content')
+
+
+def move_content(apps, schema_editor):
+    # Same encoding as ResumeContent.pack(), frozen here.
+    Resume = apps.get_model('resume_app', 'Resume')
+    ResumeContent = apps.get_model('resume_app', 'ResumeContent')
+    batch = []
+    for resume in Resume.objects.only('id', *CONTENT_FIELDS).iterator(chunk_size=500):
+        for kind in CONTENT_FIELDS:
+            value = getattr(resume, kind)
+            if not value:
+                continue
+            raw = value.encode('utf-8')
+            compressed = zlib.compress(raw, 6)
+            codec, data = ('zlib', compressed) if len(compressed) < len(raw) else ('raw', raw)
+            batch.append(ResumeContent(resume_id=resume.id, kind=kind, codec=codec, data=data, size=len(raw)))
+        if len(batch) >= 500:
+            ResumeContent.objects.bulk_create(batch)
+            batch = []
+    ResumeContent.objects.bulk_create(batch)
+
+
+def restore_content(apps, schema_editor):
+    Resume = apps.get_model('resume_app', 'Resume')
+    ResumeContent = apps.get_model('resume_app', 'ResumeContent')
+    for content in ResumeContent.objects.iterator(chunk_size=500):
+        data = bytes(content.data)
+        if content.codec == 'zlib':
+            data = zlib.decompress(data)
+        Resume.objects.filter(id=content.resume_id).update(**{content.kind: data.decode('utf-8')})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resume_app', '0010_chatmessage_resume_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumeContent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=20)),
+                ('codec', models.CharField(default='zlib', max_length=8)),
+                ('data', models.BinaryField()),
+                ('size', models.PositiveIntegerField(default=0)),
+                ('resume', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contents', to='resume_app.resume')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('resume', 'kind'), name='resumecontent_resume_kind')],
+            },
+        ),
+        migrations.RunPython(move_content, restore_content),
+        migrations.RemoveField(
+            model_name='resume',
+            name='analysis',
+        ),
+        migrations.RemoveField(
+            model_name='resume',
+            name='rewritten_content',
+        ),
+        migrations.RemoveField(
+            model_name='resume',
+            name='text',
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def seed_history(apps, schema_editor):
+    # Existing rewrites become version 1 of their resume's history; the
+    # stored content is already in the snapshot encoding.
+    ResumeContent = apps.get_model('resume_app', 'ResumeContent')
+    ResumeRevision = apps.get_model('resume_app', 'ResumeRevision')
+    batch = []
+    for content in ResumeContent.objects.filter(kind='rewritten_content').iterator(chunk_size=500):
+        batch.append(ResumeRevision(
+            resume_id=content.resume_id, number=1, kind='snapshot', codec=content.codec,
+            data=content.data, size=content.size, source='rewrite',
+        ))
+        if len(batch) >= 500:
+            ResumeRevision.objects.bulk_create(batch)
+            batch = []
+    ResumeRevision.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resume_app', '0011_resume_content'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumeRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField()),
+                ('depth', models.PositiveSmallIntegerField(default=0)),
+                ('kind', models.CharField(choices=[('snapshot', 'Snapshot'), ('delta', 'Delta')], max_length=10)),
+                ('codec', models.CharField(default='zlib', max_length=8)),
+                ('data', models.BinaryField()),
+                ('size', models.PositiveIntegerField(default=0)),
+                ('source', models.CharField(choices=[('rewrite', 'Rewrite'), ('revise', 'Revise')], max_length=10)),
+                ('feedback', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('parent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='children', to='resume_app.resumerevision')),
+                ('resume', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='resume_app.resume')),
+                ('snapshot', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='resume_app.resumerevision')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('resume', 'number'), name='resumerevision_resume_number')],
+            },
+        ),
+        migrations.RunPython(seed_history, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:48
+
+import json
+import re
+import zlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The tokenizer and vector encoding of resume_app.ranking as of this
+# migration, frozen here so later changes to them cannot alter what it does.
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:\+\+|#|(?:\.[a-z0-9]+)+)?")
+
+STOP_WORDS = frozenset("""
+a about above after again all also am an and any are as at be because been before
+being below between both but by can could did do does doing down during each etc
+few for from further had has have having he her here hers him his how i if in into
+is it its itself just me more most my no nor not now of off on once only or other
+our ours out over own per same she should so some such than that the their theirs
+them then there these they this those through to too under until up very via was
+we were what when where which while who whom why will with within would you your
+""".split())
+
+
+def term_counts(text):
+    counts = {}
+    for term in TOKEN_RE.findall(text.lower()):
+        if term not in STOP_WORDS and not term.isdigit():
+            counts[term] = counts.get(term, 0) + 1
+    return counts, sum(counts.values())
+
+
+def pack_terms(counts):
+    return zlib.compress(json.dumps(counts, separators=(',', ':')).encode('utf-8'))
+
+
+def index_existing(apps, schema_editor):
+    ResumeContent = apps.get_model('resume_app', 'ResumeContent')
+    ResumeTermVector = apps.get_model('resume_app', 'ResumeTermVector')
+    batch = []
+    for content in ResumeContent.objects.filter(kind='text').iterator(chunk_size=500):
+        data = bytes(content.data)
+        if content.codec == 'zlib':
+            data = zlib.decompress(data)
+        counts, length = term_counts(data.decode('utf-8'))
+        batch.append(ResumeTermVector(resume_id=content.resume_id, length=length, data=pack_terms(counts)))
+        if len(batch) >= 500:
+            ResumeTermVector.objects.bulk_create(batch)
+            batch = []
+    ResumeTermVector.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resume_app', '0012_resumerevision'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumeTermVector',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('length', models.PositiveIntegerField(default=0)),
+                ('data', models.BinaryField()),
+                ('resume', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='term_vector', to='resume_app.resume')),
+            ],
+        ),
+        migrations.RunPython(index_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:00
+
+import zlib
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+
+def index_text(apps, schema_editor):
+    # The tsvector column is only used, and only indexed, on PostgreSQL.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        "CREATE INDEX resumetermvector_search_gin ON resume_app_resumetermvector USING gin (search_vector)"
+    )
+    ResumeContent = apps.get_model('resume_app', 'ResumeContent')
+    config = getattr(settings, 'SEARCH_CONFIG', 'english')
+    with schema_editor.connection.cursor() as cursor:
+        for content in ResumeContent.objects.filter(kind='text').iterator(chunk_size=500):
+            data = bytes(content.data)
+            if content.codec == 'zlib':
+                data = zlib.decompress(data)
+            cursor.execute(
+                "UPDATE resume_app_resumetermvector SET search_vector = to_tsvector(%s::regconfig, %s) "
+                "WHERE resume_id = %s",
+                [config, data.decode('utf-8').replace('\x00', ' '), content.resume_id],
+            )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS resumetermvector_search_gin")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resume_app', '0013_resumetermvector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resumetermvector',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(index_text, drop_index),
+    ]
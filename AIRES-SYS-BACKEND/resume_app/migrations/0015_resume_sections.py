@@ -0,0 +1,156 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:10
+
+import json
+import re
+import zlib
+
+from django.db import migrations
+
+# The section parser of resume_app.sections as of this migration (and the
+# headings of resume_app.classifier it uses), frozen here so later changes
+# to them cannot alter what it does.
+SECTIONS_VERSION = 1
+
+SECTION_HEADINGS = {
+    'experience': r"(?:work |professional |relevant )?experience|employment(?: history)?|work history|career history",
+    'education': r"education(?:al background)?|academic (?:background|qualifications)|qualifications",
+    'skills': r"(?:technical |key |core )?skills|core competencies|competencies|technologies",
+    'summary': r"(?:professional )?summary|profile|(?:career )?objective|about me",
+    'projects': r"(?:personal |selected )?projects",
+    'certifications': r"certifications?|licen[cs]es(?: (?:&|and) certifications)?|courses",
+    'awards': r"awards|honou?rs|achievements|accomplishments",
+    'languages': r"languages",
+    'references': r"references|referees",
+    'activities': r"volunteer(?:ing| experience)?|interests|hobbies|extracurricular activities",
+}
+
+SECTION_TITLES = {
+    'contact': 'Contact',
+    'summary': 'Summary',
+    'skills': 'Skills',
+    'experience': 'Experience',
+    'education': 'Education',
+    'projects': 'Projects',
+    'certifications': 'Certifications',
+    'awards': 'Awards',
+    'languages': 'Languages',
+    'activities': 'Activities',
+    'references': 'References',
+    'other': 'Other',
+}
+
+_HEADING_RE = re.compile(
+    r"^[ \t]*(?:%s)[ \t]*(?:[:|–-][ \t]*(?P<rest>.*?))?[ \t]*$" % "|".join(
+        f"(?P<{name}>{pattern})" for name, pattern in SECTION_HEADINGS.items()
+    ),
+    re.IGNORECASE | re.MULTILINE,
+)
+_EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+_PHONE_RE = re.compile(r"(?:\+?\d{1,3}[ .-]*)?(?:\(\d{2,4}\)|\d{2,4})[ .-]*\d{3,4}[ .-]*\d{3,4}")
+_LINK_RE = re.compile(r"(?:https?://)?(?:www\.)?(?:linkedin\.com|github\.com|gitlab\.com)/[\w/.-]+", re.IGNORECASE)
+_SPACES_RE = re.compile(r"[ \t ]+")
+_BULLET_RE = re.compile(r"^[•●▪◦■➢►‣∙·*]\s*")
+
+
+
+def _compact(text):
+    """Strips lines, collapses runs of spaces, drops blank lines and normalises bullets to '- '."""
+    lines = []
+    for line in text.splitlines():
+        line = _SPACES_RE.sub(' ', line).strip()
+        if line:
+            lines.append(_BULLET_RE.sub('- ', line))
+    return '\n'.join(lines)
+
+
+def _parse_header(header):
+    """
+    Splits the text before the first heading into contact details and body
+    text. Contact lines are short lines near the top (name, title,
+    location) and any line with an email address, phone number or profile
+    link.
+    """
+    contact_lines, body_lines = [], []
+    for i, line in enumerate(_compact(header).splitlines()):
+        has_details = _EMAIL_RE.search(line) or _PHONE_RE.search(line) or _LINK_RE.search(line)
+        if has_details or (i < 6 and len(line.split()) <= 6 and not line.endswith(('.', ':'))):
+            contact_lines.append(line)
+        else:
+            body_lines.append(line)
+
+    text = '\n'.join(contact_lines)
+    name = next((line for line in contact_lines
+                 if len(line.split()) <= 5 and not re.search(r"[\d@/|:]", line)), '')
+    contact = {
+        'name': name,
+        'emails': _EMAIL_RE.findall(text),
+        'phones': [phone.strip() for phone in _PHONE_RE.findall(text)],
+        'links': _LINK_RE.findall(text),
+        'text': text,
+    }
+    return contact, '\n'.join(body_lines)
+
+
+def parse_sections(text):
+    """
+    Returns the sections of a resume text as
+    {'version': ..., 'contact': {...}, 'summary': '...', 'skills': '...', ...}.
+    Only sections with content are present. Text before the first heading
+    that is not contact information becomes the summary (or 'other' when
+    the resume has a summary section), so no text is lost.
+    """
+    matches = list(_HEADING_RE.finditer(text))
+    header_end = matches[0].start() if matches else len(text)
+    contact, header_body = _parse_header(text[:header_end])
+
+    parts = {}
+    for i, match in enumerate(matches):
+        kind = next(name for name in SECTION_HEADINGS if match.group(name))
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        body = _compact((match.group('rest') or '') + '\n' + text[match.end():end])
+        if body:
+            parts.setdefault(kind, []).append(body)
+
+    sections = {'version': SECTIONS_VERSION}
+    if any(contact[key] for key in ('name', 'emails', 'phones', 'links', 'text')):
+        sections['contact'] = contact
+    if header_body:
+        parts.setdefault('other' if 'summary' in parts else 'summary', []).insert(0, header_body)
+    for kind in SECTION_TITLES:
+        if kind in parts:
+            sections[kind] = '\n'.join(parts[kind])
+    return sections
+
+
+def parse_existing(apps, schema_editor):
+    # Same encoding as ResumeContent.pack(), frozen here.
+    ResumeContent = apps.get_model('resume_app', 'ResumeContent')
+    batch = []
+    for content in ResumeContent.objects.filter(kind='text').iterator(chunk_size=500):
+        data = bytes(content.data)
+        if content.codec == 'zlib':
+            data = zlib.decompress(data)
+        raw = json.dumps(parse_sections(data.decode('utf-8')), ensure_ascii=False).encode('utf-8')
+        compressed = zlib.compress(raw, 6)
+        codec, data = ('zlib', compressed) if len(compressed) < len(raw) else ('raw', raw)
+        batch.append(ResumeContent(resume_id=content.resume_id, kind='sections', codec=codec, data=data,
+                                   size=len(raw)))
+        if len(batch) >= 500:
+            ResumeContent.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    ResumeContent.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def remove_sections(apps, schema_editor):
+    apps.get_model('resume_app', 'ResumeContent').objects.filter(kind='sections').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resume_app', '0014_resumetermvector_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(parse_existing, remove_sections),
+    ]
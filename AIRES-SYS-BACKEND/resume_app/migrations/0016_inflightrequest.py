@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resume_app', '0015_resume_sections'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InflightRequest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=200, unique=True)),
+                ('owner', models.CharField(max_length=32)),
+                ('status', models.CharField(default='running', max_length=10)),
+                ('result', models.JSONField(blank=True, null=True)),
+                ('result_status', models.IntegerField(blank=True, null=True)),
+                ('lease_until', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:05
+
+import json
+import zlib
+
+from django.db import migrations
+
+
+def move_pages(apps, schema_editor):
+    # Same encoding as the Resume.pages property and ResumeContent.pack(), frozen here.
+    Resume = apps.get_model('resume_app', 'Resume')
+    ResumeContent = apps.get_model('resume_app', 'ResumeContent')
+    batch = []
+    for resume in Resume.objects.only('id', 'pages').iterator(chunk_size=500):
+        if not resume.pages:
+            continue
+        raw = json.dumps(resume.pages, ensure_ascii=False).encode('utf-8')
+        compressed = zlib.compress(raw, 6)
+        codec, data = ('zlib', compressed) if len(compressed) < len(raw) else ('raw', raw)
+        batch.append(ResumeContent(resume_id=resume.id, kind='pages', codec=codec, data=data, size=len(raw)))
+        if len(batch) >= 500:
+            ResumeContent.objects.bulk_create(batch)
+            batch = []
+    ResumeContent.objects.bulk_create(batch)
+
+
+def restore_pages(apps, schema_editor):
+    Resume = apps.get_model('resume_app', 'Resume')
+    ResumeContent = apps.get_model('resume_app', 'ResumeContent')
+    for content in ResumeContent.objects.filter(kind='pages').iterator(chunk_size=500):
+        data = bytes(content.data)
+        if content.codec == 'zlib':
+            data = zlib.decompress(data)
+        Resume.objects.filter(id=content.resume_id).update(pages=json.loads(data.decode('utf-8')))
+    ResumeContent.objects.filter(kind='pages').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resume_app', '0017_job_heartbeat_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_pages, restore_pages),
+        migrations.RemoveField(
+            model_name='resume',
+            name='pages',
+        ),
+    ]
@@ -1,20 +1,275 @@
-from django.db import models
+import json
+import uuid
+import zlib
+
+from django.conf import settings
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+from django.contrib.postgres.search import SearchVectorField
+
+from .ranking import pack_terms, term_counts
+from .search import search_vector
+from .sections import parse_sections
+
+
+def _content_property(kind, structured=None):
+    """
+    Attribute for a text blob kept in ResumeContent. It reads as a plain
+    string (decoded from JSON when `structured` is given, the type of the
+    empty value, e.g. dict), loaded and decompressed on first access;
+    assigned values are written to the side table when the resume is saved.
+    """
+    def getter(self):
+        content = self.__dict__.setdefault('_content', {})
+        if kind not in content:
+            content[kind] = ResumeContent.load(self.pk, kind) if self.pk else ''
+        if structured:
+            return json.loads(content[kind]) if content[kind] else structured()
+        return content[kind]
+
+    def setter(self, value):
+        if structured:
+            value = json.dumps(value, ensure_ascii=False) if value else ''
+        self.__dict__.setdefault('_content', {})[kind] = value or ''
+        self.__dict__.setdefault('_content_dirty', set()).add(kind)
+
+    return property(getter, setter)
+
 
 class Resume(models.Model):
+    # Unbounded text lives compressed in ResumeContent, off the main row.
+    CONTENT_FIELDS = ('text', 'pages', 'analysis', 'rewritten_content', 'sections')
+
     user = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
     file = models.FileField(upload_to='resumes/')
-    text = models.TextField(blank=True)
-    analysis = models.TextField(blank=True)
+    text = _content_property('text')
+    # Per-page text, so consumers never need to re-open the uploaded file.
+    pages = _content_property('pages', structured=list)
+    # The text split into contact, summary, skills, experience, ... (sections.py),
+    # parsed whenever the text is saved; prompts are built from it.
+    sections = _content_property('sections', structured=dict)
+    analysis = _content_property('analysis')
     uploaded_at = models.DateTimeField(auto_now_add=True)
     # Add these new fields for resume rewriting functionality
-    rewritten_content = models.TextField(blank=True)
+    rewritten_content = _content_property('rewritten_content')
     last_revision_date = models.DateTimeField(null=True, blank=True)
     revision_count = models.IntegerField(default=0)
 
     def __str__(self):
         return f"Resume {self.id} - {self.user or 'Anonymous'}"
 
+    def save(self, *args, **kwargs):
+        """
+        Saves the row and any content assigned since it was loaded. Content
+        names in update_fields limit which of those blobs are written.
+        """
+        dirty = self.__dict__.get('_content_dirty', set())
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            kinds = dirty & update_fields
+            # An empty update_fields makes Model.save() a no-op.
+            kwargs['update_fields'] = update_fields - set(self.CONTENT_FIELDS)
+        else:
+            kinds = set(dirty)
+        if 'text' in kinds:
+            self.sections = parse_sections(self._content['text'])
+            kinds.add('sections')
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if kinds:
+                ResumeContent.store(self.pk, {kind: self._content[kind] for kind in kinds})
+            if 'text' in kinds:
+                ResumeTermVector.store(self.pk, self._content['text'])
+        dirty -= kinds
+
+    @classmethod
+    def bulk_create_with_content(cls, resumes, batch_size=None):
+        """
+        bulk_create() for new resumes, also writing the content assigned to
+        them. Needs a backend that returns primary keys from bulk inserts
+        (PostgreSQL, SQLite, MariaDB).
+        """
+        for resume in resumes:
+            if 'text' in resume.__dict__.get('_content_dirty', ()):
+                resume.sections = parse_sections(resume._content['text'])
+        with transaction.atomic():
+            resumes = cls.objects.bulk_create(resumes, batch_size=batch_size)
+            contents = []
+            vectors = []
+            for resume in resumes:
+                for kind in resume.__dict__.pop('_content_dirty', ()):
+                    value = resume._content[kind]
+                    if value:
+                        codec, data = ResumeContent.pack(value)
+                        contents.append(ResumeContent(
+                            resume_id=resume.pk, kind=kind, codec=codec, data=data,
+                            size=len(value.encode('utf-8')),
+                        ))
+                        if kind == 'text':
+                            vectors.append(ResumeTermVector.build(resume.pk, value))
+            ResumeContent.objects.bulk_create(contents, batch_size=batch_size)
+            ResumeTermVector.objects.bulk_create(vectors, batch_size=batch_size)
+        return resumes
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        if fields is None or set(fields) & set(self.CONTENT_FIELDS):
+            self.__dict__.pop('_content', None)
+            self.__dict__.pop('_content_dirty', None)
+            if fields is not None:
+                fields = [name for name in fields if name not in self.CONTENT_FIELDS]
+                if not fields:
+                    return
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+
+
+class ResumeContent(models.Model):
+    """
+    The large text blobs of a Resume (Resume.CONTENT_FIELDS), one row per
+    resume and kind, zlib-compressed. A missing row means an empty string.
+    """
+    CODEC_RAW = 'raw'
+    CODEC_ZLIB = 'zlib'
+
+    resume = models.ForeignKey(Resume, on_delete=models.CASCADE, related_name='contents')
+    kind = models.CharField(max_length=20)
+    codec = models.CharField(max_length=8, default=CODEC_ZLIB)
+    data = models.BinaryField()
+    # Uncompressed UTF-8 length, for reporting.
+    size = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['resume', 'kind'], name='resumecontent_resume_kind'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} of resume {self.resume_id} ({self.size} bytes)"
+
+    @classmethod
+    def pack(cls, value):
+        """Returns (codec, data) for a string; short texts that do not shrink stay raw."""
+        raw = value.encode('utf-8')
+        compressed = zlib.compress(raw, getattr(settings, 'RESUME_CONTENT_COMPRESSION_LEVEL', 6))
+        if len(compressed) < len(raw):
+            return cls.CODEC_ZLIB, compressed
+        return cls.CODEC_RAW, raw
+
+    @classmethod
+    def unpack(cls, codec, data):
+        data = bytes(data)
+        if codec == cls.CODEC_ZLIB:
+            data = zlib.decompress(data)
+        return data.decode('utf-8')
+
+    @classmethod
+    def load(cls, resume_id, kind):
+        row = cls.objects.filter(resume_id=resume_id, kind=kind).values_list('codec', 'data').first()
+        return cls.unpack(*row) if row else ''
+
+    @classmethod
+    def load_many(cls, resume_ids, kind):
+        """{resume_id: text} for the resumes that have content of this kind."""
+        rows = cls.objects.filter(resume_id__in=resume_ids, kind=kind).values_list('resume_id', 'codec', 'data')
+        return {resume_id: cls.unpack(codec, data) for resume_id, codec, data in rows}
+
+    @classmethod
+    def store(cls, resume_id, values):
+        """Writes {kind: text} for one resume: a single upsert, plus a delete for emptied kinds."""
+        empty = [kind for kind, value in values.items() if not value]
+        if empty:
+            cls.objects.filter(resume_id=resume_id, kind__in=empty).delete()
+        rows = []
+        for kind, value in values.items():
+            if value:
+                codec, data = cls.pack(value)
+                rows.append(cls(resume_id=resume_id, kind=kind, codec=codec, data=data,
+                                size=len(value.encode('utf-8'))))
+        if rows:
+            cls.objects.bulk_create(
+                rows, update_conflicts=True,
+                unique_fields=['resume', 'kind'], update_fields=['codec', 'data', 'size'],
+            )
+
+
+class ResumeTermVector(models.Model):
+    """
+    Term counts of a resume's text, for ranking resumes against a job
+    description (ranking.py), and on PostgreSQL its tsvector for full-text
+    search (search.py). Written whenever the text is saved. Rows are
+    replaced rather than updated, so a new id is all an index needs to see.
+    """
+    resume = models.OneToOneField(Resume, on_delete=models.CASCADE, related_name='term_vector')
+    # Number of terms counted, the document length for BM25.
+    length = models.PositiveIntegerField(default=0)
+    # zlib-compressed JSON {term: count}
+    data = models.BinaryField()
+    # Filled by PostgreSQL on insert and GIN-indexed there (migration 0014);
+    # null on other databases.
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    def __str__(self):
+        return f"Term vector of resume {self.resume_id} ({self.length} terms)"
+
+    @classmethod
+    def build(cls, resume_id, text):
+        counts, length = term_counts(text)
+        return cls(resume_id=resume_id, length=length, data=pack_terms(counts),
+                   search_vector=search_vector(text))
+
+    @classmethod
+    def store(cls, resume_id, text):
+        cls.objects.filter(resume_id=resume_id).delete()
+        if text:
+            cls.build(resume_id, text).save()
+
+
+class ResumeRevision(models.Model):
+    """
+    One version of a resume's rewritten content. Most versions are stored as
+    a line delta against their parent; a full snapshot starts each chain, so
+    rebuilding any version applies at most REVISION_SNAPSHOT_INTERVAL deltas.
+    See revisions.py.
+    """
+    KIND_SNAPSHOT = 'snapshot'
+    KIND_DELTA = 'delta'
+    KIND_CHOICES = (
+        (KIND_SNAPSHOT, 'Snapshot'),
+        (KIND_DELTA, 'Delta'),
+    )
+    SOURCE_CHOICES = (
+        ('rewrite', 'Rewrite'),
+        ('revise', 'Revise'),
+    )
+    resume = models.ForeignKey(Resume, on_delete=models.CASCADE, related_name='revisions')
+    # 1, 2, 3, ... per resume
+    number = models.PositiveIntegerField()
+    parent = models.ForeignKey('self', null=True, blank=True, on_delete=models.CASCADE, related_name='children')
+    # The snapshot this version's delta chain starts from; null for snapshots.
+    snapshot = models.ForeignKey('self', null=True, blank=True, on_delete=models.CASCADE, related_name='+')
+    # Deltas between this version and its snapshot.
+    depth = models.PositiveSmallIntegerField(default=0)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    # Snapshots use the ResumeContent encoding; deltas are zlib-compressed JSON.
+    codec = models.CharField(max_length=8, default=ResumeContent.CODEC_ZLIB)
+    data = models.BinaryField()
+    # Length of the full text of this version.
+    size = models.PositiveIntegerField(default=0)
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES)
+    feedback = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['resume', 'number'], name='resumerevision_resume_number'),
+        ]
+
+    def __str__(self):
+        return f"Resume {self.resume_id} v{self.number} ({self.kind})"
+
 class ChatMessage(models.Model):
     SENDER_CHOICES = (
         ('user', 'User'),
@@ -26,7 +281,110 @@ class ChatMessage(models.Model):
     message = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Backs the keyset pagination of a resume's conversation.
+            models.Index(fields=['resume', 'created_at', 'id'], name='chatmessage_resume_created'),
+        ]
+
     def __str__(self):
         return f"{self.sender}: {self.message[:30]}"
 
 
+class ExtractedDocument(models.Model):
+    """
+    Persistent tier of the extraction cache: the text and classification
+    result for an uploaded file, keyed by the SHA-256 of its bytes.
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    text = models.TextField(blank=True)
+    # Null until the whole document has been extracted.
+    pages = models.JSONField(null=True, blank=True)
+    classification = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"ExtractedDocument {self.sha256[:12]}"
+
+
+class AnalysisResult(models.Model):
+    """
+    Persistent tier of the analysis cache. cache_key hashes the normalized
+    resume text together with the prompt version and model id.
+    """
+    cache_key = models.CharField(max_length=64, unique=True)
+    prompt_version = models.CharField(max_length=64)
+    model_id = models.CharField(max_length=200)
+    analysis = models.TextField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"AnalysisResult {self.cache_key[:12]} ({self.model_id})"
+
+
+class Job(models.Model):
+    """
+    A long-running LLM request (analyze / rewrite / revise) queued for the
+    background workers in jobs.py. Clients poll it by id for the result.
+    """
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+    )
+    TYPE_CHOICES = (
+        ('analyze', 'Analyze'),
+        ('rewrite', 'Rewrite'),
+        ('revise', 'Revise'),
+    )
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    job_type = models.CharField(max_length=20, choices=TYPE_CHOICES)
+    params = models.JSONField(default=dict, blank=True)
+    user = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    result = models.JSONField(null=True, blank=True)
+    # HTTP status the equivalent synchronous endpoint would have returned.
+    result_status = models.IntegerField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Refreshed by the worker running the job; a running job whose heartbeat
+    # stops is re-queued (see jobs.py).
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'created_at'])]
+
+    def __str__(self):
+        return f"Job {self.id} - {self.job_type} ({self.status})"
+
+
+class InflightRequest(models.Model):
+    """
+    Lease on an analyze / rewrite / revise request while it runs
+    (coalescing.py), keyed by endpoint, resume id and a hash of the inputs.
+    Duplicate requests, from any worker process, wait here for the leader's
+    result instead of calling the model again.
+    """
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+
+    key = models.CharField(max_length=200, unique=True)
+    # Random token of the request holding the lease.
+    owner = models.CharField(max_length=32)
+    status = models.CharField(max_length=10, default=STATUS_RUNNING)
+    result = models.JSONField(null=True, blank=True)
+    result_status = models.IntegerField(null=True, blank=True)
+    # While running, when the leader is presumed dead and may be replaced;
+    # once done, until when its result is served to repeats.
+    lease_until = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"InflightRequest {self.key} ({self.status})"
@@ -0,0 +1,82 @@
+"""
+Keyset (cursor) pagination on (created_at, id).
+
+Pages are selected with a range condition on the composite key instead of an
+OFFSET, so fetching any page costs the same however long the conversation
+is, and rows inserted meanwhile never shift a page.
+"""
+import base64
+import binascii
+import re
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+# A UTC offset whose '+' arrived as a space because the timestamp was put in
+# the query string unencoded ("...10:00:00 00:00").
+_SPACED_OFFSET_RE = re.compile(r"^(.*[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?) (\d{2}(?::?\d{2})?)$")
+
+
+def encode_cursor(created_at, pk):
+    raw = f"{created_at.isoformat()}|{pk}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(value, allow_timestamp=False):
+    """
+    Returns (created_at, pk) for a cursor from encode_cursor(). With
+    allow_timestamp an ISO 8601 timestamp is accepted too and returns
+    (timestamp, None); an unencoded '+' in its offset is accepted as a space.
+    """
+    if allow_timestamp:
+        timestamp = parse_datetime(_SPACED_OFFSET_RE.sub(r"\1+\2", value.strip()))
+        if timestamp is not None:
+            return timestamp, None
+    try:
+        raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)).decode('utf-8')
+        created_at, pk = raw.rsplit('|', 1)
+        created_at = parse_datetime(created_at)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor(f"Invalid cursor: {value!r}")
+    if created_at is None:
+        raise InvalidCursor(f"Invalid cursor: {value!r}")
+    return created_at, pk
+
+
+def _after(created_at, pk):
+    if pk is None:
+        return Q(created_at__gt=created_at)
+    return Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+
+
+def _before(created_at, pk):
+    if pk is None:
+        return Q(created_at__lt=created_at)
+    return Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+
+
+def keyset_page(queryset, limit, before=None, since=None):
+    """
+    Returns (rows, has_more) with rows in ascending (created_at, id) order.
+
+    With `since`, the first `limit` rows after it; has_more means newer rows
+    remain. Otherwise the last `limit` rows before `before` (or the newest
+    rows when it is None); has_more means older rows remain.
+    """
+    if since is not None:
+        rows = list(queryset.filter(_after(*since)).order_by('created_at', 'id')[:limit + 1])
+        return rows[:limit], len(rows) > limit
+
+    if before is not None:
+        queryset = queryset.filter(_before(*before))
+    rows = list(queryset.order_by('-created_at', '-id')[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    rows.reverse()
+    return rows, has_more
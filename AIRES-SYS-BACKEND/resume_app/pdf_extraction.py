@@ -0,0 +1,296 @@
+import io
+import multiprocessing
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_EXCEPTION
+
+import PyPDF2
+from django.conf import settings
+
+
+PAGE_SEPARATOR = "\n"
+
+
+class PDFExtractionError(Exception):
+    """Raised when a PDF is over the page cap, times out or cannot be read."""
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _worker_count():
+    return _setting('PDF_EXTRACTION_WORKERS', None) or min(4, os.cpu_count() or 1)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+# The pool each submit_extraction() future runs in, for stop_extractions().
+_future_pools = weakref.WeakKeyDictionary()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Workers are spawned, not forked: a fork of the threaded web
+            # process copies whatever locks its other threads hold.
+            _pool = ProcessPoolExecutor(
+                max_workers=_worker_count(), mp_context=multiprocessing.get_context('spawn')
+            )
+        return _pool
+
+
+def _recycle_pool(pool):
+    """
+    Kills the workers of `pool`, some of which are stuck on pages that blew
+    the time budget, and lets the next extraction start a fresh pool. Other
+    documents in flight in it fail and are reported as unreadable.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    # A running task cannot be cancelled; only its process can be stopped.
+    for process in list((pool._processes or {}).values()):
+        process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _extract_range(data, start, stop):
+    # Runs in a worker process: each worker parses the document once and
+    # extracts its contiguous slice of pages.
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def _page_ranges(page_count, chunks):
+    size, extra = divmod(page_count, chunks)
+    start = 0
+    for i in range(chunks):
+        stop = start + size + (1 if i < extra else 0)
+        if stop > start:
+            yield start, stop
+        start = stop
+
+
+def _read_bytes(source):
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    source.seek(0)
+    data = source.read()
+    source.seek(0)
+    return data
+
+
+def _limits(max_pages, time_budget):
+    return (
+        max_pages or _setting('PDF_MAX_PAGES', 50),
+        time_budget or _setting('PDF_EXTRACTION_TIME_BUDGET', 20),
+    )
+
+
+def _open_reader(data, max_pages):
+    # Only the cross-reference table and page tree are parsed here; page
+    # content streams are decoded lazily by extract_text().
+    try:
+        reader = PyPDF2.PdfReader(io.BytesIO(data))
+        page_count = len(reader.pages)
+    except Exception as e:
+        raise PDFExtractionError(f"Could not read the PDF file: {e}") from e
+
+    if page_count > max_pages:
+        raise PDFExtractionError(
+            f"PDF has {page_count} pages; the limit is {max_pages}."
+        )
+    return reader, page_count
+
+
+def _iter_reader(reader, started, time_budget):
+    for page in reader.pages:
+        if time.monotonic() - started > time_budget:
+            raise PDFExtractionError(
+                f"PDF text extraction exceeded the {time_budget}s time budget."
+            )
+        try:
+            text = page.extract_text()
+        except Exception as e:
+            raise PDFExtractionError(f"Could not read the PDF file: {e!r}") from e
+        yield text or ""
+
+
+def iter_pages(source, max_pages=None, time_budget=None):
+    """
+    Lazily yields the text of each page of a PDF, parsing a page only when it
+    is requested. Callers that stop early never pay for the remaining pages.
+    The same page cap and time budget as extract_pages() apply.
+    """
+    max_pages, time_budget = _limits(max_pages, time_budget)
+    started = time.monotonic()
+    reader, _ = _open_reader(_read_bytes(source), max_pages)
+    yield from _iter_reader(reader, started, time_budget)
+
+
+def read_prefix(page_iter, min_chars):
+    """
+    Consumes pages from `page_iter` until at least `min_chars` characters have
+    been collected. Returns (pages, exhausted); when `exhausted` is False the
+    iterator can be resumed to materialize the rest of the document.
+    """
+    pages = []
+    collected = 0
+    for page in page_iter:
+        pages.append(page)
+        collected += len(page)
+        if collected >= min_chars:
+            return pages, False
+    return pages, True
+
+
+def extract_pages(source, max_pages=None, time_budget=None):
+    """
+    Extracts the text of every page of a PDF and returns it as a list with one
+    string per page. `source` may be raw bytes, an uploaded file or any binary
+    file object.
+
+    Documents with at least PDF_PARALLEL_MIN_PAGES pages are split across a
+    process pool. Raises PDFExtractionError if the document has more than
+    `max_pages` pages, takes longer than `time_budget` seconds, or is unreadable.
+    """
+    max_pages, time_budget = _limits(max_pages, time_budget)
+    started = time.monotonic()
+
+    data = _read_bytes(source)
+    reader, page_count = _open_reader(data, max_pages)
+
+    workers = _worker_count()
+    if page_count >= _setting('PDF_PARALLEL_MIN_PAGES', 8) and workers > 1:
+        return _extract_parallel(data, page_count, workers, started, time_budget)
+
+    return list(_iter_reader(reader, started, time_budget))
+
+
+def _extract_parallel(data, page_count, workers, started, time_budget):
+    pool = _get_pool()
+    futures = [
+        pool.submit(_extract_range, data, start, stop)
+        for start, stop in _page_ranges(page_count, workers)
+    ]
+    remaining = max(0.0, time_budget - (time.monotonic() - started))
+    done, not_done = wait(futures, timeout=remaining, return_when=FIRST_EXCEPTION)
+    failed = next((future for future in done if future.exception() is not None), None)
+    if failed is not None:
+        # An unreadable page range. The pool is shared with other requests,
+        # so ranges already running are left to finish; only queued ones
+        # are dropped.
+        for future in not_done:
+            future.cancel()
+        raise PDFExtractionError(
+            f"Could not read the PDF file: {failed.exception()}"
+        ) from failed.exception()
+    if not_done:
+        # The budget ran out. Futures that cannot be cancelled are running,
+        # possibly hung in PyPDF2, and only stop with their process.
+        if not all([future.cancel() for future in not_done]):
+            _recycle_pool(pool)
+        raise PDFExtractionError(
+            f"PDF text extraction exceeded the {time_budget}s time budget."
+        )
+
+    pages = []
+    for future in futures:
+        try:
+            pages.extend(future.result())
+        except Exception as e:
+            raise PDFExtractionError(f"Could not read the PDF file: {e}") from e
+    return pages
+
+
+def _extract_document(data, max_pages, time_budget):
+    # Runs in a worker process: one whole document, page by page.
+    started = time.monotonic()
+    reader, _ = _open_reader(data, max_pages)
+    return list(_iter_reader(reader, started, time_budget))
+
+
+def submit_extraction(data, max_pages=None, time_budget=None):
+    """
+    Extracts a whole document in the process pool and returns a Future for
+    its list of page texts. For batches: each document is parsed by one
+    worker, so many documents are extracted at once. The Future raises
+    PDFExtractionError like extract_pages().
+    """
+    max_pages, time_budget = _limits(max_pages, time_budget)
+    pool = _get_pool()
+    future = pool.submit(_extract_document, data, max_pages, time_budget)
+    _future_pools[future] = pool
+    return future
+
+
+def started_extractions(futures):
+    """
+    Returns the submit_extraction() futures, given in submission order, that
+    a worker has picked up. A pool already reports as running the one call
+    it queues beyond its number of workers; that one is left out.
+    """
+    started = []
+    per_pool = {}
+    for future in futures:
+        pool = _future_pools.get(future)
+        if pool is None or not future.running():
+            continue
+        per_pool[pool] = per_pool.get(pool, 0) + 1
+        if per_pool[pool] <= pool._max_workers:
+            started.append(future)
+    return started
+
+
+def stop_extractions(futures):
+    """
+    Stops submit_extraction() futures that ran past their deadline. Queued
+    ones are cancelled; running ones, possibly hung in PyPDF2, only stop with
+    their process, so the pool they run in is recycled as in extract_pages().
+    Returns True if a pool was recycled: the caller's other extractions in
+    flight then fail and should be submitted again.
+    """
+    pools = {
+        _future_pools.get(future) for future in futures
+        if not future.cancel() and not future.done()
+    }
+    pools.discard(None)
+    for pool in pools:
+        _recycle_pool(pool)
+    return bool(pools)
+
+
+def join_pages(pages):
+    """Joins per-page text into the document text in a single pass."""
+    return PAGE_SEPARATOR.join(pages)
+
+
+def extract_text(source, **kwargs):
+    return join_pages(extract_pages(source, **kwargs))
+
+
+def load_resume_text(resume):
+    """
+    Returns the text of a stored resume. Stored page text is used whenever it
+    exists; the uploaded file is only parsed for legacy rows that predate
+    page storage, and the result is saved so that happens at most once.
+    """
+    if resume.text:
+        return resume.text
+
+    if not resume.pages:
+        if not resume.file or not os.path.exists(resume.file.path):
+            raise PDFExtractionError(
+                f"Resume file path not found or invalid: {getattr(resume.file, 'name', 'N/A')}"
+            )
+        with open(resume.file.path, 'rb') as f:
+            resume.pages = extract_pages(f)
+
+    resume.text = join_pages(resume.pages)
+    resume.save(update_fields=['text', 'pages'])
+    return resume.text
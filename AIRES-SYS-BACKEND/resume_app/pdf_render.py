@@ -0,0 +1,431 @@
+"""
+Markdown -> HTML -> PDF rendering for rewritten resumes, with a
+content-addressed on-disk cache of the rendered files.
+
+Rendering with xhtml2pdf is the slowest CPU step in the stack, so every PDF is
+stored under the hash of everything that determines its bytes: the
+preprocessed markdown, the stylesheet and the renderer versions. The hash is
+also the ETag, so a client that already holds the file gets a 304 without any
+rendering or disk access.
+"""
+import hashlib
+import io
+import os
+import re
+import tempfile
+import threading
+
+from django.conf import settings
+
+from .log import get_logger
+
+logger = get_logger('pdf')
+
+try:
+    import markdown
+except ImportError:
+    markdown = None
+    logger.error("'markdown' library not found. pip install markdown")
+
+try:
+    import xhtml2pdf
+    from xhtml2pdf import pisa
+except ImportError:
+    xhtml2pdf = pisa = None
+    logger.error("'xhtml2pdf' library not found. pip install xhtml2pdf")
+
+
+class PDFRenderError(Exception):
+    """xhtml2pdf reported errors; the message carries its log."""
+
+
+# Bump when preprocess_markdown() or markdown_to_html() change their output.
+LAYOUT_VERSION = 2
+
+_HEADING_TAG_RE = re.compile(r'<h([1-3])>(.*?)</h\1>', re.DOTALL)
+_EDUCATION_TITLE_RE = re.compile(r'University|College|School|Institute')
+# Entry kind for the h3 entries under an h2 section, by section title.
+_SECTION_KINDS = (
+    (re.compile(r'educat|academic|qualification', re.IGNORECASE), 'education'),
+    (re.compile(r'project', re.IGNORECASE), 'project'),
+    (re.compile(r'experience|employment|work|career', re.IGNORECASE), 'job'),
+)
+
+RESUME_CSS = """
+@page {
+    size: letter;
+    margin: 0.75in;
+}
+
+html {
+    font-variant-ligatures: common-ligatures;
+}
+
+body {
+    font-family: "Helvetica", "Arial", sans-serif;
+    font-size: 10pt;
+    line-height: 1.4;
+    color: #333;
+    /* Ensure content is allowed to flow without fixed constraints */
+    overflow: visible;
+}
+
+h1, h2, h3, h4, h5, h6 {
+    font-weight: bold;
+    color: #000;
+    margin-top: 1.2em;
+    margin-bottom: 0.6em;
+    /* Avoid forcing elements into the same page if possible */
+    page-break-after: avoid;
+    page-break-before: avoid;
+}
+
+h1 {
+    font-size: 18pt;
+    margin-top: 0;
+    text-align: center;
+}
+
+h2 {
+    font-size: 14pt;
+    border-bottom: 1px solid #eee;
+    padding-bottom: 3pt;
+}
+
+h3 {
+    font-size: 11pt;
+}
+
+p {
+    margin-top: 0;
+    margin-bottom: 0.8em;
+    text-align: left;
+    orphans: 3;
+    widows: 3;
+    /* Let paragraphs break naturally */
+    page-break-inside: avoid;
+}
+
+ul, ol {
+    padding-left: 20pt;
+    margin-top: 0.5em;
+    margin-bottom: 0.8em;
+}
+
+li {
+    margin-bottom: 0.4em;
+}
+
+.job-entry, .education-entry, .project-entry {
+    page-break-inside: avoid;
+    margin-bottom: 1.5em;
+}
+
+p.contact-info {
+    text-align: center;
+    font-size: 9pt;
+    margin-bottom: 1.5em;
+    color: #555;
+    border-bottom: 1px solid #ccc;
+    padding-bottom: 8pt;
+    page-break-after: avoid;
+}
+
+p.location-date {
+    font-size: 10pt;
+    font-style: italic;
+    color: #666;
+    margin-top: -0.4em;
+    margin-bottom: 0.6em;
+}
+
+strong, b {
+    font-weight: bold;
+}
+
+em, i {
+    font-style: italic;
+}
+
+table {
+    width: 100%;
+    border-collapse: collapse;
+    margin-bottom: 1em;
+}
+
+th, td {
+    border: 1px solid #ddd;
+    padding: 6pt;
+    text-align: left;
+}
+
+thead {
+    display: table-header-group;
+    font-weight: bold;
+    background-color: #f2f2f2;
+}
+
+tr {
+    page-break-inside: avoid;
+    page-break-after: auto;
+}
+"""
+
+
+def renderer_available():
+    return markdown is not None and pisa is not None
+
+
+def renderer_version():
+    return "markdown-%s/xhtml2pdf-%s/layout-%d" % (
+        getattr(markdown, '__version__', '?'), getattr(xhtml2pdf, '__version__', '?'), LAYOUT_VERSION
+    )
+
+
+def preprocess_markdown(content_md):
+    # Remove any lingering code block markers
+    content_md = content_md.replace("```markdown", "").replace("```json", "").replace("```", "")
+    
+    # Ensure proper line breaks
+    content_md = re.sub(r'\n{3,}', '\n\n', content_md)  # Replace excessive newlines
+    
+    # Ensure bullet points are properly formatted
+    content_md = re.sub(r'(?<=\n)\s*\*\s+', '* ', content_md)
+    
+    # Ensure headings have proper spacing
+    content_md = re.sub(r'(?<=\n)#{1,6}\s*', lambda m: m.group().strip() + ' ', content_md)
+    return content_md
+
+
+def markdown_to_html(content_md):
+    """Converts preprocessed markdown to the full HTML document given to xhtml2pdf."""
+    # 1. Convert Markdown to HTML
+    logger.debug("Starting Markdown to HTML conversion.")
+    html_content = markdown.markdown(content_md, extensions=['fenced_code', 'tables', 'nl2br'])
+    logger.debug("Markdown to HTML conversion finished.")
+
+    # 2. Add CSS classes to enhance structure for PDF generation
+    logger.debug("Adding structure for PDF formatting")
+    html_content = structure_html(html_content)
+
+    # Combine HTML and CSS
+    return f"<!DOCTYPE html><html><head><meta charset=\"UTF-8\"><style>{RESUME_CSS}</style></head><body>{html_content}</body></html>"
+
+
+def _section_kind(title):
+    for pattern, kind in _SECTION_KINDS:
+        if pattern.search(title):
+            return kind
+    return None
+
+
+def structure_html(html_content):
+    """
+    Wraps every h3 entry, up to the next h1/h2/h3 or the end of the document,
+    in a job-entry, education-entry or project-entry div (so page breaks
+    avoid splitting it) and tags its heading as job-title, education-title
+    or project-title. The kind comes from the enclosing h2 section, e.g.
+    "## Education"; outside a known section, titles naming a university,
+    college, school or institute are education and everything else is a job.
+
+    A single left-to-right pass over the headings, so the cost is linear in
+    the document and repeated identical entries are each wrapped once.
+    """
+    parts = []
+    position = 0
+    section_kind = None
+    entry_open = False
+    for match in _HEADING_TAG_RE.finditer(html_content):
+        level, title = match.group(1), match.group(2)
+        parts.append(html_content[position:match.start()])
+        position = match.end()
+        if entry_open:
+            parts.append('</div>')
+            entry_open = False
+
+        if level != '3':
+            section_kind = _section_kind(title) if level == '2' else None
+            parts.append(match.group(0))
+            continue
+
+        kind = section_kind or ('education' if _EDUCATION_TITLE_RE.search(title) else 'job')
+        parts.append(f'<div class="{kind}-entry"><h3 class="{kind}-title">{title}</h3>')
+        entry_open = True
+
+    parts.append(html_content[position:])
+    if entry_open:
+        parts.append('</div>')
+    return ''.join(parts)
+
+
+def html_to_pdf(full_html):
+    """Renders an HTML document with xhtml2pdf. Raises PDFRenderError on failure."""
+    logger.debug("Starting PDF generation with pisa.")
+    pdf_buffer = io.BytesIO()
+    pisa_status = pisa.CreatePDF(
+        src=io.BytesIO(full_html.encode('UTF-8')),
+        dest=pdf_buffer,
+        encoding='UTF-8'
+        # link_callback=link_callback # Uncomment if using local images/resources
+    )
+    logger.debug("pisa.CreatePDF finished. Success: %s", not pisa_status.err)
+
+    if pisa_status.err:
+        logger.error("xhtml2pdf Error Code: %s", pisa_status.err) # Log the error code
+        # Attempt to get more detailed logging from pisa if available
+        error_details = f"PDF Generation Error Code: {pisa_status.err}"
+        detailed_log = pisa_status.log # Accessing the log attribute
+        if detailed_log:
+             log_str = ""
+             for msg_type, msg, line, col in detailed_log:
+                  log_line = f"Type: {msg_type}, Line: {line}, Col: {col}, Msg: {msg}"
+                  log_str += log_line + "\n"
+             logger.error("xhtml2pdf Log Messages:\n%s", log_str)
+             error_details += "\nLog:\n" + log_str
+        else:
+             logger.error("No detailed log messages available from xhtml2pdf.")
+
+        # Also include the first part of the HTML that failed
+        error_details += f"\n\n--- Failing HTML (approx first 500 chars) ---\n{full_html[:500]}"
+        raise PDFRenderError(error_details)
+
+    return pdf_buffer.getvalue()
+
+
+class PDFCache:
+    """
+    Rendered PDFs on disk, one file per content hash, evicted oldest-first
+    (by last use) once the directory grows past `max_bytes`. Files are
+    written to a temporary name and renamed into place, so concurrent
+    workers never see a partial file and need no shared lock.
+    """
+
+    def __init__(self, directory=None, max_bytes=None):
+        self._directory = directory
+        self._max_bytes = max_bytes
+        self._size = None
+        self._lock = threading.Lock()
+        self._evicting = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def directory(self):
+        return self._directory or getattr(
+            settings, 'PDF_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'aires_pdf_cache')
+        )
+
+    @property
+    def max_bytes(self):
+        return self._max_bytes or getattr(settings, 'PDF_CACHE_MAX_BYTES', 256 * 1024 * 1024)
+
+    @staticmethod
+    def make_key(content_md, css=RESUME_CSS):
+        """Hash of everything that determines the rendered bytes; doubles as the ETag."""
+        digest = hashlib.sha256()
+        for part in (renderer_version(), css, content_md):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.pdf')
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            # Refresh the mtime so eviction treats the file as recently used.
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def store(self, key, data):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        # Directory scans run outside the lock so get() never waits on disk
+        # I/O; the lock only guards the counters and the running total.
+        with self._lock:
+            scan = self._size is None
+            if not scan:
+                self._size += len(data)
+        if scan:
+            size = self._scan_size()
+            with self._lock:
+                self._size = size
+        with self._lock:
+            evict = self._size > self.max_bytes and not self._evicting
+            if evict:
+                self._evicting = True
+        if evict:
+            try:
+                self._evict()
+            finally:
+                with self._lock:
+                    self._evicting = False
+
+    def _files(self):
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith('.pdf'):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield stat.st_mtime, stat.st_size, path
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._files())
+
+    def _evict(self):
+        # Other workers share the directory, so recount from disk, then drop
+        # least recently used files down to 90% of the limit.
+        files = sorted(self._files())
+        total = sum(size for _, size, _ in files)
+        target = self.max_bytes * 0.9
+        evicted = 0
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+        with self._lock:
+            self.evictions += evicted
+            self._size = total
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': self._size,
+                'max_size': self.max_bytes,
+            }
+
+
+pdf_cache = PDFCache()
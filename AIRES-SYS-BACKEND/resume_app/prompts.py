@@ -0,0 +1,204 @@
+"""
+Registry of the LLM prompt templates defined in prompts.md.
+
+The templates are read and checked once, at import. Each one has a stable
+version (a hash of its text and settings) for cache keys, and a token
+budget: render() counts tokens locally and shortens the template's `trim`
+placeholder deterministically so the prompt never exceeds the budget, and
+long resumes no longer overflow the model's context.
+
+Tokens are counted with the model's tokenizer when PROMPT_TOKENIZER_FILE
+points at its tokenizer.json and the `tokenizers` package is installed.
+Otherwise an estimate is used that errs on the high side for Llama/Mistral
+style tokenizers: a token per 4 letters of a word, per digit and per
+punctuation mark or other symbol.
+"""
+import hashlib
+import re
+import string
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+
+from .log import get_logger
+
+try:
+    from tokenizers import Tokenizer
+except ImportError:  # optional: exact counts for the configured model
+    Tokenizer = None
+
+logger = get_logger('llm')
+
+PROMPTS_FILE = Path(__file__).with_name('prompts.md')
+
+# Appended, on its own line, to each part of a text that was cut short.
+TRUNCATION_MARKER = '[…]'
+
+_ENTRY_RE = re.compile(
+    r"^## (?P<name>\w+)[ \t]*\n(?P<description>.*?)"
+    r"^(?P<fence>`{4,})\w*[ \t]*\n(?P<text>.*?)\n(?P=fence)[ \t]*$",
+    re.MULTILINE | re.DOTALL,
+)
+_SETTING_RE = re.compile(r"^- (\w+): (\S+)[ \t]*$", re.MULTILINE)
+_PIECE_RE = re.compile(r"[A-Za-z]+|\d|\n|[^\sA-Za-z\d]| {2,}")
+
+
+class PromptBudgetError(ValueError):
+    """The parts of a prompt that cannot be shortened exceed its budget."""
+
+
+@lru_cache(maxsize=1)
+def _tokenizer():
+    path = getattr(settings, 'PROMPT_TOKENIZER_FILE', None)
+    if not path or Tokenizer is None:
+        return None
+    return Tokenizer.from_file(str(path))
+
+
+def count_tokens(text):
+    """Tokens in `text`: exact with the configured tokenizer, a slight overestimate otherwise."""
+    tokenizer = _tokenizer()
+    if tokenizer is not None:
+        return len(tokenizer.encode(text, add_special_tokens=False).ids)
+    return sum((len(piece) + 3) // 4 if piece[0].isalpha() else 1 for piece in _PIECE_RE.findall(text))
+
+
+def _allot(costs, room):
+    """
+    Splits `room` between parts costing `costs` (max-min fair): parts that
+    fit an equal share are kept whole and what they leave over is shared
+    among the larger ones.
+    """
+    allowances = [0] * len(costs)
+    pending = sorted(range(len(costs)), key=lambda i: (costs[i], i))
+    while pending:
+        share = room // len(pending)
+        if costs[pending[0]] > share:
+            for i in pending:
+                allowances[i] = share
+            break
+        i = pending.pop(0)
+        allowances[i] = costs[i]
+        room -= costs[i]
+    return allowances
+
+
+def _truncate(part, budget):
+    """The start of `part` within `budget` tokens: whole lines, then whole words of the next line."""
+    budget -= count_tokens('\n' + TRUNCATION_MARKER)
+    lines = []
+    for line in part.split('\n'):
+        cost = count_tokens(line) + (1 if lines else 0)
+        if cost > budget:
+            words = []
+            budget -= 1 if lines else 0
+            for word in line.split(' '):
+                budget -= count_tokens(word)
+                if budget < 0:
+                    break
+                words.append(word)
+            if words:
+                lines.append(' '.join(words))
+            break
+        lines.append(line)
+        budget -= cost
+    if not lines:
+        return ''
+    return '\n'.join(lines + [TRUNCATION_MARKER])
+
+
+def fit_tokens(text, budget):
+    """
+    Shortens `text` to at most `budget` tokens, deterministically. Its
+    blank-line separated parts (the sections of a resume) each keep an
+    equal share of the budget, so no section is dropped to make room for
+    another; parts that are too long lose their last lines.
+    """
+    if count_tokens(text) <= budget:
+        return text
+    parts = text.split('\n\n')
+    room = budget - count_tokens('\n\n') * (len(parts) - 1)
+    while room > 0:
+        allowances = _allot([count_tokens(part) for part in parts], room)
+        fitted = '\n\n'.join(
+            part if allowance >= count_tokens(part) else _truncate(part, allowance)
+            for part, allowance in zip(parts, allowances)
+        )
+        fitted = re.sub(r"\n{3,}", "\n\n", fitted).strip('\n')
+        # Counts of the pieces need not add up exactly with a real tokenizer.
+        excess = count_tokens(fitted) - budget
+        if excess <= 0:
+            return fitted
+        room -= excess
+    return ''
+
+
+class PromptTemplate:
+    """One template of prompts.md, ready to render."""
+
+    def __init__(self, name, text, budget, max_new_tokens, trim):
+        self.name = name
+        self.text = text
+        self.budget = budget
+        self.max_new_tokens = max_new_tokens
+        self.trim = trim
+        self.fields = frozenset(field for _, field, _, _ in string.Formatter().parse(text) if field)
+        if trim not in self.fields:
+            raise ValueError(f"Prompt '{name}': trim placeholder {{{trim}}} is not in the template")
+        self.version = hashlib.sha256(
+            f"{text}\0{budget}\0{max_new_tokens}\0{trim}".encode('utf-8')
+        ).hexdigest()[:12]
+        # Tokens of the template itself, without any values.
+        self.fixed_tokens = count_tokens(text.format(**dict.fromkeys(self.fields, '')))
+
+    def __repr__(self):
+        return f"<PromptTemplate {self.name} {self.version}>"
+
+    def render(self, **values):
+        """
+        Fills in the template, shortening the `trim` value to fit the budget.
+        Raises PromptBudgetError when the other values leave less than a
+        quarter of the budget for it.
+        """
+        room = self.budget - self.fixed_tokens - sum(
+            count_tokens(str(value)) for field, value in values.items() if field != self.trim
+        )
+        if room < self.budget // 4:
+            raise PromptBudgetError(
+                f"The input is too long for the '{self.name}' prompt ({self.budget} token budget)."
+            )
+        text = str(values[self.trim])
+        values[self.trim] = fit_tokens(text, room)
+        if values[self.trim] is not text:
+            logger.info("Trimmed {%s} of the %s prompt to its %d token budget",
+                        self.trim, self.name, self.budget)
+        return self.text.format(**values)
+
+
+def load_prompts(path=PROMPTS_FILE):
+    """Reads and checks the templates of a prompts.md file: {name: PromptTemplate}."""
+    source = Path(path).read_text(encoding='utf-8').replace('\r\n', '\n')
+    context = getattr(settings, 'LLM_CONTEXT_TOKENS', 32768)
+    templates = {}
+    for entry in _ENTRY_RE.finditer(source):
+        name = entry.group('name')
+        options = dict(_SETTING_RE.findall(entry.group('description')))
+        try:
+            template = PromptTemplate(
+                name, entry.group('text'), int(options['budget']), int(options['max_new_tokens']),
+                options['trim'],
+            )
+        except (KeyError, ValueError) as e:
+            raise ValueError(f"{path}: invalid prompt '{name}': {e}") from e
+        if template.budget + template.max_new_tokens > context:
+            raise ValueError(f"{path}: prompt '{name}' does not fit the {context} token context")
+        templates[name] = template
+    return templates
+
+
+TEMPLATES = load_prompts()
+
+
+def get_prompt(name):
+    return TEMPLATES[name]
@@ -0,0 +1,364 @@
+"""
+Ranking of stored resumes against a job description with BM25; no model is
+involved.
+
+The term counts of a resume are computed once, when its text is saved, and
+stored in ResumeTermVector. Each process keeps an in-memory inverted index
+of those vectors: a few immutable segments of NumPy arrays holding the
+postings of every term (CSR, indexed by term id). Before a ranking the
+index picks up vectors added since it last looked, as one new segment;
+small segments are merged so there are only O(log n) of them. Scoring a job
+description only touches the postings of its own terms, so ranking 100k
+resumes takes milliseconds.
+"""
+import json
+import math
+import re
+import threading
+import zlib
+from itertools import chain
+
+from django.conf import settings
+
+from .log import get_logger
+
+logger = get_logger('ranking')
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+    logger.error("'numpy' library not found; resume ranking is disabled. pip install numpy")
+
+
+# Words, keeping the punctuation of names like c++, c#, node.js and asp.net.
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:\+\+|#|(?:\.[a-z0-9]+)+)?")
+
+STOP_WORDS = frozenset("""
+a about above after again all also am an and any are as at be because been before
+being below between both but by can could did do does doing down during each etc
+few for from further had has have having he her here hers him his how i if in into
+is it its itself just me more most my no nor not now of off on once only or other
+our ours out over own per same she should so some such than that the their theirs
+them then there these they this those through to too under until up very via was
+we were what when where which while who whom why will with within would you your
+""".split())
+
+_SUFFIXES = ('ing', 'ed', 'es', 'e', 's')
+
+
+def ranking_available():
+    return np is not None
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def tokenize(text):
+    """The indexed terms of a text, in order: lowercased, without stop words and bare numbers."""
+    return [term for term in TOKEN_RE.findall(text.lower())
+            if term not in STOP_WORDS and not term.isdigit()]
+
+
+def stem(term):
+    """Crude suffix stripping: managing, managed, manages and manage all give 'manag'."""
+    for suffix in _SUFFIXES:
+        if term.endswith(suffix) and len(term) - len(suffix) >= 3:
+            return term[:-len(suffix)]
+    return term
+
+
+def term_counts(text):
+    """Returns ({term: count}, length) for a text, length being the number of terms counted."""
+    counts = {}
+    for term in tokenize(text):
+        counts[term] = counts.get(term, 0) + 1
+    return counts, sum(counts.values())
+
+
+def pack_terms(counts):
+    return zlib.compress(json.dumps(counts, separators=(',', ':')).encode('utf-8'))
+
+
+def unpack_terms(data):
+    return json.loads(zlib.decompress(bytes(data)))
+
+
+class _Segment:
+    """
+    Postings of a fixed set of resumes. Rows are the resumes of the segment;
+    the postings of term id t are rows[indptr[t]:indptr[t + 1]] with their
+    counts in tfs. Only `alive` and `dead` change after construction.
+    """
+
+    def __init__(self, resume_ids, lengths, term_ids, rows, tfs, vocab_size):
+        order = np.argsort(term_ids, kind='stable')
+        self.resume_ids = resume_ids
+        self.lengths = lengths
+        self.alive = np.ones(len(resume_ids), dtype=bool)
+        self.dead = 0
+        self.indptr = np.zeros(vocab_size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=vocab_size), out=self.indptr[1:])
+        self.rows = rows[order]
+        self.tfs = tfs[order]
+
+    def __len__(self):
+        return len(self.resume_ids)
+
+    @classmethod
+    def merge(cls, segments, vocab_size):
+        """One segment holding the live resumes of `segments`."""
+        resume_ids, lengths, term_ids, rows, tfs = [], [], [], [], []
+        offset = 0
+        for segment in segments:
+            # New row numbers of the live resumes of this segment.
+            renumber = np.cumsum(segment.alive, dtype=np.int64) - 1 + offset
+            keep = segment.alive[segment.rows]
+            n_terms = len(segment.indptr) - 1
+            segment_term_ids = np.repeat(np.arange(n_terms, dtype=np.int32), np.diff(segment.indptr))
+            term_ids.append(segment_term_ids[keep])
+            rows.append(renumber[segment.rows[keep]].astype(np.int32))
+            tfs.append(segment.tfs[keep])
+            resume_ids.append(segment.resume_ids[segment.alive])
+            lengths.append(segment.lengths[segment.alive])
+            offset += int(segment.alive.sum())
+        return cls(
+            np.concatenate(resume_ids), np.concatenate(lengths), np.concatenate(term_ids),
+            np.concatenate(rows), np.concatenate(tfs), vocab_size,
+        )
+
+    def postings(self, term_id):
+        if term_id >= len(self.indptr) - 1:
+            return None
+        start, end = self.indptr[term_id], self.indptr[term_id + 1]
+        if start == end:
+            return None
+        return self.rows[start:end], self.tfs[start:end]
+
+    def document_frequency(self, rows):
+        """Live resumes among the postings `rows` of a term."""
+        return len(rows) - int(np.count_nonzero(~self.alive[rows])) if self.dead else len(rows)
+
+
+class _Vocabulary(dict):
+    """term -> term id, assigning the next id to unseen terms; also lists the ids by stem()."""
+
+    def __init__(self):
+        super().__init__()
+        self.variants = {}
+
+    def __missing__(self, term):
+        term_id = self[term] = len(self)
+        self.variants.setdefault(stem(term), []).append(term_id)
+        return term_id
+
+
+class RankingIndex:
+    """
+    In-memory BM25 index of resume term vectors. add() and discard() may be
+    called from any thread; rankings read an immutable snapshot of the
+    segments.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._vocab = _Vocabulary()
+        self._segments = []
+        # resume id -> (segment, row)
+        self._where = {}
+        self._total_length = 0.0
+        # Highest ResumeTermVector id loaded by sync().
+        self._synced_id = 0
+
+    def __len__(self):
+        return len(self._where)
+
+    def add(self, docs):
+        """
+        Indexes [(resume_id, length, {term: count})] as one new segment,
+        replacing earlier versions of the same resumes.
+        """
+        if not docs:
+            return
+        # The last version of each resume wins.
+        docs = {resume_id: (length, counts) for resume_id, length, counts in docs}
+        with self._lock:
+            term_ids = np.fromiter(
+                chain.from_iterable(map(self._vocab.__getitem__, counts) for _, counts in docs.values()),
+                dtype=np.int32,
+            )
+            tfs = np.fromiter(
+                chain.from_iterable(counts.values() for _, counts in docs.values()), dtype=np.float32,
+            )
+            sizes = np.fromiter((len(counts) for _, counts in docs.values()), dtype=np.int64, count=len(docs))
+            lengths = np.fromiter((length for length, _ in docs.values()), dtype=np.float32, count=len(docs))
+            segment = _Segment(
+                np.fromiter(docs, dtype=np.int64, count=len(docs)), lengths, term_ids,
+                np.repeat(np.arange(len(docs), dtype=np.int32), sizes), tfs, len(self._vocab),
+            )
+            for resume_id in docs:
+                self._discard(resume_id)
+            self._segments.append(segment)
+            for row, resume_id in enumerate(docs):
+                self._where[resume_id] = (segment, row)
+            self._total_length += float(lengths.sum())
+
+            # Keep segment sizes decreasing geometrically: few segments per
+            # query, and each resume is copied O(log n) times by merges.
+            while len(self._segments) >= 2 and len(self._segments[-2]) <= 2 * len(self._segments[-1]):
+                merged = _Segment.merge(self._segments[-2:], len(self._vocab))
+                self._segments[-2:] = [merged]
+                for row, resume_id in enumerate(merged.resume_ids.tolist()):
+                    self._where[resume_id] = (merged, row)
+
+    def discard(self, resume_ids):
+        with self._lock:
+            for resume_id in resume_ids:
+                self._discard(resume_id)
+
+    def _discard(self, resume_id):
+        location = self._where.pop(resume_id, None)
+        if location is not None:
+            segment, row = location
+            segment.alive[row] = False
+            segment.dead += 1
+            self._total_length -= float(segment.lengths[row])
+
+    def sync(self):
+        """Loads the term vectors added or removed since the last call."""
+        from .models import ResumeTermVector
+
+        with self._sync_lock:
+            rows = (
+                ResumeTermVector.objects.filter(id__gt=self._synced_id)
+                .order_by('id').values_list('id', 'resume_id', 'length', 'data')
+            )
+            docs = []
+            for vector_id, resume_id, length, data in rows.iterator(chunk_size=2000):
+                docs.append((resume_id, length, unpack_terms(data)))
+                self._synced_id = vector_id
+            self.add(docs)
+
+            # Deleted resumes, and rows committed out of id order, show up as
+            # a count mismatch; only then are all the ids compared.
+            if ResumeTermVector.objects.count() != len(self._where):
+                current = dict(ResumeTermVector.objects.values_list('resume_id', 'id'))
+                self.discard([resume_id for resume_id in list(self._where) if resume_id not in current])
+                missing = [current[resume_id] for resume_id in current if resume_id not in self._where]
+                for start in range(0, len(missing), 1000):
+                    self.add([
+                        (resume_id, length, unpack_terms(data))
+                        for resume_id, length, data in ResumeTermVector.objects
+                        .filter(id__in=missing[start:start + 1000]).values_list('resume_id', 'length', 'data')
+                    ])
+
+    def rank(self, text, limit):
+        """Returns up to `limit` (resume_id, score) pairs for `text`, best first."""
+        return self._top(term_counts(text)[0], limit)[1]
+
+    def search(self, groups, excluded=(), limit=20):
+        """
+        Boolean search: resumes with a term of every group in `groups` (lists
+        of terms) and none of the `excluded` terms, scored with BM25 on the
+        group terms. Terms also match their variants with the same stem().
+        Returns (number of matches, up to `limit` (resume_id, score) pairs,
+        best first).
+        """
+        return self._top(None, limit, groups, excluded)
+
+    def _top(self, counts, limit, groups=None, excluded=()):
+        with self._lock:
+            segments = list(self._segments)
+            n_docs = len(self._where)
+            total_length = self._total_length
+            if groups is None:
+                query = [(self._vocab[term], count) for term, count in counts.items() if term in self._vocab]
+            else:
+                variants = self._vocab.variants
+                groups = [sorted({term_id for term in group for term_id in variants.get(stem(term), ())})
+                          for group in groups]
+                excluded = sorted({term_id for term in excluded for term_id in variants.get(stem(term), ())})
+                query = [(term_id, 1) for term_id in sorted(set(chain.from_iterable(groups)))]
+        if not query or not n_docs or (groups is not None and not all(groups)):
+            return 0, []
+
+        k1 = _setting('RANKING_BM25_K1', 1.2)
+        b = _setting('RANKING_BM25_B', 0.75)
+        avg_length = max(total_length / n_docs, 1.0)
+        postings = [[segment.postings(term_id) for term_id, _ in query] for segment in segments]
+        weights = []
+        for i, (_, count) in enumerate(query):
+            df = sum(segment.document_frequency(found[i][0])
+                     for segment, found in zip(segments, postings) if found[i] is not None)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            # A term repeated in the job description weighs more, sublinearly.
+            weights.append(idf * (1 + math.log(count)))
+
+        matches = 0
+        best_ids, best_scores = [], []
+        for segment, found in zip(segments, postings):
+            scores = np.zeros(len(segment), dtype=np.float32)
+            norm = k1 * (1 - b + b * segment.lengths / avg_length)
+            for weight, term_postings in zip(weights, found):
+                if term_postings is None:
+                    continue
+                rows, tfs = term_postings
+                # Rows are unique within a term's postings, so += is safe.
+                scores[rows] += weight * tfs * (k1 + 1) / (tfs + norm[rows])
+            if groups is None:
+                scores[~segment.alive] = 0
+            else:
+                scores[~self._matching(segment, groups, excluded)] = 0
+            hits = np.flatnonzero(scores)
+            matches += len(hits)
+            if len(hits) > limit:
+                hits = hits[np.argpartition(scores[hits], -limit)[-limit:]]
+            best_ids.append(segment.resume_ids[hits])
+            best_scores.append(scores[hits])
+
+        ids = np.concatenate(best_ids)
+        scores = np.concatenate(best_scores)
+        order = np.lexsort((ids, -scores))[:limit]
+        return matches, [(int(ids[i]), float(scores[i])) for i in order]
+
+    @staticmethod
+    def _matching(segment, groups, excluded):
+        """Mask of the live rows of a segment that satisfy a search."""
+        match = segment.alive.copy()
+        for group in groups:
+            in_group = np.zeros(len(segment), dtype=bool)
+            for term_id in group:
+                postings = segment.postings(term_id)
+                if postings is not None:
+                    in_group[postings[0]] = True
+            match &= in_group
+        for term_id in excluded:
+            postings = segment.postings(term_id)
+            if postings is not None:
+                match[postings[0]] = False
+        return match
+
+    def stats(self):
+        with self._lock:
+            return {
+                'resumes': len(self._where),
+                'terms': len(self._vocab),
+                'segments': [len(segment) for segment in self._segments],
+                'postings': sum(len(segment.rows) for segment in self._segments),
+                'bytes': sum(
+                    segment.indptr.nbytes + segment.rows.nbytes + segment.tfs.nbytes
+                    + segment.resume_ids.nbytes + segment.lengths.nbytes + segment.alive.nbytes
+                    for segment in self._segments
+                ),
+            }
+
+
+ranking_index = RankingIndex()
+
+
+def rank_resumes(job_description, limit):
+    """Brings this process's index up to date and ranks every stored resume."""
+    ranking_index.sync()
+    return ranking_index.rank(job_description, limit)
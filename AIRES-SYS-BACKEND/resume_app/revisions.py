@@ -0,0 +1,158 @@
+"""
+Revision history of a resume's rewritten content.
+
+Every rewrite and revision is stored as a ResumeRevision. Usually this is a
+line delta against the parent version; a full snapshot is stored instead for
+the first version, whenever a chain would exceed REVISION_SNAPSHOT_INTERVAL
+deltas, and when the delta would not be much smaller than the text itself.
+Rebuilding any version therefore costs one snapshot plus a bounded number of
+deltas. The latest version is also kept as Resume.rewritten_content, so
+reading the current version never needs a rebuild.
+"""
+import difflib
+import json
+import zlib
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Resume, ResumeContent, ResumeRevision
+
+
+# A delta is only stored when it compresses to less than this fraction of
+# the compressed full text.
+MAX_DELTA_RATIO = 0.5
+
+
+class RevisionNotFound(Exception):
+    pass
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def make_delta(base, target):
+    """
+    Returns the line delta turning `base` into `target`: a list of [start, end]
+    items (copy base lines start:end) and strings (literal text).
+    """
+    base_lines = base.splitlines(keepends=True)
+    target_lines = target.splitlines(keepends=True)
+    matcher = difflib.SequenceMatcher(None, base_lines, target_lines, autojunk=False)
+    delta = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            delta.append([i1, i2])
+        elif j2 > j1:
+            delta.append("".join(target_lines[j1:j2]))
+    return delta
+
+
+def apply_delta(base, delta):
+    base_lines = base.splitlines(keepends=True)
+    return "".join(
+        "".join(base_lines[item[0]:item[1]]) if isinstance(item, list) else item
+        for item in delta
+    )
+
+
+def _encode_delta(delta):
+    return zlib.compress(json.dumps(delta, separators=(',', ':')).encode('utf-8'))
+
+
+def _decode_delta(data):
+    return json.loads(zlib.decompress(bytes(data)))
+
+
+def load_version(resume_id, number):
+    """Returns the full text of version `number` of a resume; raises RevisionNotFound."""
+    target = (
+        ResumeRevision.objects.filter(resume_id=resume_id, number=number)
+        .values('id', 'snapshot_id').first()
+    )
+    if target is None:
+        raise RevisionNotFound(f"Resume {resume_id} has no version {number}.")
+
+    # The snapshot and the deltas built on it, fetched in one query.
+    root = target['snapshot_id'] or target['id']
+    rows = {
+        row['id']: row
+        for row in ResumeRevision.objects.filter(Q(id=root) | Q(snapshot_id=root), number__lte=number)
+        .values('id', 'parent_id', 'kind', 'codec', 'data')
+    }
+    chain = []
+    row = rows[target['id']]
+    while row['kind'] == ResumeRevision.KIND_DELTA:
+        chain.append(row)
+        row = rows[row['parent_id']]
+
+    text = ResumeContent.unpack(row['codec'], row['data'])
+    for row in reversed(chain):
+        text = apply_delta(text, _decode_delta(row['data']))
+    return text
+
+
+def record_revision(resume_id, content, source, feedback='', parent_number=None):
+    """
+    Stores `content` as the new latest version of a resume's rewrite, with
+    version `parent_number` (default: the latest version) as its parent.
+    Updates rewritten_content and, for revisions, revision_count and
+    last_revision_date. Returns the ResumeRevision.
+    """
+    with transaction.atomic():
+        # Locking the resume row serializes version numbering.
+        resume = Resume.objects.select_for_update().only('id', 'revision_count').get(id=resume_id)
+        head = (
+            ResumeRevision.objects.filter(resume_id=resume_id)
+            .only('id', 'number', 'depth', 'snapshot_id').order_by('-number').first()
+        )
+        if parent_number is None or (head is not None and parent_number == head.number):
+            parent = head
+            parent_text = resume.rewritten_content if head is not None else None
+        else:
+            parent = (
+                ResumeRevision.objects.filter(resume_id=resume_id, number=parent_number)
+                .only('id', 'number', 'depth', 'snapshot_id').first()
+            )
+            if parent is None:
+                raise RevisionNotFound(f"Resume {resume_id} has no version {parent_number}.")
+            parent_text = load_version(resume_id, parent_number)
+
+        revision = ResumeRevision(
+            resume_id=resume_id,
+            number=head.number + 1 if head is not None else 1,
+            parent=parent,
+            size=len(content.encode('utf-8')),
+            source=source,
+            feedback=feedback or '',
+        )
+        codec, snapshot_data = ResumeContent.pack(content)
+        delta = None
+        if parent is not None and parent.depth + 1 < _setting('REVISION_SNAPSHOT_INTERVAL', 10):
+            delta = _encode_delta(make_delta(parent_text, content))
+            if len(delta) >= MAX_DELTA_RATIO * len(snapshot_data):
+                delta = None
+
+        if delta is not None:
+            revision.kind = ResumeRevision.KIND_DELTA
+            revision.codec = ResumeContent.CODEC_ZLIB
+            revision.data = delta
+            revision.snapshot_id = parent.snapshot_id or parent.id
+            revision.depth = parent.depth + 1
+        else:
+            revision.kind = ResumeRevision.KIND_SNAPSHOT
+            revision.codec = codec
+            revision.data = snapshot_data
+        revision.save()
+
+        resume.rewritten_content = content
+        update_fields = ['rewritten_content']
+        if source == 'revise':
+            resume.revision_count += 1
+            resume.last_revision_date = timezone.now()
+            update_fields += ['revision_count', 'last_revision_date']
+        resume.save(update_fields=update_fields)
+    return revision
@@ -0,0 +1,144 @@
+"""
+Full-text search over resume text (SearchResumesView).
+
+On PostgreSQL every ResumeTermVector row carries a tsvector of the resume's
+text, computed by the database when the row is inserted and indexed with
+GIN. Queries use websearch_to_tsquery() syntax and are ranked with
+ts_rank. On other databases (SQLite development and test runs) the same
+syntax is evaluated against the in-process inverted index of ranking.py,
+with a crude stemmer standing in for the text search configuration.
+
+Resume text is stored compressed, so ts_headline() cannot read it;
+highlights are made here, for the returned page only.
+"""
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import F, Value
+from django.utils.html import escape
+
+from .ranking import TOKEN_RE, ranking_available, ranking_index, stem, tokenize
+
+# Quoted phrases and single words, either optionally negated with '-'.
+_QUERY_RE = re.compile(r'(-?)(?:"([^"]*)"?|(\S+))')
+_WORD_RE = re.compile(TOKEN_RE.pattern, re.IGNORECASE)
+_SPACE_RE = re.compile(r"\s+")
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def use_postgres():
+    backend = _setting('SEARCH_BACKEND', 'auto')
+    if backend == 'auto':
+        return connection.vendor == 'postgresql'
+    return backend == 'postgres'
+
+
+def search_available():
+    return use_postgres() or ranking_available()
+
+
+def search_vector(text):
+    """The value stored in ResumeTermVector.search_vector for `text` (None off PostgreSQL)."""
+    if connection.vendor != 'postgresql':
+        return None
+    # PostgreSQL text cannot contain NUL characters.
+    return SearchVector(Value(text.replace('\x00', ' ')), config=_setting('SEARCH_CONFIG', 'english'))
+
+
+def parse_query(query):
+    """
+    Reads websearch_to_tsquery() syntax for the in-process index: every word
+    must match, `or` between two words accepts either, -word excludes, and
+    the words of a "quoted phrase" must all match (not necessarily
+    adjacent). Returns (groups, excluded): a list of lists of alternative
+    terms, and a list of terms.
+    """
+    groups, excluded = [], []
+    pending_or = False
+    for negate, phrase, word in _QUERY_RE.findall(query):
+        if not negate and word.lower() == 'or':
+            pending_or = bool(groups)
+            continue
+        terms = tokenize(phrase or word)
+        if not terms:
+            continue
+        if negate:
+            excluded.extend(terms)
+        elif pending_or:
+            groups[-1].append(terms[0])
+            groups.extend([term] for term in terms[1:])
+        else:
+            groups.extend([term] for term in terms)
+        pending_or = False
+    return groups, excluded
+
+
+def search_resumes(query, limit, offset=0):
+    """Returns (number of matching resumes, [(resume_id, score)] for the requested page, best first)."""
+    if use_postgres():
+        from .models import ResumeTermVector
+
+        tsquery = SearchQuery(query, search_type='websearch', config=_setting('SEARCH_CONFIG', 'english'))
+        matches = ResumeTermVector.objects.filter(search_vector=tsquery)
+        page = (
+            matches.annotate(rank=SearchRank(F('search_vector'), tsquery))
+            .order_by('-rank', 'resume_id').values_list('resume_id', 'rank')[offset:offset + limit]
+        )
+        return matches.count(), list(page)
+
+    groups, excluded = parse_query(query)
+    if not groups:
+        return 0, []
+    ranking_index.sync()
+    count, hits = ranking_index.search(groups, excluded, offset + limit)
+    return count, hits[offset:]
+
+
+def highlight(text, terms, fragments=3, width=160):
+    """
+    Up to `fragments` snippets of `text` (about `width` characters each)
+    around the words matching `terms` (compared by stem()), as escaped HTML
+    with the matches wrapped in <mark>.
+    """
+    stems = {stem(term) for term in terms}
+    matches = [match for match in _WORD_RE.finditer(text) if stem(match.group().lower()) in stems]
+    snippets = []
+    i = 0
+    while i < len(matches) and len(snippets) < fragments:
+        # Start a little before the first match and end at a space.
+        start = max(0, matches[i].start() - width // 3)
+        space = text.find(' ', start, matches[i].start())
+        if start and space >= 0:
+            start = space + 1
+        end = min(len(text), max(start + width, matches[i].end()))
+        space = text.rfind(' ', matches[i].end(), end)
+        if end < len(text) and space >= 0:
+            end = space
+        parts = ['…' if start else '']
+        position = start
+        while i < len(matches) and matches[i].end() <= end:
+            parts.append(escape(_SPACE_RE.sub(' ', text[position:matches[i].start()])))
+            parts.append(f"<mark>{escape(matches[i].group())}</mark>")
+            position = matches[i].end()
+            i += 1
+        parts.append(escape(_SPACE_RE.sub(' ', text[position:end])))
+        parts.append('…' if end < len(text) else '')
+        snippets.append(''.join(parts).strip())
+    return snippets
+
+
+def highlights(resume_ids, query):
+    """{resume_id: [snippet, ...]} for the resumes of a result page."""
+    from .models import ResumeContent
+
+    terms = [term for group in parse_query(query)[0] for term in group]
+    fragments = _setting('SEARCH_HIGHLIGHT_FRAGMENTS', 3)
+    return {
+        resume_id: highlight(text, terms, fragments)
+        for resume_id, text in ResumeContent.load_many(resume_ids, 'text').items()
+    }
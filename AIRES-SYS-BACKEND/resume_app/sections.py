@@ -0,0 +1,184 @@
+"""
+Structured sections of a resume, parsed once when its text is saved.
+
+The text is split at section headings (the ones the local classifier
+recognises) into contact, summary, skills, experience, education, projects
+and the other common sections, with the whitespace of the PyPDF2 dump
+compacted. The result is stored as Resume.sections. Prompts are built from
+it, so each call sends labelled sections, and only the ones it needs,
+instead of the raw text for the model to make sense of again.
+"""
+import re
+
+from .classifier import SECTION_HEADINGS
+from .pdf_extraction import load_resume_text
+
+# Stored with the sections; bump when parse_sections() changes its output so
+# resumes parsed by an older version are parsed again on next use.
+SECTIONS_VERSION = 1
+
+SECTION_TITLES = {
+    'contact': 'Contact',
+    'summary': 'Summary',
+    'skills': 'Skills',
+    'experience': 'Experience',
+    'education': 'Education',
+    'projects': 'Projects',
+    'certifications': 'Certifications',
+    'awards': 'Awards',
+    'languages': 'Languages',
+    'activities': 'Activities',
+    'references': 'References',
+    'other': 'Other',
+}
+
+# A heading alone on its line ("WORK EXPERIENCE", "Skills:"), or followed by
+# the first line of the section ("Skills: Python, Django").
+_HEADING_RE = re.compile(
+    r"^[ \t]*(?:%s)[ \t]*(?:[:|–-][ \t]*(?P<rest>.*?))?[ \t]*$" % "|".join(
+        f"(?P<{name}>{pattern})" for name, pattern in SECTION_HEADINGS.items()
+    ),
+    re.IGNORECASE | re.MULTILINE,
+)
+_EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+_PHONE_RE = re.compile(r"(?:\+?\d{1,3}[ .-]*)?(?:\(\d{2,4}\)|\d{2,4})[ .-]*\d{3,4}[ .-]*\d{3,4}")
+_LINK_RE = re.compile(r"(?:https?://)?(?:www\.)?(?:linkedin\.com|github\.com|gitlab\.com)/[\w/.-]+", re.IGNORECASE)
+_SPACES_RE = re.compile(r"[ \t ]+")
+_BULLET_RE = re.compile(r"^[•●▪◦■➢►‣∙·*]\s*")
+
+
+def _compact(text):
+    """Strips lines, collapses runs of spaces, drops blank lines and normalises bullets to '- '."""
+    lines = []
+    for line in text.splitlines():
+        line = _SPACES_RE.sub(' ', line).strip()
+        if line:
+            lines.append(_BULLET_RE.sub('- ', line))
+    return '\n'.join(lines)
+
+
+def _parse_header(header):
+    """
+    Splits the text before the first heading into contact details and body
+    text. Contact lines are short lines near the top (name, title,
+    location) and any line with an email address, phone number or profile
+    link.
+    """
+    contact_lines, body_lines = [], []
+    for i, line in enumerate(_compact(header).splitlines()):
+        has_details = _EMAIL_RE.search(line) or _PHONE_RE.search(line) or _LINK_RE.search(line)
+        if has_details or (i < 6 and len(line.split()) <= 6 and not line.endswith(('.', ':'))):
+            contact_lines.append(line)
+        else:
+            body_lines.append(line)
+
+    text = '\n'.join(contact_lines)
+    name = next((line for line in contact_lines
+                 if len(line.split()) <= 5 and not re.search(r"[\d@/|:]", line)), '')
+    contact = {
+        'name': name,
+        'emails': _EMAIL_RE.findall(text),
+        'phones': [phone.strip() for phone in _PHONE_RE.findall(text)],
+        'links': _LINK_RE.findall(text),
+        'text': text,
+    }
+    return contact, '\n'.join(body_lines)
+
+
+def parse_sections(text):
+    """
+    Returns the sections of a resume text as
+    {'version': ..., 'contact': {...}, 'summary': '...', 'skills': '...', ...}.
+    Only sections with content are present. Text before the first heading
+    that is not contact information becomes the summary (or 'other' when
+    the resume has a summary section), so no text is lost.
+    """
+    matches = list(_HEADING_RE.finditer(text))
+    header_end = matches[0].start() if matches else len(text)
+    contact, header_body = _parse_header(text[:header_end])
+
+    parts = {}
+    for i, match in enumerate(matches):
+        kind = next(name for name in SECTION_HEADINGS if match.group(name))
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        body = _compact((match.group('rest') or '') + '\n' + text[match.end():end])
+        if body:
+            parts.setdefault(kind, []).append(body)
+
+    sections = {'version': SECTIONS_VERSION}
+    if any(contact[key] for key in ('name', 'emails', 'phones', 'links', 'text')):
+        sections['contact'] = contact
+    if header_body:
+        parts.setdefault('other' if 'summary' in parts else 'summary', []).insert(0, header_body)
+    for kind in SECTION_TITLES:
+        if kind in parts:
+            sections[kind] = '\n'.join(parts[kind])
+    return sections
+
+
+def load_sections(resume):
+    """
+    Returns the sections of a stored resume, parsing (and saving) them for
+    resumes whose sections are missing or were parsed by an older version.
+    Raises PDFExtractionError like load_resume_text().
+    """
+    sections = resume.sections
+    if sections.get('version') == SECTIONS_VERSION:
+        return sections
+    # Saving text extracted for a legacy row parses it as well.
+    text = load_resume_text(resume)
+    sections = resume.sections
+    if sections.get('version') != SECTIONS_VERSION:
+        sections = parse_sections(text)
+        resume.sections = sections
+        resume.save(update_fields=['sections'])
+    return sections
+
+
+def format_sections(sections, kinds=None):
+    """
+    Renders sections for a prompt as '## Title' blocks in a fixed order.
+    `kinds` limits which sections are included.
+    """
+    blocks = []
+    for kind, title in SECTION_TITLES.items():
+        if kinds is not None and kind not in kinds:
+            continue
+        value = sections.get(kind)
+        if kind == 'contact' and value:
+            value = value['text']
+        if value:
+            blocks.append(f"## {title}\n{value}")
+    return '\n\n'.join(blocks)
+
+
+def resume_prompt_text(resume, kinds=None):
+    """The stored resume as prompt text: its sections, limited to `kinds`."""
+    return format_sections(load_sections(resume), kinds)
+
+
+# Sections a chat question is about, by the words it uses.
+_QUESTION_SECTIONS = (
+    (re.compile(r"skill|technolog|tool|stack|framework|language|proficien|competenc", re.IGNORECASE),
+     ('skills', 'languages', 'certifications')),
+    (re.compile(r"experience|job|work|role|career|employ|company|position|achievement|responsib",
+                re.IGNORECASE), ('experience', 'awards')),
+    (re.compile(r"educat|degree|universit|college|school|stud|gpa|certif|course", re.IGNORECASE),
+     ('education', 'certifications')),
+    (re.compile(r"project|portfolio|built|github", re.IGNORECASE), ('projects',)),
+    (re.compile(r"contact|email|phone|linkedin|name", re.IGNORECASE), ('contact',)),
+)
+# Always sent with a question's sections.
+_CHAT_CONTEXT = ('summary',)
+
+
+def sections_for_question(message):
+    """
+    The sections needed to answer a chat question, or None (all sections)
+    when the question does not point at particular ones.
+    """
+    kinds = set()
+    for pattern, section_kinds in _QUESTION_SECTIONS:
+        if pattern.search(message):
+            kinds.update(section_kinds)
+    return kinds | set(_CHAT_CONTEXT) if kinds else None
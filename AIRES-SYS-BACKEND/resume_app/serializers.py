@@ -1,15 +1,100 @@
 from rest_framework import serializers
-from .models import Resume, ChatMessage
+from .models import Resume, ResumeRevision, ChatMessage, Job
 
 #we are creating a serializer class for the Resume model so that we can convert the pdf input into something that can be stored in the database and can be snalyzed by the ai
 
-class ResumeSerializer(serializers.ModelSerializer):
+class FieldSelectionMixin:
+    """
+    Lets callers restrict the output with fields=[...]; see parse_fields().
+    Without it every field is serialized except Meta.opt_in_fields, which
+    are only included when selected.
+    """
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        else:
+            for name in getattr(self.Meta, 'opt_in_fields', ()):
+                self.fields.pop(name)
+
+
+class ResumeSerializer(FieldSelectionMixin, serializers.ModelSerializer):
+    # Stored in ResumeContent; each is only loaded when serialized.
+    text = serializers.CharField(required=False, allow_blank=True)
+    pages = serializers.ListField(child=serializers.CharField(allow_blank=True), required=False)
+    analysis = serializers.CharField(required=False, allow_blank=True)
+    rewritten_content = serializers.CharField(required=False, allow_blank=True)
+    # Parsed from the text when it is saved.
+    sections = serializers.JSONField(read_only=True)
+
     class Meta:
         model = Resume
-        fields = '__all__'
+        fields = [
+            'id', 'file', 'text', 'pages', 'sections', 'analysis', 'uploaded_at',
+            'rewritten_content', 'last_revision_date', 'revision_count', 'user',
+        ]
+        # Large and rarely needed; only serialized when asked for with fields=.
+        opt_in_fields = ['pages', 'sections']
+
+
+def parse_fields(value, serializer_class=ResumeSerializer):
+    """
+    Parses a ?fields=id,analysis selection into a tuple of field names, or
+    None when no selection was made. Raises ValidationError (a 400 in DRF
+    views) for names serializer_class does not have.
+    """
+    if not value:
+        return None
+    fields = tuple(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+    unknown = set(fields) - set(serializer_class().fields) - set(getattr(serializer_class.Meta, 'opt_in_fields', ()))
+    if unknown:
+        raise serializers.ValidationError({'fields': [f"Unknown field(s): {', '.join(sorted(unknown))}."]})
+    return fields or None
+
+
+class ResumeRevisionSerializer(serializers.ModelSerializer):
+    parent = serializers.IntegerField(source='parent.number', allow_null=True, default=None)
+
+    class Meta:
+        model = ResumeRevision
+        fields = ['number', 'parent', 'source', 'feedback', 'kind', 'depth', 'size', 'created_at']
 
 
 class ChatMessageSerializer(serializers.ModelSerializer):
     class Meta:
         model = ChatMessage
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+
+# Columns to select with .values() for chat_message_data().
+CHAT_MESSAGE_VALUES = ('id', 'sender', 'message', 'created_at', 'resume_id', 'user_id')
+_datetime_field = serializers.DateTimeField()
+
+
+def chat_message_data(rows):
+    """
+    Same output as ChatMessageSerializer(many=True).data for rows selected
+    with .values(*CHAT_MESSAGE_VALUES), without instantiating a model and
+    running every serializer field per message.
+    """
+    format_datetime = _datetime_field.to_representation
+    return [
+        {
+            'id': row['id'],
+            'sender': row['sender'],
+            'message': row['message'],
+            'created_at': format_datetime(row['created_at']),
+            'resume': row['resume_id'],
+            'user': row['user_id'],
+        }
+        for row in rows
+    ]
+
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = ['id', 'job_type', 'status', 'result', 'result_status', 'error',
+                  'created_at', 'started_at', 'finished_at']
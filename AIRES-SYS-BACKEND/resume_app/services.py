@@ -0,0 +1,485 @@
+import hashlib
+import json
+import re
+from contextlib import nullcontext
+
+import requests
+from rest_framework import status
+
+from .models import Resume, ChatMessage
+from .serializers import ResumeSerializer
+from .pdf_extraction import PDFExtractionError
+from .prompts import PromptBudgetError, get_prompt
+from .json_extraction import JSONExtractionError, JSONExtractor, extract_json
+from .sections import SECTION_TITLES, SECTIONS_VERSION, resume_prompt_text, sections_for_question
+from .inference import MISTRAL_MODEL, InferenceCall, run_async, run_sync
+from .revisions import RevisionNotFound, load_version, record_revision
+from .caching import analysis_cache
+from .coalescing import coalescer, request_key
+from .log import get_logger, payload_logger
+
+logger = get_logger('llm')
+
+
+# The last line of the rewrite and revision prompts (prompts.md); replies that
+# echo the prompt put their answer after it.
+RESPONSE_MARKER = "**Your Response (JSON Object Only):**"
+
+
+def reply_markdown(raw_text, key):
+    """
+    The Markdown resume in a rewrite or revision reply: the `key` string of
+    its JSON object (repaired if need be, and as far as it got when the
+    reply was cut off), else the reply itself when it is Markdown rather
+    than JSON. Returns None when there is neither.
+    """
+    extractor = JSONExtractor()
+    extractor.feed(raw_text)
+    try:
+        data = extractor.finish()
+    except JSONExtractionError as e:
+        logger.warning("Failed to parse JSON from AI response (%s). Attempting fallback.", e)
+    else:
+        if extractor.truncated:
+            logger.warning("AI response was cut off; using the JSON it contains so far.")
+        value = data.get(key)
+        if isinstance(value, str) and value.strip():
+            return value.strip().replace("```json\n", "").replace("\n```", "")
+        logger.warning("AI response JSON has no '%s' string. Attempting fallback.", key)
+
+    # Fallback: Markdown after the prompt's final instruction, or the whole reply
+    content = raw_text.rsplit(RESPONSE_MARKER, 1)[-1].strip()
+    if content.startswith("#"):
+        logger.debug("Fallback extraction of Markdown successful.")
+        return content.replace("```json\n", "").replace("\n```", "").replace("```", "")
+    logger.debug("Fallback failed; response starts with: %s...", content[:50])
+    return None
+
+
+# Sections of the resume sent for analysis: all but the references.
+ANALYSIS_SECTIONS = tuple(kind for kind in SECTION_TITLES if kind != 'references')
+
+ANALYSIS_PROMPT = get_prompt('analysis')
+
+# Bumps automatically whenever the template (prompts.md) or the sections sent
+# with it change, invalidating the cached analyses produced by the previous prompt.
+ANALYSIS_PROMPT_VERSION = hashlib.sha256(
+    f"{ANALYSIS_PROMPT.version}{ANALYSIS_SECTIONS}{SECTIONS_VERSION}".encode('utf-8')
+).hexdigest()[:12]
+
+
+def analysis_flow(resume_id, fields=None):
+    """
+    Generates the ATS analysis for a resume and stores it on the row.
+    Returns (data, status_code); `fields` limits the serialized resume and
+    the columns loaded for it.
+    """
+    resumes = Resume.objects.all()
+    if fields:
+        resumes = resumes.only('id', *(name for name in fields if name not in Resume.CONTENT_FIELDS))
+    try:
+        resume = resumes.get(id=resume_id)
+    except Resume.DoesNotExist:
+        return {"error": "Resume not found"}, status.HTTP_404_NOT_FOUND
+    
+    if not resume.text:
+        return {"error": "Resume text not found"}, status.HTTP_400_BAD_REQUEST
+    
+    resume_text = resume_prompt_text(resume, ANALYSIS_SECTIONS)
+
+    # Serve repeat analyses of the same text, prompt and model from the cache
+    cache_key = analysis_cache.make_key(resume_text, ANALYSIS_PROMPT_VERSION, MISTRAL_MODEL)
+    cached_analysis = analysis_cache.get(cache_key)
+    if cached_analysis is not None:
+        resume.analysis = cached_analysis
+        resume.save(update_fields=['analysis'])
+        return ResumeSerializer(resume, fields=fields).data, status.HTTP_200_OK
+
+    # Create a prompt for the Hugging Face model, within its token budget
+    prompt = ANALYSIS_PROMPT.render(resume_text=resume_text)
+    
+    payload = {"inputs": prompt, "parameters": {"max_tokens": ANALYSIS_PROMPT.max_new_tokens}}
+
+    try:
+        result = yield InferenceCall(MISTRAL_MODEL, payload, 'analyze')
+        payload_logger.debug("Hugging Face API response for resume %s: %s", resume_id, result)
+
+        if "error" in result:
+            return {"error": "Error analyzing resume", "details": result["error"]}, status.HTTP_500_INTERNAL_SERVER_ERROR
+
+        if not isinstance(result, list) or len(result) == 0:
+            return {"error": "Unexpected API response format", "details": result}, status.HTTP_500_INTERNAL_SERVER_ERROR
+
+        analysis = result[0].get("generated_text")
+        try:
+            json_str = json.dumps(extract_json(analysis), ensure_ascii=False)
+            parsed = True
+        except JSONExtractionError as e:
+            # Keep the reply as it is; it is not cached.
+            logger.warning("Failed to parse JSON from analysis of resume %s (%s)", resume_id, e)
+            json_str, parsed = analysis, False
+
+        resume.analysis = json_str
+        resume.save(update_fields=['analysis'])
+        if parsed:
+            analysis_cache.store(cache_key, json_str, ANALYSIS_PROMPT_VERSION, MISTRAL_MODEL)
+
+        serializer = ResumeSerializer(resume, fields=fields)
+        return serializer.data, status.HTTP_200_OK
+    except Exception as e:
+        return {"error": "Error analyzing resume", "details": str(e)}, status.HTTP_500_INTERNAL_SERVER_ERROR
+
+
+def rewrite_flow(resume_id):
+    """
+    Rewrites a resume using AI, requesting and parsing JSON output,
+    including cleaning of invalid escape sequences.
+    Returns (data, status_code).
+    """
+    try:
+        # --- Get the original resume content ---
+        # Only the text is read; the file and pages load lazily for legacy rows.
+        resume = Resume.objects.only('id').get(id=resume_id)
+
+        # The sections parsed at upload (extracting the text first for legacy rows)
+        try:
+            original_content = resume_prompt_text(resume)
+        except PDFExtractionError as extraction_error:
+            logger.error("Error extracting text from PDF for resume %s: %s", resume_id, extraction_error)
+            return {'error': 'Failed to process the original resume PDF.', 'details': str(extraction_error)}, status.HTTP_500_INTERNAL_SERVER_ERROR
+
+        if not original_content or not original_content.strip():
+             # This case should be less likely after the extraction improvements, but keep as safety
+             logger.error("Original resume content is empty for resume %s even after extraction attempt.", resume_id)
+             return {'error': 'Original resume content is empty.'}, status.HTTP_400_BAD_REQUEST
+
+        # --- Create prompt for Hugging Face API (Requesting JSON, see prompts.md) ---
+        rewrite_prompt = get_prompt('rewrite')
+        prompt = rewrite_prompt.render(original_content=original_content)
+
+        payload = {
+            "inputs": prompt,
+            "parameters": {
+                 "max_new_tokens": rewrite_prompt.max_new_tokens,
+                 "return_full_text": False,
+                 "temperature": 0.7,
+                 "do_sample": True,
+                 # Consider adding repetition penalty if needed: "repetition_penalty": 1.1
+                 }
+        }
+
+        rewritten_content = None # Initialize variable
+        failure = 'The AI response contained no rewritten resume.'
+
+        try:
+            # --- Try sending request to Hugging Face API ---
+            logger.debug("Sending request to Hugging Face API for resume %s", resume_id)
+            # A failed call is raised here as an InferenceError (a RequestException)
+            result = yield InferenceCall(MISTRAL_MODEL, payload, 'rewrite')
+            raw_generated_text = "" # Initialize
+
+            # Handle potential variations in successful response structure
+            if isinstance(result, list) and len(result) > 0 and "generated_text" in result[0]:
+                 raw_generated_text = result[0].get("generated_text", "")
+            elif isinstance(result, dict) and "generated_text" in result:
+                 raw_generated_text = result.get("generated_text", "")
+            else:
+                 logger.warning("Unexpected API response format: %s", result)
+                 raise Exception("Unexpected response format from AI service")
+
+            payload_logger.debug("Raw AI Response Text for resume %s:\n---\n%s\n---", resume_id, raw_generated_text)
+
+            # --- Take the Markdown from the JSON output ---
+            rewritten_content = reply_markdown(raw_generated_text, "rewritten_markdown")
+
+
+        except requests.exceptions.RequestException as api_error:
+            logger.error("Error calling Hugging Face API: %s", api_error)
+            # Log more details if possible (e.g., response content for 4xx/5xx errors)
+            if hasattr(api_error, 'response') and api_error.response is not None:
+                logger.error("API Error Response Status: %s", api_error.response.status_code)
+                logger.error("API Error Response Body: %s...", api_error.response.text[:500]) # Log first 500 chars
+            failure = str(api_error)
+
+        except Exception as e:
+             # Catch other unexpected errors during API call/processing
+             logger.exception("Unexpected error during AI processing: %s", e)
+             failure = str(e)
+
+
+        # --- Final Check: never store made-up content in place of the rewrite ---
+        if rewritten_content is None or not rewritten_content.strip(): # Check if it's None or empty/whitespace
+            logger.error("Failed to get valid content from AI for resume %s; nothing was saved.", resume_id)
+            return {
+                'error': 'The AI service did not return a usable rewrite. Please try again.',
+                'details': failure,
+            }, status.HTTP_502_BAD_GATEWAY
+        message = "Resume rewrite processed successfully using AI response."
+
+
+        # --- Store the rewritten content as a new version ---
+        try:
+            revision = record_revision(resume.id, rewritten_content, 'rewrite')
+            logger.debug("Saved rewritten content (length: %d) for resume %s as version %d",
+                         len(rewritten_content), resume_id, revision.number)
+        except Exception as db_error:
+             logger.error("Failed to save rewritten content to database for resume %s: %s", resume_id, db_error)
+             # Decide how to handle this - return error? Return content without saving?
+             return {'error': 'Failed to save the rewritten resume content.', 'details': str(db_error)}, status.HTTP_500_INTERNAL_SERVER_ERROR
+
+
+        return {
+            'rewritten_content': rewritten_content,
+            'version': revision.number,
+            'message': message # Updated message reflects outcome
+        }, status.HTTP_200_OK
+
+    except Resume.DoesNotExist:
+        return {'error': 'Resume not found'}, status.HTTP_404_NOT_FOUND
+    except Exception as e:
+        # Catch-all for unexpected errors (e.g., database connection issues)
+        logger.exception("Fatal error in rewrite_flow for resume %s: %s", resume_id, e)
+        return {'error': 'An unexpected server error occurred.', 'details': str(e)}, status.HTTP_500_INTERNAL_SERVER_ERROR
+
+
+def revision_flow(resume_id, feedback, current_version=None, version=None):
+    """
+    Revises a rewritten resume based on user feedback, with the same JSON
+    handling and error recovery as rewrite_flow. The stored `version` (by
+    default the latest one) is revised; a `current_version` text sent by
+    older clients is used as-is instead. Returns (data, status_code).
+    """
+    if version is not None:
+        try:
+            version = int(version)
+        except (TypeError, ValueError):
+            return {'error': 'version must be an integer.'}, status.HTTP_400_BAD_REQUEST
+
+    try:
+        resume = Resume.objects.only('id').get(id=resume_id)
+        try:
+            if version is not None:
+                current_version = load_version(resume.id, version)
+            elif not current_version:
+                current_version = resume.rewritten_content
+        except RevisionNotFound as e:
+            return {'error': str(e)}, status.HTTP_404_NOT_FOUND
+        if not current_version:
+            return {'error': 'Resume has not been rewritten yet.'}, status.HTTP_400_BAD_REQUEST
+        
+        # Create prompt for Hugging Face API (Requesting JSON, see prompts.md)
+        revision_prompt = get_prompt('revision')
+        try:
+            prompt = revision_prompt.render(current_version=current_version, feedback=feedback)
+        except PromptBudgetError as e:
+            return {'error': str(e)}, status.HTTP_400_BAD_REQUEST
+        
+        payload = {
+            "inputs": prompt,
+            "parameters": {
+                 "max_new_tokens": revision_prompt.max_new_tokens,
+                 "return_full_text": False,
+                 "temperature": 0.7,
+                 "do_sample": True,
+                 # Consider adding repetition penalty if needed: "repetition_penalty": 1.1
+            }
+        }
+        
+        revised_content = None  # Initialize variable
+        failure = 'The AI response contained no revised resume.'
+        
+        try:
+            # --- Try sending request to Hugging Face API ---
+            logger.debug("Sending request to Hugging Face API for resume revision %s", resume_id)
+            # A failed call is raised here as an InferenceError (a RequestException)
+            result = yield InferenceCall(MISTRAL_MODEL, payload, 'revise')
+            raw_generated_text = ""  # Initialize
+            
+            # Handle potential variations in successful response structure
+            if isinstance(result, list) and len(result) > 0 and "generated_text" in result[0]:
+                raw_generated_text = result[0].get("generated_text", "")
+            elif isinstance(result, dict) and "generated_text" in result:
+                raw_generated_text = result.get("generated_text", "")
+            else:
+                logger.warning("Unexpected API response format: %s", result)
+                raise Exception("Unexpected response format from AI service")
+            
+            payload_logger.debug("Raw AI Response Text for resume revision %s:\n---\n%s\n---", resume_id, raw_generated_text)
+            
+            # --- Take the Markdown from the JSON output ---
+            revised_content = reply_markdown(raw_generated_text, "revised_markdown")
+                    
+        except requests.exceptions.RequestException as api_error:
+            logger.error("Error calling Hugging Face API: %s", api_error)
+            # Log more details if possible (e.g., response content for 4xx/5xx errors)
+            if hasattr(api_error, 'response') and api_error.response is not None:
+                logger.error("API Error Response Status: %s", api_error.response.status_code)
+                logger.error("API Error Response Body: %s...", api_error.response.text[:500])  # Log first 500 chars
+            failure = str(api_error)
+            
+        except Exception as e:
+            # Catch other unexpected errors during API call/processing
+            logger.exception("Unexpected error during AI processing: %s", e)
+            failure = str(e)
+            
+        # --- Final Check: the current version stays the latest when the AI fails ---
+        if revised_content is None or not revised_content.strip():  # Check if it's None or empty/whitespace
+            logger.error("Failed to get valid content from AI for resume revision %s; nothing was saved.", resume_id)
+            return {
+                'error': 'The AI service did not return a usable revision. Please try again.',
+                'details': failure,
+            }, status.HTTP_502_BAD_GATEWAY
+        message = "Resume revision processed successfully using AI response."
+            
+        # --- Additional cleaning to ensure proper formatting for PDF generation ---
+        # Remove any triple backticks that might interfere with markdown parsing
+        revised_content = revised_content.replace("```markdown", "").replace("```", "")
+        
+        # Ensure proper line breaks for markdown
+        revised_content = re.sub(r'\n{3,}', '\n\n', revised_content)  # Replace excessive newlines
+        
+        # Make sure all bullets are properly formatted for markdown-to-html conversion
+        revised_content = re.sub(r'(?<=\n)\s*\*\s+', '* ', revised_content)
+        
+        # --- Store the revised content as a new version ---
+        try:
+            revision = record_revision(resume.id, revised_content, 'revise', feedback, parent_number=version)
+            logger.debug("Saved revised content (length: %d) for resume %s as version %d",
+                         len(revised_content), resume_id, revision.number)
+        except Exception as db_error:
+            logger.error("Failed to save revised content to database for resume %s: %s", resume_id, db_error)
+            return {'error': 'Failed to save the revised resume content.', 'details': str(db_error)}, status.HTTP_500_INTERNAL_SERVER_ERROR
+            
+        return {
+            'revised_content': revised_content,
+            'version': revision.number,
+            'message': message  # Updated message reflects outcome
+        }, status.HTTP_200_OK
+        
+    except Resume.DoesNotExist:
+        return {'error': 'Resume not found'}, status.HTTP_404_NOT_FOUND
+    except Exception as e:
+        # Catch-all for unexpected errors (e.g., database connection issues)
+        logger.exception("Fatal error in revision_flow for resume %s: %s", resume_id, e)
+        return {'error': 'An unexpected server error occurred.', 'details': str(e)}, status.HTTP_500_INTERNAL_SERVER_ERROR
+
+
+def build_chat_prompt(resume_text, message):
+    """The chat prompt of prompts.md; raises PromptBudgetError for overlong messages."""
+    return get_prompt('chat').render(resume_text=resume_text, message=message)
+
+
+def final_chat_reply(reply):
+    # Split the reply on "AI:" and return only the final segment
+    parts = reply.split("AI:")
+    return parts[-1].strip() if parts else reply
+
+
+def chat_flow(resume_id, message, user=None):
+    """
+    Answers a question about a resume. The AI reply is saved as a
+    ChatMessage when `user` is given. Returns (data, status_code).
+    """
+    # Retrieve the resume object from the database
+    try:
+        resume_obj = Resume.objects.only('id').get(id=resume_id)
+        resume_text = resume_prompt_text(resume_obj, sections_for_question(message))
+    except Resume.DoesNotExist:
+        return {"error": "Resume not found"}, status.HTTP_404_NOT_FOUND
+    except PDFExtractionError as e:
+        return {"error": "Error processing PDF", "details": str(e)}, status.HTTP_500_INTERNAL_SERVER_ERROR
+
+    # Full resume text is only logged in full-payload debug mode
+    payload_logger.debug("Resume text content for resume %s:\n%s", resume_id, resume_text)
+
+    # Construct the prompt for the AI
+    try:
+        chat_prompt = build_chat_prompt(resume_text, message)
+    except PromptBudgetError as e:
+        return {"error": str(e)}, status.HTTP_400_BAD_REQUEST
+
+    payload = {
+        "inputs": chat_prompt,
+        "parameters": {"max_tokens": get_prompt('chat').max_new_tokens}
+    }
+    try:
+        ai_result = yield InferenceCall(MISTRAL_MODEL, payload, 'chat')
+        payload_logger.debug("Hugging Face API raw response: %s", ai_result)
+        if isinstance(ai_result, list) and len(ai_result) > 0:
+            reply = ai_result[0].get("generated_text", "Sorry, no response from AI.")
+        else:
+            reply = "Sorry, no response from AI."
+
+        final_reply = final_chat_reply(reply)
+
+        # If the user is authenticated, save the AI response in the database
+        if user is not None:
+            ChatMessage.objects.create(
+                resume=resume_obj,
+                user=user,
+                sender='ai',
+                message=final_reply
+            )
+
+        return {"reply": final_reply}, status.HTTP_200_OK
+    except Exception as e:
+        return {"error": "Chat processing failed", "details": str(e)}, status.HTTP_500_INTERNAL_SERVER_ERROR
+
+
+# Blocking entry points, used by the WSGI views and the job workers.
+# Duplicates of an analyze / rewrite / revise request already running, in
+# any process, wait for its result instead of generating again. Only the
+# request that runs the flow enters `call_context` (the views pass
+# throttling.admission.slot); duplicates wait without holding a slot.
+
+def _leader(flow, call_context):
+    def call():
+        with call_context() if call_context is not None else nullcontext():
+            return run_sync(flow())
+    return call
+
+
+def run_analysis(resume_id, fields=None, call_context=None):
+    return coalescer.run(
+        request_key('analyze', resume_id, fields),
+        _leader(lambda: analysis_flow(resume_id, fields), call_context),
+    )
+
+
+def run_rewrite(resume_id, call_context=None):
+    return coalescer.run(request_key('rewrite', resume_id), _leader(lambda: rewrite_flow(resume_id), call_context))
+
+
+def run_revision(resume_id, feedback, current_version=None, version=None, call_context=None):
+    return coalescer.run(
+        request_key('revise', resume_id, [feedback, current_version, version]),
+        _leader(lambda: revision_flow(resume_id, feedback, current_version, version), call_context),
+    )
+
+
+def run_chat(resume_id, message, user=None):
+    return run_sync(chat_flow(resume_id, message, user))
+
+
+# Async entry points for the ASGI views (see async_views.py).
+
+async def arun_analysis(resume_id, fields=None):
+    return await coalescer.arun(
+        request_key('analyze', resume_id, fields),
+        lambda: run_async(analysis_flow(resume_id, fields)),
+    )
+
+
+async def arun_rewrite(resume_id):
+    return await coalescer.arun(request_key('rewrite', resume_id), lambda: run_async(rewrite_flow(resume_id)))
+
+
+async def arun_revision(resume_id, feedback, current_version=None, version=None):
+    return await coalescer.arun(
+        request_key('revise', resume_id, [feedback, current_version, version]),
+        lambda: run_async(revision_flow(resume_id, feedback, current_version, version)),
+    )
+
+
+async def arun_chat(resume_id, message, user=None):
+    return await run_async(chat_flow(resume_id, message, user))
@@ -1,3 +1,1799 @@
-from django.test import TestCase
+import asyncio
+import hashlib
+import io
+import json
+import math
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from datetime import timedelta
+from http.server import ThreadingHTTPServer
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.signals import request_started
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from .inference import (
+    AsyncInferenceClient, CircuitBreaker, CircuitOpenError, InferenceClient, InferenceError, UpstreamError,
+)
+from . import pdf_extraction, services
+from .bulk import BulkUploadError, collect_files, process_batch
+from .caching import AnalysisCache, ExtractionCache, LRUCache
+from .classifier import LocalResumeClassifier
+from .coalescing import Coalescer, request_key
+from .jobs import JOB_HANDLERS, START_WORKERS_UID, JobWorkerPool, claim_next_job, run_job, worker_pool
+from .json_extraction import JSONExtractionError, JSONExtractor, extract_json
+from .management.commands.bench_json_extraction import MUTATIONS, REWRITE_SEED, SEED_FILE, _leaves
+from .management.commands.fake_inference_server import make_handler
+from .models import (
+    AnalysisResult, ChatMessage, ExtractedDocument, InflightRequest, Job, Resume, ResumeContent, ResumeRevision,
+)
+from .pagination import InvalidCursor, decode_cursor, encode_cursor
+from .pdf_extraction import PDFExtractionError, extract_pages
+from .pdf_render import PDFCache, renderer_available
+from .revisions import RevisionNotFound, apply_delta, load_version, make_delta, record_revision
+from .prompts import (
+    TEMPLATES, TRUNCATION_MARKER, PromptBudgetError, count_tokens, fit_tokens, get_prompt, load_prompts,
+)
+from .ranking import RankingIndex, ranking_available, term_counts
+from .search import highlight, parse_query, search_resumes, use_postgres
+from .serializers import ResumeSerializer, parse_fields
+from .throttling import AdmissionController, Overloaded, admission, async_admission, parse_rate
+
+
+class FakeInferenceServer:
+    """fake_inference_server on a free local port, for the duration of a `with` block."""
+
+    def __init__(self, latency=0, **options):
+        self.handler = make_handler(latency, **options)
+
+    def __enter__(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self.handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/models"
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+    @property
+    def calls(self):
+        return self.handler.calls
+
+    def client(self, **options):
+        return InferenceClient(base_url=self.base_url, **{'backoff_base': 0.01, 'backoff_max': 0.05, **options})
+
+
+def make_resume(text="Jane Doe\nSkills\nPython, Django\nExperience\nBuilt things.", **fields):
+    resume = Resume(file='resumes/jane.pdf', **fields)
+    resume.text = text
+    resume.save()
+    return resume
+
+
+def minimal_pdf(pages=1, text="Jane Doe", broken_pages=()):
+    """
+    A small PDF with `pages` pages of Helvetica text and a correct xref
+    table. The page tree of every page reads fine, but extracting the text
+    of a page in `broken_pages` raises (its font is not a font).
+    """
+    font = 3 + 2 * pages
+    kids = " ".join(f"{3 + 2 * i} 0 R" for i in range(pages))
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>",
+    ]
+    for i in range(pages):
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}, page {i + 1}) Tj ET"
+        page_font = 4 + 2 * i if i in broken_pages else font
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + 2 * i} 0 R "
+                       f"/Resources << /Font << /F1 {page_font} 0 R >> >> >>")
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode('latin-1')
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode('latin-1')
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode('latin-1')
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode('latin-1')
+    return out
+
+
+class APITestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Background job workers would race the test's transaction.
+        request_started.disconnect(dispatch_uid=START_WORKERS_UID)
+
+    def setUp(self):
+        # Token buckets live in the cache; start every test with full ones.
+        cache.clear()
+        self.api = APIClient()
+
+
+@override_settings(HF_CIRCUIT_FAILURE_THRESHOLD=2, HF_CIRCUIT_RESET_TIMEOUT=60)
+class InferenceClientTests(SimpleTestCase):
+    payload = {"inputs": "Hello"}
+
+    def test_retries_503_and_429_until_success(self):
+        with FakeInferenceServer(failures=[503, 429]) as server:
+            with self.assertLogs('resume_app.llm', 'WARNING') as logs:
+                result = server.client(max_retries=3).post('model', self.payload)
+        self.assertEqual(result[0]['generated_text'][:4], "AI: ")
+        self.assertEqual(len(server.calls), 3)
+        self.assertEqual(len(logs.records), 2)
+
+    def test_gives_up_after_max_retries(self):
+        with FakeInferenceServer(failures=[503] * 3) as server:
+            with self.assertRaises(UpstreamError) as raised, self.assertLogs('resume_app.llm', 'WARNING'):
+                server.client(max_retries=2).post('model', self.payload)
+        self.assertEqual(raised.exception.response.status_code, 503)
+        self.assertEqual(raised.exception.payload, {"error": "Fake failure 503"})
+        self.assertEqual(len(server.calls), 3)
+
+    def test_client_errors_are_not_retried(self):
+        with FakeInferenceServer(failures=[400]) as server:
+            client = server.client(max_retries=3)
+            with self.assertRaises(UpstreamError):
+                client.post('model', self.payload)
+        self.assertEqual(len(server.calls), 1)
+        # The upstream answered, so its breaker stays closed.
+        self.assertEqual(client.breaker('model')._failures, 0)
+
+    def test_backoff_honours_retry_after(self):
+        with FakeInferenceServer(failures=[429], retry_after=0.02) as server:
+            with mock.patch('resume_app.inference.time.sleep') as sleep, self.assertLogs('resume_app.llm'):
+                server.client(max_retries=1).post('model', self.payload)
+        # time.sleep is also the fake server's (zero) latency.
+        sleep.assert_any_call(0.02)
+
+    def test_retry_after_is_capped_at_backoff_max(self):
+        with FakeInferenceServer(failures=[503], retry_after=120) as server:
+            with mock.patch('resume_app.inference.time.sleep') as sleep, self.assertLogs('resume_app.llm'):
+                server.client(max_retries=1).post('model', self.payload)
+        sleep.assert_any_call(0.05)
+        self.assertNotIn(mock.call(120.0), sleep.call_args_list)
+
+    def test_backoff_without_retry_after_is_jittered_exponential(self):
+        client = InferenceClient(base_url='http://127.0.0.1:9', backoff_base=1, backoff_max=5)
+        for attempt, ceiling in ((0, 1), (1, 2), (2, 4), (5, 5)):
+            with mock.patch('resume_app.inference.random.uniform', return_value=0) as uniform:
+                client._backoff(attempt)
+            uniform.assert_called_once_with(0, ceiling)
+
+    def test_async_client_retries_like_the_sync_one(self):
+        with FakeInferenceServer(failures=[503]) as server:
+            client = AsyncInferenceClient(server.client(max_retries=1))
+            with self.assertLogs('resume_app.llm', 'WARNING'):
+                result = async_to_sync(client.post)('model', self.payload)
+        self.assertIn('generated_text', result[0])
+        self.assertEqual(len(server.calls), 2)
+
+    def test_breaker_opens_after_consecutive_failures(self):
+        with FakeInferenceServer(failures=[503, 503]) as server:
+            client = server.client(max_retries=0)
+            for _ in range(2):
+                with self.assertRaises(UpstreamError):
+                    client.post('model', self.payload)
+            self.assertEqual(client.breaker('model').state, 'open')
+            with self.assertRaises(CircuitOpenError):
+                client.post('model', self.payload)
+        # The open circuit failed fast, without calling the upstream.
+        self.assertEqual(len(server.calls), 2)
+
+    def test_half_open_trial_success_closes_the_breaker(self):
+        with FakeInferenceServer(failures=[503, 503]) as server:
+            client = server.client(max_retries=0)
+            breaker = client.breaker('model')
+            breaker.reset_timeout = 0.05
+            for _ in range(2):
+                with self.assertRaises(UpstreamError):
+                    client.post('model', self.payload)
+            time.sleep(0.06)
+            self.assertEqual(breaker.state, 'half-open')
+            client.post('model', self.payload)
+        self.assertEqual(breaker.state, 'closed')
+
+    def test_half_open_trial_failure_reopens_the_breaker(self):
+        with FakeInferenceServer(failures=[503, 503, 503]) as server:
+            client = server.client(max_retries=0)
+            breaker = client.breaker('model')
+            breaker.reset_timeout = 0.05
+            for _ in range(2):
+                with self.assertRaises(UpstreamError):
+                    client.post('model', self.payload)
+            time.sleep(0.06)
+            with self.assertRaises(UpstreamError):
+                client.post('model', self.payload)
+            self.assertEqual(breaker.state, 'open')
+            with self.assertRaises(CircuitOpenError):
+                client.post('model', self.payload)
+
+    def test_unexpected_error_frees_the_half_open_trial(self):
+        client = InferenceClient(base_url='http://127.0.0.1:9', max_retries=0)
+        breaker = client.breaker('model')
+        breaker.reset_timeout = 0
+        breaker.record_failure()
+        breaker.record_failure()
+        with mock.patch.object(client.session, 'post', side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                client.post('model', self.payload)
+        # Nothing was learnt about the upstream; the next call is a new trial.
+        self.assertTrue(breaker.allow())
+
+    def test_network_errors_count_as_failures(self):
+        # Nothing listens on the discard port.
+        client = InferenceClient(base_url='http://127.0.0.1:9', max_retries=1, backoff_base=0.01)
+        for _ in range(2):
+            with self.assertRaises(InferenceError), self.assertLogs('resume_app.llm', 'WARNING'):
+                client.post('model', self.payload)
+        self.assertEqual(client.breaker('model').state, 'open')
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def test_half_open_lets_a_single_trial_through(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'half-open')
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, 'closed')
+        self.assertTrue(breaker.allow())
+
+
+def sse_events(response):
+    """The (event, data) pairs of a streamed text/event-stream response."""
+    body = b"".join(response.streaming_content).decode('utf-8')
+    events = []
+    for block in body.split("\n\n"):
+        if block:
+            event, data = block.split("\n")
+            events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+class ChatStreamTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.resume = make_resume()
+
+    def stream(self, server, **data):
+        with mock.patch('resume_app.views.get_client', return_value=server.client(max_retries=0)):
+            response = self.api.post('/api/chat/stream/', {'resume_id': self.resume.pk, **data}, format='json')
+            return response, sse_events(response)
+
+    def test_tokens_then_done(self):
+        with FakeInferenceServer(generated_text="User: skills? AI: Python and Django.") as server:
+            response, events = self.stream(server, message="What are the skills?")
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        tokens = [data['text'] for event, data in events if event == 'token']
+        self.assertEqual("".join(tokens), "User: skills? AI: Python and Django.")
+        self.assertGreater(len(tokens), 1)
+        self.assertEqual(events[-1], ('done', {'reply': "Python and Django."}))
+        # The upstream was asked for a stream.
+        self.assertTrue(server.calls[0][1]['stream'])
+
+    def test_reply_is_saved_for_signed_in_users(self):
+        user = User.objects.create_user('jane', password='secret')
+        self.api.force_authenticate(user)
+        with FakeInferenceServer(generated_text="AI: Hello.") as server:
+            self.stream(server, message="Hi")
+        self.assertEqual(list(ChatMessage.objects.values_list('sender', 'message')), [('ai', "Hello.")])
+
+    def test_upstream_failure_is_an_error_event(self):
+        with FakeInferenceServer(failures=[400]) as server:
+            response, events = self.stream(server, message="Hi")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0][0], 'error')
+        self.assertEqual(events[0][1]['error'], 'Chat processing failed')
+        self.assertFalse(ChatMessage.objects.exists())
+
+    def test_missing_fields_and_unknown_resume(self):
+        response = self.api.post('/api/chat/stream/', {'resume_id': self.resume.pk}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.api.post('/api/chat/stream/', {'resume_id': 999999, 'message': "Hi"}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+
+class ChatCursorTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.resume = make_resume()
+        start = timezone.now() - timedelta(hours=1)
+        self.messages = []
+        for i in range(7):
+            message = ChatMessage.objects.create(resume=self.resume, sender='user', message=f"m{i}")
+            # m2 and m3 share a timestamp; the id breaks the tie.
+            minutes = 2 if i == 3 else i
+            ChatMessage.objects.filter(pk=message.pk).update(created_at=start + timedelta(minutes=minutes))
+            self.messages.append(message.pk)
+
+    def page(self, **params):
+        response = self.api.get('/api/chat-messages/', {'resume_id': self.resume.pk, **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response, [row['message'] for row in response.json()]
+
+    def test_newest_page_then_back_through_before(self):
+        # The page boundary falls between m2 and m3, which share a timestamp.
+        response, texts = self.page(limit=4)
+        self.assertEqual(texts, ["m3", "m4", "m5", "m6"])
+        history = texts
+        while 'X-Cursor-Before' in response:
+            response, texts = self.page(limit=2, before=response['X-Cursor-Before'])
+            history = texts + history
+        self.assertEqual(history, [f"m{i}" for i in range(7)])
+
+    def test_since_cursor_returns_newer_messages(self):
+        response, _ = self.page(limit=3, before=self.page(limit=3)[0]['X-Cursor-Before'])
+        since = response['X-Cursor-Since']
+        response, texts = self.page(since=since, limit=2)
+        self.assertEqual(texts, ["m4", "m5"])
+        self.assertEqual(response['X-Has-More'], 'true')
+        response, texts = self.page(since=response['X-Cursor-Since'])
+        self.assertEqual(texts, ["m6"])
+        self.assertEqual(response['X-Has-More'], 'false')
+        # Nothing newer: the cursor is handed back for the next poll.
+        response, texts = self.page(since=response['X-Cursor-Since'])
+        self.assertEqual(texts, [])
+        self.assertEqual(response['X-Cursor-Since'], self.page(since=since)[0]['X-Cursor-Since'])
+
+    def test_since_accepts_timestamps_with_an_unencoded_plus(self):
+        created_at = ChatMessage.objects.get(pk=self.messages[4]).created_at
+        stamp = created_at.isoformat()
+        self.assertTrue(stamp.endswith('+00:00'))
+        _, texts = self.page(since=stamp)
+        self.assertEqual(texts, ["m5", "m6"])
+        # What a '+' put in the query string unencoded arrives as.
+        _, texts = self.page(since=stamp.replace('+', ' '))
+        self.assertEqual(texts, ["m5", "m6"])
+
+    def test_bad_parameters(self):
+        for params in ({'before': 'x', 'since': 'y'}, {'before': 'not a cursor'}, {'limit': 0}, {'limit': 'ten'}):
+            response = self.api.get('/api/chat-messages/', {'resume_id': self.resume.pk, **params})
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn('error', response.json())
+
+
+class CursorTests(SimpleTestCase):
+    def test_round_trip(self):
+        created_at = timezone.now()
+        self.assertEqual(decode_cursor(encode_cursor(created_at, 42)), (created_at, 42))
+
+    def test_naive_time_is_not_read_as_an_offset(self):
+        timestamp, pk = decode_cursor("2026-10-18 10:00", allow_timestamp=True)
+        self.assertIsNone(pk)
+        self.assertIsNone(timestamp.tzinfo)
+
+    def test_timestamps_are_only_accepted_for_since(self):
+        with self.assertRaises(InvalidCursor):
+            decode_cursor("2026-10-18T10:00:00+00:00")
+
+
+RESUME_WORDS = (
+    "designed built shipped migrated scaled tuned led mentored automated reduced latency cost "
+    "payments search billing api pipeline dashboard cluster kafka postgres redis react django"
+).split()
+
+
+def resume_markdown(version):
+    """A 30-bullet resume; each version edits one bullet and the skills line."""
+    rng = random.Random(0)
+    lines = ["# Jane Doe", "## Experience"]
+    for i in range(30):
+        bullet = " ".join(rng.choice(RESUME_WORDS) for _ in range(12))
+        lines.append(f"* {bullet} (v{version})" if i == version % 30 else f"* {bullet}")
+    return "\n".join(lines + ["## Skills", f"* Python, Django, skill {version}"]) + "\n"
+
+
+class DeltaTests(SimpleTestCase):
+    def test_round_trip(self):
+        cases = [
+            ("", "a\nb\n"),
+            ("a\nb\n", ""),
+            ("a\nb\nc\n", "a\nB\nc\nd"),
+            ("no newline at the end", "no newline at the end\nnow there is\n"),
+            ("x\r\ny\r\n", "x\r\nz\r\ny\r\n"),
+            (resume_markdown(1), resume_markdown(2)),
+        ]
+        for base, target in cases:
+            self.assertEqual(apply_delta(base, make_delta(base, target)), target, (base, target))
+
+    def test_unchanged_lines_are_copied_by_reference(self):
+        delta = make_delta(resume_markdown(1), resume_markdown(2))
+        literals = [item for item in delta if isinstance(item, str)]
+        # Bullets 1 and 2 (adjacent) and the skills line.
+        self.assertEqual(len(literals), 2)
+        self.assertEqual(sum(item.count("\n") for item in literals), 3)
+
+
+@override_settings(REVISION_SNAPSHOT_INTERVAL=4)
+class RevisionHistoryTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.resume = make_resume()
+
+    def test_every_version_rebuilds_exactly(self):
+        for version in range(1, 11):
+            record_revision(self.resume.pk, resume_markdown(version), 'rewrite' if version == 1 else 'revise')
+        for version in range(1, 11):
+            self.assertEqual(load_version(self.resume.pk, version), resume_markdown(version))
+
+        revisions = ResumeRevision.objects.filter(resume=self.resume).order_by('number')
+        kinds = [revision.kind for revision in revisions]
+        # A snapshot starts every chain of at most three deltas.
+        self.assertEqual(kinds, ['snapshot', 'delta', 'delta', 'delta'] * 2 + ['snapshot', 'delta'])
+        self.assertTrue(all(revision.depth < 4 for revision in revisions))
+
+        resume = Resume.objects.get(pk=self.resume.pk)
+        self.assertEqual(resume.rewritten_content, resume_markdown(10))
+        self.assertEqual(resume.revision_count, 9)
+
+    def test_revising_an_older_version_branches_from_it(self):
+        for version in range(1, 4):
+            record_revision(self.resume.pk, resume_markdown(version), 'revise')
+        branch = resume_markdown(2).replace("Django", "Flask")
+        revision = record_revision(self.resume.pk, branch, 'revise', feedback="Flask", parent_number=2)
+        self.assertEqual(revision.number, 4)
+        self.assertEqual(revision.parent.number, 2)
+        self.assertEqual(revision.kind, ResumeRevision.KIND_DELTA)
+        self.assertEqual(load_version(self.resume.pk, 4), branch)
+        self.assertEqual(load_version(self.resume.pk, 3), resume_markdown(3))
+
+    def test_a_complete_rewrite_is_stored_as_a_snapshot(self):
+        record_revision(self.resume.pk, resume_markdown(1), 'rewrite')
+        unrelated = "\n".join(f"- line {i} of something else entirely" for i in range(30))
+        revision = record_revision(self.resume.pk, unrelated, 'rewrite')
+        self.assertEqual(revision.kind, ResumeRevision.KIND_SNAPSHOT)
+        self.assertEqual(load_version(self.resume.pk, 2), unrelated)
+
+    def test_missing_versions(self):
+        with self.assertRaises(RevisionNotFound):
+            load_version(self.resume.pk, 1)
+        with self.assertRaises(RevisionNotFound):
+            record_revision(self.resume.pk, "text", 'revise', parent_number=5)
+
+    def test_revision_endpoints(self):
+        for version in range(1, 4):
+            record_revision(self.resume.pk, resume_markdown(version), 'revise')
+        response = self.api.get(f'/api/resumes/{self.resume.pk}/revisions/')
+        self.assertEqual([row['number'] for row in response.json()], [3, 2, 1])
+        response = self.api.get(f'/api/resumes/{self.resume.pk}/revisions/2/')
+        self.assertEqual(response.json()['content'], resume_markdown(2))
+        response = self.api.get(f'/api/resumes/{self.resume.pk}/revisions/9/')
+        self.assertEqual(response.status_code, 404)
+
+
+def feed_in_pieces(text, size):
+    extractor = JSONExtractor()
+    for i in range(0, len(text), size):
+        value = extractor.feed(text[i:i + size])
+        if value is not None:
+            return value
+    return extractor.finish()
+
+
+class JSONExtractionTests(SimpleTestCase):
+    """Replies from bench_json_extraction's fuzz corpus, parsed whole and token by token."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        rng = random.Random(0)
+        seeds = [json.loads(SEED_FILE.read_text(encoding='utf-8')), REWRITE_SEED]
+        cls.corpus = [
+            (mutation, *MUTATIONS[mutation](seed, rng), seed)
+            for mutation in MUTATIONS for seed in seeds for _ in range(15)
+        ]
+
+    def test_corpus_is_recovered(self):
+        for mutation, text, expected, seed in self.corpus:
+            if expected is None:
+                continue
+            with self.subTest(mutation=mutation, text=text[:80]):
+                self.assertEqual(extract_json(text), expected)
+                for size in (1, 4, 7):
+                    self.assertEqual(feed_in_pieces(text, size), expected)
+
+    def test_cut_off_replies_keep_what_came_before(self):
+        for mutation, text, expected, seed in self.corpus:
+            if expected is not None:
+                continue
+            with self.subTest(text=text[-80:]):
+                try:
+                    value = extract_json(text)
+                except JSONExtractionError:
+                    # Cut off before the object had any content to keep.
+                    self.assertLess(len(text.strip()), 40)
+                    continue
+                leaves = _leaves(value)
+                self.assertEqual(leaves[:-1], _leaves(seed)[:len(leaves) - 1])
+
+    def test_braces_in_prose_are_skipped(self):
+        text = 'Scores are {approximate}. {"scores": {"overall": 70}, "ok": True, "note": None}'
+        self.assertEqual(extract_json(text), {"scores": {"overall": 70}, "ok": True, "note": None})
+
+    def test_no_object(self):
+        with self.assertRaises(JSONExtractionError):
+            extract_json("I cannot help with that.")
+
+
+class ReplyMarkdownTests(APITestCase):
+    def test_markdown_from_json_or_plain_reply(self):
+        self.assertEqual(
+            services.reply_markdown('Sure:\n{"rewritten_markdown": "# Jane\n* Python \\d"}', "rewritten_markdown"),
+            "# Jane\n* Python \\d",
+        )
+        with self.assertLogs('resume_app', 'WARNING'):
+            self.assertEqual(services.reply_markdown("# Jane\n## Skills", "rewritten_markdown"), "# Jane\n## Skills")
+            self.assertIsNone(services.reply_markdown("Sorry, I can't.", "rewritten_markdown"))
+
+    def test_unusable_rewrite_is_an_error_and_not_saved(self):
+        resume = make_resume()
+        flow = services.rewrite_flow(resume.pk)
+        next(flow)
+        with self.assertRaises(StopIteration) as stopped, self.assertLogs('resume_app', 'WARNING'):
+            flow.send([{"generated_text": "Sorry, I can't."}])
+        data, status_code = stopped.exception.value
+        self.assertEqual(status_code, 502)
+        self.assertIn('error', data)
+        self.assertFalse(ResumeRevision.objects.filter(resume=resume).exists())
+        self.assertEqual(Resume.objects.get(pk=resume.pk).rewritten_content, '')
+
+
+@override_settings(COALESCE_POLL_INTERVAL=0.05, COALESCE_RESULT_TTL=5)
+class CoalescingTests(TransactionTestCase):
+    # Leaders and followers run on their own threads and database connections.
+
+    def setUp(self):
+        self.coalescer = Coalescer()
+        self.calls = 0
+        self.release = threading.Event()
+
+    def call(self):
+        self.calls += 1
+        self.release.wait(5)
+        return {'analysis': "Good"}, 200
+
+    def in_thread(self, func, results):
+        def target():
+            try:
+                results.append(func())
+            finally:
+                connection.close()
+        thread = threading.Thread(target=target)
+        thread.start()
+        return thread
+
+    def wait_for_lease(self, key):
+        deadline = time.monotonic() + 5
+        while not InflightRequest.objects.filter(key=key).exists():
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+
+    # SQLite's in-memory test database locks whole tables across connections.
+    @skipUnlessDBFeature('test_db_allows_multiple_connections')
+    def test_duplicates_share_one_call(self):
+        key = request_key('analyze', 1)
+        results = []
+        threads = [self.in_thread(lambda: self.coalescer.run(key, self.call), results)]
+        self.wait_for_lease(key)
+        threads += [self.in_thread(lambda: self.coalescer.run(key, self.call), results) for _ in range(3)]
+        time.sleep(0.1)
+        self.release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, [({'analysis': "Good"}, 200)] * 4)
+        self.assertEqual(self.coalescer.stats()['leaders'], 1)
+        self.assertEqual(self.coalescer.stats()['followers'], 3)
+
+    def test_repeat_right_after_gets_the_stored_result(self):
+        self.release.set()
+        key = request_key('rewrite', 1)
+        self.coalescer.run(key, self.call)
+        self.assertEqual(self.coalescer.run(key, self.call), ({'analysis': "Good"}, 200))
+        self.assertEqual(self.calls, 1)
+        with override_settings(COALESCE_RESULT_TTL=0):
+            self.coalescer.run(request_key('rewrite', 2), self.call)
+            self.coalescer.run(request_key('rewrite', 2), self.call)
+        self.assertEqual(self.calls, 3)
+
+    def test_failed_leader_drops_its_lease(self):
+        key = request_key('analyze', 1)
+
+        def failing():
+            raise RuntimeError("boom")
+        with self.assertRaises(RuntimeError):
+            self.coalescer.run(key, failing)
+        self.assertFalse(InflightRequest.objects.filter(key=key).exists())
+        self.release.set()
+        self.assertEqual(self.coalescer.run(key, self.call)[1], 200)
+
+    def test_expired_lease_is_taken_over(self):
+        key = request_key('analyze', 1)
+        InflightRequest.objects.create(key=key, owner='dead', lease_until=timezone.now() - timedelta(seconds=1))
+        self.release.set()
+        with self.assertLogs('resume_app', 'WARNING'):
+            self.assertEqual(self.coalescer.run(key, self.call)[1], 200)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.coalescer.stats()['takeovers'], 1)
+
+    def test_inputs_are_part_of_the_key(self):
+        self.assertEqual(request_key('revise', 1, ["shorter", None]), request_key('revise', 1, ["shorter", None]))
+        self.assertNotEqual(request_key('revise', 1, ["shorter", None]), request_key('revise', 1, ["longer", None]))
+        self.assertNotEqual(request_key('revise', 1), request_key('rewrite', 1))
+
+    def test_async_duplicates_share_one_call(self):
+        async def call():
+            self.calls += 1
+            await asyncio.sleep(0.2)
+            return {'analysis': "Good"}, 200
+
+        async def duplicates():
+            key = request_key('analyze', 1)
+            return await asyncio.gather(*(self.coalescer.arun(key, call) for _ in range(3)))
+
+        self.assertEqual(async_to_sync(duplicates)(), [({'analysis': "Good"}, 200)] * 3)
+        self.assertEqual(self.calls, 1)
+
+    @override_settings(COALESCE_REQUESTS=False)
+    def test_can_be_turned_off(self):
+        self.release.set()
+        key = request_key('analyze', 1)
+        self.coalescer.run(key, self.call)
+        self.coalescer.run(key, self.call)
+        self.assertEqual(self.calls, 2)
+
+
+THROTTLED = {
+    'REST_FRAMEWORK': {
+        **settings.REST_FRAMEWORK,
+        'DEFAULT_THROTTLE_RATES': {'inference_user': '4/min', 'inference_anon': '2/min'},
+    },
+    'INFERENCE_BURST': {},
+}
+
+
+@override_settings(**THROTTLED)
+class RateLimitTests(APITestCase):
+    def chat(self, path='/api/chat/'):
+        return self.api.post(path, {'resume_id': 1, 'message': "Hi"}, format='json')
+
+    def assertRetryAfter(self, response, low, high):
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(low <= int(response['Retry-After']) <= high, response['Retry-After'])
+
+    @mock.patch('resume_app.views.run_chat', return_value=({'reply': "Hello"}, 200))
+    def test_anonymous_clients_get_429_with_retry_after(self, run_chat):
+        self.assertEqual([self.chat().status_code for _ in range(2)], [200, 200])
+        # One token every 30 seconds.
+        self.assertRetryAfter(self.chat(), 29, 30)
+        self.assertEqual(run_chat.call_count, 2)
+
+    @mock.patch('resume_app.views.run_chat', return_value=({'reply': "Hello"}, 200))
+    def test_users_have_their_own_buckets(self, run_chat):
+        for _ in range(2):
+            self.chat()
+        self.api.force_authenticate(User.objects.create_user('jane', password='secret'))
+        self.assertEqual([self.chat().status_code for _ in range(4)], [200] * 4)
+        self.assertRetryAfter(self.chat(), 14, 15)
+
+    @mock.patch('resume_app.views.run_chat', return_value=({'reply': "Hello"}, 200))
+    @mock.patch('resume_app.async_views.arun_chat', new_callable=mock.AsyncMock, return_value=({'reply': "Hi"}, 200))
+    def test_async_views_share_the_limits(self, arun_chat, run_chat):
+        self.assertEqual(self.chat().status_code, 200)
+        self.assertEqual(self.chat('/api/async/chat/').status_code, 200)
+        self.assertRetryAfter(self.chat('/api/async/chat/'), 29, 30)
+
+    @override_settings(INFERENCE_MAX_CONCURRENT=1, INFERENCE_QUEUE_SIZE=0)
+    @mock.patch('resume_app.views.run_chat', return_value=({'reply': "Hello"}, 200))
+    def test_full_admission_queue_is_429(self, run_chat):
+        admission.acquire()
+        try:
+            response = self.chat()
+        finally:
+            admission.release()
+        self.assertRetryAfter(response, 1, 1)
+        run_chat.assert_not_called()
+        self.assertEqual(self.chat().status_code, 200)
+
+    @override_settings(INFERENCE_MAX_CONCURRENT=1, INFERENCE_QUEUE_SIZE=0)
+    def test_duplicates_of_a_running_request_hold_no_slot(self):
+        resume, other = make_resume(), make_resume()
+        # A duplicate whose leader has just finished.
+        InflightRequest.objects.create(
+            key=request_key('analyze', resume.pk), owner='leader', status=InflightRequest.STATUS_DONE,
+            result={'id': resume.pk}, result_status=200, lease_until=timezone.now() + timedelta(seconds=30),
+        )
+        admission.acquire()
+        try:
+            duplicate = self.api.post('/api/analyze_resume/', {'resume_id': resume.pk}, format='json')
+            leader = self.api.post('/api/analyze_resume/', {'resume_id': other.pk}, format='json')
+        finally:
+            admission.release()
+        self.assertEqual((duplicate.status_code, duplicate.json()), (200, {'id': resume.pk}))
+        self.assertRetryAfter(leader, 1, 1)
+        self.assertEqual(admission.stats()['in_flight'], 0)
+
+    @override_settings(INFERENCE_MAX_CONCURRENT=1, INFERENCE_QUEUE_SIZE=0,
+                       ASYNC_INFERENCE_MAX_CONCURRENT=1, ASYNC_INFERENCE_QUEUE_SIZE=0)
+    @mock.patch('resume_app.views.run_chat', return_value=({'reply': "Hello"}, 200))
+    @mock.patch('resume_app.async_views.arun_chat', new_callable=mock.AsyncMock, return_value=({'reply': "Hi"}, 200))
+    def test_async_views_have_their_own_admission_limit(self, arun_chat, run_chat):
+        self.api.force_authenticate(User.objects.create_user('jane', password='secret'))
+        admission.acquire()
+        try:
+            self.assertEqual(self.chat('/api/async/chat/').status_code, 200)
+            self.assertRetryAfter(self.chat(), 1, 1)
+        finally:
+            admission.release()
+        async_admission.acquire()
+        try:
+            self.assertRetryAfter(self.chat('/api/async/chat/'), 1, 1)
+            self.assertEqual(self.chat().status_code, 200)
+        finally:
+            async_admission.release()
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('20/min'), (20, 60))
+        self.assertEqual(parse_rate('5/s'), (5, 1))
+        self.assertIsNone(parse_rate(None))
+
+
+@override_settings(INFERENCE_MAX_CONCURRENT=1, INFERENCE_QUEUE_SIZE=2, INFERENCE_QUEUE_TIMEOUT=5)
+class AdmissionControllerTests(SimpleTestCase):
+    def setUp(self):
+        self.controller = AdmissionController()
+
+    def waiter(self, name, order):
+        """A thread waiting for a slot; returns once it is queued, so waiters queue in call order."""
+        def target():
+            self.controller.acquire()
+            order.append(name)
+        queued = self.controller.stats()['queued']
+        thread = threading.Thread(target=target)
+        thread.start()
+        deadline = time.monotonic() + 5
+        while self.controller.stats()['queued'] == queued:
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.005)
+        return thread
+
+    def test_slots_are_handed_over_in_arrival_order(self):
+        order = []
+        self.controller.acquire()
+        first = self.waiter('first', order)
+        second = self.waiter('second', order)
+        self.controller.release()
+        first.join(5)
+        self.assertEqual(order, ['first'])
+        self.controller.release()
+        second.join(5)
+        self.assertEqual(order, ['first', 'second'])
+        self.controller.release()
+        self.assertEqual(self.controller.stats()['in_flight'], 0)
+
+    def test_full_queue_is_rejected_at_once(self):
+        self.controller.acquire()
+        threads = [self.waiter(name, []) for name in ('a', 'b')]
+        with self.assertRaises(Overloaded) as raised:
+            self.controller.acquire()
+        self.assertGreaterEqual(raised.exception.wait, 1)
+        for thread in threads:
+            self.controller.release()
+            thread.join(5)
+        self.controller.release()
+        self.assertEqual(self.controller.stats()['rejected_queue_full'], 1)
+
+    @override_settings(INFERENCE_QUEUE_TIMEOUT=0.05)
+    def test_waiting_times_out(self):
+        self.controller.acquire()
+        with self.assertRaises(Overloaded):
+            self.controller.acquire()
+        stats = self.controller.stats()
+        self.assertEqual((stats['queued'], stats['rejected_timeout']), (0, 1))
+        self.controller.release()
+        self.assertEqual(self.controller.stats()['in_flight'], 0)
+
+    def test_held_stream_releases_when_closed(self):
+        self.controller.acquire()
+        stream = self.controller.hold(iter(["a", "b"]))
+        self.assertEqual(next(stream), "a")
+        self.assertEqual(self.controller.stats()['in_flight'], 1)
+        stream.close()
+        self.assertEqual(self.controller.stats()['in_flight'], 0)
+
+    def test_cancelled_async_waiter_passes_its_slot_on(self):
+        async def scenario():
+            self.controller.acquire()
+            waiting = asyncio.ensure_future(self.controller.aacquire())
+            await asyncio.sleep(0.01)
+            waiting.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiting
+            self.controller.release()
+        async_to_sync(scenario)()
+        self.assertEqual(self.controller.stats()['in_flight'], 0)
+
+
+@override_settings(UPLOAD_MAX_BYTES=20000, PDF_MAX_PAGES=3)
+class UploadRejectionTests(APITestCase):
+    paths = ('/api/api/validate_resume/', '/api/upload_resume/', '/api/async/validate_resume/')
+
+    def assertRejected(self, content, status_code, error, name='resume.pdf'):
+        for path in self.paths:
+            with self.subTest(path=path):
+                response = self.api.post(path, {'file': SimpleUploadedFile(name, content)}, format='multipart')
+                self.assertEqual(response.status_code, status_code, response.content)
+                self.assertIn(error, response.json()['error'])
+
+    def test_other_file_types(self):
+        self.assertRejected(minimal_pdf(), 400, "File must be a PDF", name='resume.docx')
+
+    def test_not_a_pdf(self):
+        self.assertRejected(b"Jane Doe, Python developer.\n" * 60, 400, "not a PDF document")
+        self.assertRejected(b"short", 400, "not a PDF document")
+
+    def test_too_large(self):
+        padded = minimal_pdf().replace(b"%PDF-1.4\n", b"%PDF-1.4\n" + b"%" * 30000 + b"\n")
+        self.assertRejected(padded, 413, "larger than 20000 bytes")
+        # Beyond the multipart allowance it is refused from Content-Length alone.
+        self.assertRejected(padded + b"%" * 100000, 413, "larger than 20000 bytes")
+
+    def test_too_many_pages(self):
+        self.assertRejected(minimal_pdf(pages=4), 400, "has 4 pages; the limit is 3")
+
+    def test_truncated(self):
+        pdf = minimal_pdf()
+        self.assertRejected(pdf[:len(pdf) // 2], 400, "truncated or damaged")
+
+    def test_startxref_pointing_elsewhere(self):
+        pdf = minimal_pdf()
+        xref = pdf.rindex(b"xref\n0 ")
+        self.assertRejected(pdf.replace(b"startxref\n%d" % xref, b"startxref\n%d" % (xref - 20)), 400,
+                            "does not point at a cross-reference table")
+
+    def test_valid_pdf_is_handed_over_with_its_digest(self):
+        pdf = minimal_pdf(pages=3)
+        received = {}
+
+        def validate(file, materialize):
+            received.update(sha256=file.sha256, content=file.read())
+            return [], True, {'confidence': 0.9}
+        with mock.patch('resume_app.views.ResumeValidator') as validator:
+            validator.return_value.validate.side_effect = validate
+            response = self.api.post('/api/api/validate_resume/',
+                                     {'file': SimpleUploadedFile('resume.pdf', pdf)}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(received, {'sha256': hashlib.sha256(pdf).hexdigest(), 'content': pdf})
+
+
+class PDFExtractionTests(SimpleTestCase):
+    def setUp(self):
+        # A pool of this test's own, shut down afterwards.
+        patcher = mock.patch.object(pdf_extraction, '_pool', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(lambda: pdf_extraction._pool and pdf_extraction._pool.shutdown(cancel_futures=True))
+
+    def test_pages_in_order(self):
+        self.assertEqual(extract_pages(minimal_pdf(pages=2)), ["Jane Doe, page 1", "Jane Doe, page 2"])
+
+    @override_settings(PDF_EXTRACTION_WORKERS=2, PDF_PARALLEL_MIN_PAGES=2)
+    def test_parallel_pages_in_order(self):
+        pages = extract_pages(minimal_pdf(pages=9))
+        self.assertEqual(pages, [f"Jane Doe, page {i}" for i in range(1, 10)])
+
+    def test_page_cap_and_unreadable_files(self):
+        with self.assertRaisesMessage(PDFExtractionError, "PDF has 3 pages; the limit is 2."):
+            extract_pages(minimal_pdf(pages=3), max_pages=2)
+        with self.assertRaisesMessage(PDFExtractionError, "Could not read the PDF file"):
+            extract_pages(b"%PDF-1.4\nnot really")
+        with self.assertRaisesMessage(PDFExtractionError, "Could not read the PDF file"):
+            extract_pages(minimal_pdf(pages=2, broken_pages={1}))
+
+    @override_settings(PDF_EXTRACTION_WORKERS=2, PDF_PARALLEL_MIN_PAGES=2)
+    def test_corrupt_document_does_not_fail_a_concurrent_one(self):
+        # The corrupt document's first range fails at once while its second
+        # is still running; the pool it shares with the good one must survive.
+        corrupt = minimal_pdf(pages=800, broken_pages={0})
+        good = minimal_pdf(pages=800)
+        extract_pages(minimal_pdf(pages=2))  # starts the workers
+        pool = pdf_extraction._pool
+        errors = []
+
+        def extract_corrupt():
+            try:
+                extract_pages(corrupt, max_pages=1000)
+            except PDFExtractionError as e:
+                errors.append(e)
+        thread = threading.Thread(target=extract_corrupt)
+        thread.start()
+        time.sleep(0.05)
+        pages = extract_pages(good, max_pages=1000)
+        thread.join(30)
+        self.assertEqual(len(pages), 800)
+        self.assertEqual(pages[-1], "Jane Doe, page 800")
+        self.assertEqual(len(errors), 1)
+        self.assertIs(pdf_extraction._pool, pool)
+
+
+def classify_by_text(text):
+    is_resume = "Invoice" not in text
+    return is_resume, {'is_resume': is_resume, 'confidence': 0.9, 'top_label': 'resume' if is_resume else 'invoice'}
+
+
+def make_zip(members, corrupt=()):
+    """A zip archive of `members` (name -> bytes); members in `corrupt` fail their CRC check."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+    data = buffer.getvalue()
+    for name in corrupt:
+        content = members[name]
+        data = data.replace(content, content[:-1] + bytes([content[-1] ^ 1]), 1)
+    return data
+
+
+class BulkUploadTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        media_root = override_settings(MEDIA_ROOT=media)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        patcher = mock.patch.object(pdf_extraction, '_pool', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(lambda: pdf_extraction._pool and pdf_extraction._pool.shutdown(cancel_futures=True))
+        self.use_fresh_cache()
+
+    def use_fresh_cache(self):
+        # An empty memory tier; the ExtractedDocument table is left as it is.
+        patcher = mock.patch('resume_app.bulk.extraction_cache', ExtractionCache(1024 * 1024))
+        self.cache = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def collect(self, *uploads):
+        return collect_files([SimpleUploadedFile(name, content) for name, content in uploads])
+
+    def run_batch(self, files, classify=classify_by_text):
+        results = list(process_batch(files, classify))
+        return {result['file']: result for result in results[:-1]}, results[-1]['summary']
+
+    def test_zip_archives_are_expanded(self):
+        archive = make_zip({
+            'cv/jane.pdf': minimal_pdf(text="Jane"),
+            'cv/': b"",
+            '__MACOSX/cv/._jane.pdf': b"resource fork",
+            'cv/notes.txt': b"not a PDF",
+        })
+        files = self.collect(('batch.zip', archive), ('john.pdf', minimal_pdf(text="John")),
+                             ('broken.zip', b"PK not really"))
+        self.assertEqual(files, [
+            {'file': 'cv/jane.pdf', 'data': minimal_pdf(text="Jane")},
+            {'file': 'cv/notes.txt', 'error': "File must be a PDF"},
+            {'file': 'john.pdf', 'data': minimal_pdf(text="John")},
+            {'file': 'broken.zip', 'error': "Not a valid zip archive"},
+        ])
+
+    def test_corrupt_archive_member_fails_alone(self):
+        bad = minimal_pdf(text="Corrupt")
+        archive = make_zip({'bad.pdf': bad, 'good.pdf': minimal_pdf()}, corrupt=['bad.pdf'])
+        with override_settings(BULK_UPLOAD_MAX_BYTES=len(minimal_pdf()) + len(bad) - 1):
+            # Only the member actually read counts towards the batch limit.
+            bad_result, good_result = self.collect(('batch.zip', archive))
+        self.assertIn("Could not read it from the archive", bad_result['error'])
+        self.assertEqual(good_result, {'file': 'good.pdf', 'data': minimal_pdf()})
+
+    def test_per_file_and_per_batch_limits(self):
+        pdf = minimal_pdf()
+        with override_settings(BULK_UPLOAD_MAX_FILE_BYTES=len(pdf) - 1):
+            # Checked from the archive directory, before decompressing.
+            self.assertEqual(self.collect(('batch.zip', make_zip({'big.pdf': pdf}))), [
+                {'file': 'big.pdf', 'error': f"File is larger than {len(pdf) - 1} bytes"},
+            ])
+        with override_settings(BULK_UPLOAD_MAX_BYTES=2 * len(pdf)):
+            self.assertEqual(len(self.collect(('a.pdf', pdf), ('b.pdf', pdf))), 2)
+            with self.assertRaisesMessage(BulkUploadError, f"at most {2 * len(pdf)} bytes"):
+                self.collect(('a.pdf', pdf), ('b.pdf', pdf), ('c.pdf', pdf))
+        with override_settings(BULK_UPLOAD_MAX_FILES=2):
+            with self.assertRaisesMessage(BulkUploadError, "at most 2 files"):
+                self.collect(('batch.zip', make_zip({'a.pdf': pdf, 'b.pdf': pdf, 'c.pdf': pdf})))
+
+    def test_documents_are_created_rejected_or_reported(self):
+        files = self.collect(('jane.pdf', minimal_pdf()), ('invoice.pdf', minimal_pdf(text="Invoice 42")),
+                             ('corrupt.pdf', minimal_pdf(broken_pages={0})), ('notes.txt', b"notes"))
+        results, summary = self.run_batch(files)
+        self.assertEqual(results['jane.pdf']['status'], 'created')
+        resume = Resume.objects.get(pk=results['jane.pdf']['resume_id'])
+        self.assertEqual((resume.text, resume.pages), ("Jane Doe, page 1", ["Jane Doe, page 1"]))
+        self.assertEqual(results['invoice.pdf']['status'], 'rejected')
+        self.assertIn("Could not read the PDF file", results['corrupt.pdf']['error'])
+        self.assertEqual(results['notes.txt']['error'], "File must be a PDF")
+        self.assertEqual((summary['files'], summary['created'], summary['rejected'], summary['error']), (4, 1, 1, 2))
+
+    def test_known_documents_skip_extraction_and_classification(self):
+        files = [{'file': 'jane.pdf', 'data': minimal_pdf()}, {'file': 'invoice.pdf', 'data': minimal_pdf(text="Invoice")}]
+        self.run_batch(files)
+        for tier in ('memory', 'database'):
+            with self.subTest(tier=tier):
+                if tier == 'database':
+                    self.use_fresh_cache()
+                classify = mock.Mock(side_effect=classify_by_text)
+                again = [{'file': 'copy-' + item['file'], 'data': item['data']} for item in files]
+                with mock.patch('resume_app.bulk.submit_extraction') as submit:
+                    results, _ = self.run_batch(again, classify)
+                submit.assert_not_called()
+                classify.assert_not_called()
+                self.assertEqual(results['copy-jane.pdf']['status'], 'created')
+                self.assertEqual(results['copy-invoice.pdf']['status'], 'rejected')
+        self.assertEqual(Resume.objects.count(), 3)
+
+    def test_failed_classifications_are_retried(self):
+        files = [{'file': 'jane.pdf', 'data': minimal_pdf()}]
+        results, _ = self.run_batch(files, lambda text: (False, {'details': "model unavailable"}))
+        self.assertEqual(results['jane.pdf']['error'], "Classification failed")
+        with mock.patch('resume_app.bulk.submit_extraction') as submit:
+            results, _ = self.run_batch(files)
+        # The pages were kept; only the classification runs again.
+        submit.assert_not_called()
+        self.assertEqual(results['jane.pdf']['status'], 'created')
+
+    @override_settings(BULK_CREATE_BATCH_SIZE=2)
+    def test_resumes_are_inserted_in_batches(self):
+        files = [{'file': f'{i}.pdf', 'data': minimal_pdf(text=f"Candidate {i}")} for i in range(5)]
+        with mock.patch.object(Resume, 'bulk_create_with_content', wraps=Resume.bulk_create_with_content) as insert:
+            results, summary = self.run_batch(files)
+        sizes = [len(call.args[0]) for call in insert.call_args_list]
+        self.assertLessEqual(max(sizes), 2)
+        self.assertEqual(sum(sizes), 5)
+        self.assertEqual(summary['created'], 5)
+        for i in range(5):
+            resume = Resume.objects.get(pk=results[f'{i}.pdf']['resume_id'])
+            self.assertEqual(resume.text, f"Candidate {i}, page 1")
+
+    @override_settings(PDF_EXTRACTION_WORKERS=1, PDF_EXTRACTION_TIME_BUDGET=1)
+    def test_hung_document_times_out_and_the_rest_are_resubmitted(self):
+        submit = pdf_extraction.submit_extraction
+
+        def submit_hanging(data):
+            if data != b"hangs":
+                return submit(data)
+            # Stands in for a page PyPDF2 never finishes.
+            pool = pdf_extraction._get_pool()
+            future = pool.submit(time.sleep, 60)
+            pdf_extraction._future_pools[future] = pool
+            return future
+        files = [{'file': 'hangs.pdf', 'data': b"hangs"}, {'file': 'good.pdf', 'data': minimal_pdf()}]
+        with mock.patch('resume_app.bulk.submit_extraction', side_effect=submit_hanging):
+            results, summary = self.run_batch(files)
+        self.assertEqual(results['hangs.pdf']['status'], 'error')
+        self.assertIn("exceeded the 1s time budget", results['hangs.pdf']['error'])
+        self.assertEqual(results['good.pdf']['status'], 'created')
+        self.assertEqual(Resume.objects.get(pk=results['good.pdf']['resume_id']).text, "Jane Doe, page 1")
+        self.assertEqual(summary['created'], 1)
+
+    def test_view_streams_a_line_per_file(self):
+        self.api.force_authenticate(User.objects.create_user('jane', password='secret'))
+        archive = make_zip({'jane.pdf': minimal_pdf(), 'invoice.pdf': minimal_pdf(text="Invoice")})
+        with mock.patch('resume_app.views.ResumeValidator') as validator:
+            validator.return_value.is_resume.side_effect = lambda text, call_context: classify_by_text(text)
+            response = self.api.post('/api/bulk_upload/', {'files': [
+                SimpleUploadedFile('batch.zip', archive), SimpleUploadedFile('john.pdf', minimal_pdf(text="John")),
+            ]}, format='multipart')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+            lines = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        statuses = {line['file']: line['status'] for line in lines[:-1]}
+        self.assertEqual(statuses, {'jane.pdf': 'created', 'invoice.pdf': 'rejected', 'john.pdf': 'created'})
+        self.assertEqual(lines[-1]['summary']['files'], 3)
+        self.assertEqual(set(Resume.objects.values_list('user__username', flat=True)), {'jane'})
+
+    def test_view_rejects_empty_and_oversized_batches(self):
+        self.api.force_authenticate(User.objects.create_user('jane', password='secret'))
+        response = self.api.post('/api/bulk_upload/', {}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        with override_settings(BULK_UPLOAD_MAX_FILES=1):
+            response = self.api.post('/api/bulk_upload/', {'files': [
+                SimpleUploadedFile('a.pdf', minimal_pdf()), SimpleUploadedFile('b.pdf', minimal_pdf()),
+            ]}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("at most 1 files", response.json()['error'])
+        self.assertFalse(Resume.objects.exists())
+
+
+class ResumeContentTests(TestCase):
+    def test_pages_are_stored_compressed_off_the_row(self):
+        pages = [f"Jane Doe, page {i}. Python, Django, PostgreSQL." for i in range(1, 21)]
+        resume = make_resume(text="\n".join(pages), pages=pages)
+        self.assertNotIn('pages', {field.name for field in Resume._meta.concrete_fields})
+        content = ResumeContent.objects.get(resume=resume, kind='pages')
+        self.assertEqual(content.codec, ResumeContent.CODEC_ZLIB)
+        self.assertLess(len(bytes(content.data)), content.size)
+        self.assertEqual(Resume.objects.get(pk=resume.pk).pages, pages)
+        self.assertEqual(make_resume().pages, [])
+
+    def test_storage_report_counts_every_kind(self):
+        make_resume(pages=["Jane Doe", "Skills"])
+        out = io.StringIO()
+        call_command('content_storage_report', repeat=1, stdout=out)
+        kinds = [line.split()[0] for line in out.getvalue().splitlines()[1:] if line.strip()][:3]
+        self.assertEqual(kinds, ['pages', 'sections', 'text'])
+
+
+class ResumeSerializerTests(TestCase):
+    def test_pages_and_sections_are_opt_in(self):
+        resume = make_resume(pages=["Jane Doe"])
+        self.assertNotIn('pages', ResumeSerializer(resume).data)
+        self.assertNotIn('sections', ResumeSerializer(resume).data)
+        self.assertIn('text', ResumeSerializer(resume).data)
+        fields = parse_fields("id,pages,sections")
+        data = ResumeSerializer(resume, fields=fields).data
+        self.assertEqual(set(data), {'id', 'pages', 'sections'})
+        self.assertEqual(data['pages'], ["Jane Doe"])
+        self.assertIn('skills', data['sections'])
+        with self.assertRaises(ValidationError):
+            parse_fields("id,nonsense")
+
+
+def brute_force_bm25(docs, text, k1=1.2, b=0.75):
+    """{resume_id: score} for every doc in {resume_id: text} that scores, computed directly."""
+    counted = {resume_id: term_counts(doc) for resume_id, doc in docs.items()}
+    avg_length = max(sum(length for _, length in counted.values()) / len(docs), 1.0)
+    scores = {}
+    for term, count in term_counts(text)[0].items():
+        df = sum(1 for counts, _ in counted.values() if term in counts)
+        if not df:
+            continue
+        weight = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5)) * (1 + math.log(count))
+        for resume_id, (counts, length) in counted.items():
+            tf = counts.get(term, 0)
+            if tf:
+                norm = k1 * (1 - b + b * length / avg_length)
+                scores[resume_id] = scores.get(resume_id, 0) + weight * tf * (k1 + 1) / (tf + norm)
+    return scores
+
+
+@skipUnless(ranking_available(), "numpy is not installed")
+class RankingIndexTests(SimpleTestCase):
+    WORDS = "python django java kotlin spring react docker kubernetes sql managed teams led".split()
+
+    def setUp(self):
+        self.index = RankingIndex()
+        self.random = random.Random(7)
+
+    def document(self):
+        return " ".join(self.random.choice(self.WORDS) for _ in range(self.random.randint(3, 40)))
+
+    def add(self, docs):
+        self.index.add([(resume_id, *reversed(term_counts(text))) for resume_id, text in docs.items()])
+
+    def assertMatchesBruteForce(self, docs, query):
+        expected = brute_force_bm25(docs, query)
+        ranked = self.index.rank(query, limit=len(docs))
+        self.assertEqual({resume_id for resume_id, _ in ranked}, set(expected))
+        for resume_id, score in ranked:
+            self.assertAlmostEqual(score, expected[resume_id], places=4)
+        scores = [score for _, score in ranked]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_bm25_matches_a_brute_force_scorer(self):
+        docs = {resume_id: self.document() for resume_id in range(1, 201)}
+        self.add(docs)
+        for query in ("python django", "java java kotlin spring", "led teams sql", "cobol"):
+            with self.subTest(query=query):
+                self.assertMatchesBruteForce(docs, query)
+
+    def test_segments_are_merged_geometrically(self):
+        docs = {}
+        for resume_id in range(1, 101):
+            docs[resume_id] = self.document()
+            self.add({resume_id: docs[resume_id]})
+            segments = self.index.stats()['segments']
+            self.assertEqual(sum(segments), resume_id)
+            self.assertLessEqual(len(segments), math.log2(resume_id) + 1)
+            for larger, smaller in zip(segments, segments[1:]):
+                self.assertGreater(larger, 2 * smaller)
+        self.assertMatchesBruteForce(docs, "python docker managed")
+
+    def test_discarded_and_replaced_resumes(self):
+        docs = {resume_id: self.document() for resume_id in range(1, 51)}
+        self.add(docs)
+        self.index.discard([3, 4, 5])
+        for resume_id in (3, 4, 5):
+            del docs[resume_id]
+        docs[7] = "python python python"
+        self.add({7: docs[7]})
+        self.assertEqual(len(self.index), 47)
+        self.assertMatchesBruteForce(docs, "python react")
+        # Merges drop the postings of discarded and replaced versions.
+        for resume_id in range(51, 151):
+            docs[resume_id] = self.document()
+        self.add({resume_id: docs[resume_id] for resume_id in range(51, 151)})
+        self.assertEqual(self.index.stats()['segments'], [147])
+        self.assertEqual(self.index.stats()['postings'], sum(len(term_counts(doc)[0]) for doc in docs.values()))
+        self.assertMatchesBruteForce(docs, "python react")
+
+
+@skipUnless(ranking_available(), "numpy is not installed")
+class RankingSyncTests(TestCase):
+    def test_sync_follows_saved_and_deleted_resumes(self):
+        index = RankingIndex()
+        jane = make_resume("Python developer, Django and PostgreSQL.")
+        john = make_resume("Java developer, Spring.")
+        index.sync()
+        self.assertEqual([resume_id for resume_id, _ in index.rank("django", 10)], [jane.pk])
+
+        john.text = "Python and Django, ten years."
+        john.save()
+        index.sync()
+        self.assertEqual(len(index), 2)
+        self.assertEqual({resume_id for resume_id, _ in index.rank("django", 10)}, {jane.pk, john.pk})
+        self.assertEqual(index.rank("spring", 10), [])
+
+        jane.delete()
+        index.sync()
+        self.assertEqual([resume_id for resume_id, _ in index.rank("django", 10)], [john.pk])
+
+
+class SearchQueryTests(SimpleTestCase):
+    def test_parse_query(self):
+        cases = {
+            'python "machine learning" -intern': ([['python'], ['machine'], ['learning']], ['intern']),
+            'java or kotlin spring': ([['java', 'kotlin'], ['spring']], []),
+            'or python OR': ([['python']], []),
+            'c++ node.js -"senior manager"': ([['c++'], ['node.js']], ['senior', 'manager']),
+            'the of 2020': ([], []),
+        }
+        for query, expected in cases.items():
+            with self.subTest(query=query):
+                self.assertEqual(parse_query(query), expected)
+
+    def test_highlight(self):
+        text = "Jane Doe. " + "filler " * 40 + "Managed a team & led <b>managing</b> reviews."
+        self.assertEqual(highlight(text, ['manage'], fragments=1, width=60), [
+            "…filler filler <mark>Managed</mark> a team &amp; led &lt;b&gt;<mark>managing</mark>&lt;/b&gt; reviews.",
+        ])
+        self.assertEqual(highlight(text, ['cobol']), [])
+
+
+@skipUnless(ranking_available(), "numpy is not installed")
+@override_settings(SEARCH_BACKEND='auto')
+class SearchFallbackTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch('resume_app.search.ranking_index', RankingIndex())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.jane = make_resume("Jane Doe\nManaged Python and Django teams.")
+        self.john = make_resume("John Roe\nPython intern, Kotlin.")
+        self.ann = make_resume("Ann Poe\nJava and Spring, managing releases.")
+
+    def ids(self, query, limit=10, offset=0):
+        count, hits = search_resumes(query, limit, offset)
+        return count, [resume_id for resume_id, _ in hits]
+
+    def test_in_process_index_is_used_off_postgresql(self):
+        self.assertFalse(use_postgres())
+        count, ids = self.ids("python")
+        self.assertEqual((count, sorted(ids)), (2, sorted([self.jane.pk, self.john.pk])))
+        self.assertEqual(self.ids("python -intern"), (1, [self.jane.pk]))
+        self.assertEqual(self.ids("kotlin or spring")[0], 2)
+        # Variants with the same stem match.
+        self.assertEqual(sorted(self.ids("manages")[1]), [self.jane.pk, self.ann.pk])
+        self.assertEqual(self.ids('"python teams"'), (1, [self.jane.pk]))
+        self.assertEqual(self.ids("cobol"), (0, []))
+        self.assertEqual(self.ids("the"), (0, []))
+
+    def test_pages(self):
+        count, first = self.ids("python or java", limit=2)
+        _, rest = self.ids("python or java", limit=2, offset=2)
+        self.assertEqual(count, 3)
+        self.assertEqual(len(first), 2)
+        self.assertEqual(sorted(first + rest), sorted([self.jane.pk, self.john.pk, self.ann.pk]))
+
+    def test_view(self):
+        self.api.force_authenticate(User.objects.create_user('jane', password='secret'))
+        response = self.api.get('/api/search_resumes/', {'q': 'django -intern'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 1)
+        result, = response.json()['results']
+        self.assertEqual(result['id'], self.jane.pk)
+        self.assertEqual(result['highlights'], ["Jane Doe Managed Python and <mark>Django</mark> teams."])
+        self.assertEqual(self.api.get('/api/search_resumes/').status_code, 400)
+
+
+@override_settings(JOB_STALE_AFTER=300, JOB_WORKERS_IN_PROCESS=False)
+class JobQueueTests(APITestCase):
+    def job(self, age=0, **fields):
+        job = Job.objects.create(job_type='analyze', params={'resume_id': 1}, **fields)
+        Job.objects.filter(id=job.id).update(created_at=timezone.now() - timedelta(seconds=age))
+        return job
+
+    def test_jobs_are_claimed_oldest_first_and_once(self):
+        newer, older = self.job(age=1), self.job(age=2)
+        claimed = claim_next_job()
+        self.assertEqual(claimed.id, older.id)
+        self.assertEqual(claimed.status, Job.STATUS_RUNNING)
+        self.assertIsNotNone(claimed.heartbeat_at)
+        self.assertEqual(claim_next_job().id, newer.id)
+        self.assertIsNone(claim_next_job())
+
+    def test_a_job_claimed_by_a_rival_worker_is_skipped(self):
+        first, second = self.job(age=2), self.job(age=1)
+
+        def rival_claims_first(candidates):
+            # Another worker wins the oldest job between the candidate query
+            # and this worker's conditional UPDATE.
+            ids = [*candidates]
+            Job.objects.filter(id=first.id).update(status=Job.STATUS_RUNNING, heartbeat_at=timezone.now())
+            return ids
+        with mock.patch('resume_app.jobs.list', side_effect=rival_claims_first, create=True):
+            claimed = claim_next_job()
+        self.assertEqual(claimed.id, second.id)
+
+    def test_stale_running_jobs_are_claimed_again(self):
+        now = timezone.now()
+        fresh = self.job(age=4, status=Job.STATUS_RUNNING, started_at=now - timedelta(seconds=900),
+                         heartbeat_at=now - timedelta(seconds=10))
+        stale = self.job(age=3, status=Job.STATUS_RUNNING, started_at=now - timedelta(seconds=900),
+                         heartbeat_at=now - timedelta(seconds=301))
+        legacy = self.job(age=2, status=Job.STATUS_RUNNING, started_at=now - timedelta(seconds=301))
+        self.job(age=1, status=Job.STATUS_SUCCEEDED, started_at=now - timedelta(seconds=900))
+        self.assertEqual([claim_next_job().id for _ in range(2)], [stale.id, legacy.id])
+        self.assertIsNone(claim_next_job())
+        self.assertEqual(Job.objects.get(id=fresh.id).heartbeat_at, now - timedelta(seconds=10))
+
+    def test_heartbeat_keeps_running_jobs_from_going_stale(self):
+        job = self.job(status=Job.STATUS_RUNNING, started_at=timezone.now() - timedelta(seconds=900),
+                       heartbeat_at=timezone.now() - timedelta(seconds=299))
+        pool = JobWorkerPool()
+        pool._running.add(job.id)
+        # One beat, then stop; the test's connection must stay open.
+        pool._stopping = mock.Mock(wait=mock.Mock(side_effect=[False, True]))
+        with mock.patch('resume_app.jobs.connection'), mock.patch('resume_app.jobs.close_old_connections'):
+            pool._heartbeat()
+        pool._stopping.wait.assert_called_with(100)
+        self.assertLess(timezone.now() - Job.objects.get(id=job.id).heartbeat_at, timedelta(seconds=5))
+        with mock.patch('resume_app.jobs.timezone.now', return_value=timezone.now() + timedelta(seconds=200)):
+            self.assertIsNone(claim_next_job())
+
+    def test_run_job_records_results_and_crashes(self):
+        handlers = {
+            'analyze': lambda params: ({'id': params['resume_id']}, 200),
+            'rewrite': mock.Mock(side_effect=ValueError("boom")),
+        }
+        with mock.patch.dict(JOB_HANDLERS, handlers):
+            done = self.job()
+            run_job(done)
+            crashed = Job.objects.create(job_type='rewrite', params={'resume_id': 1})
+            with self.assertLogs('resume_app.llm', 'ERROR'):
+                run_job(crashed)
+        done.refresh_from_db()
+        crashed.refresh_from_db()
+        self.assertEqual((done.status, done.result, done.result_status), (Job.STATUS_SUCCEEDED, {'id': 1}, 200))
+        self.assertEqual((crashed.status, crashed.error), (Job.STATUS_FAILED, "boom"))
+        self.assertIsNotNone(crashed.finished_at)
+
+    def test_submit_and_poll(self):
+        resume = make_resume()
+        with mock.patch.object(worker_pool, 'start') as start:
+            response = self.api.post('/api/jobs/', {'job_type': 'revise', 'resume_id': resume.pk,
+                                                    'feedback': "Shorter"}, format='json')
+        start.assert_not_called()
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['status'], Job.STATUS_QUEUED)
+        job = Job.objects.get(id=response.json()['id'])
+        self.assertEqual(job.params, {'resume_id': resume.pk, 'feedback': "Shorter"})
+
+        with mock.patch.dict(JOB_HANDLERS, {'revise': lambda params: ({'revised': True}, 200)}):
+            run_job(claim_next_job())
+        response = self.api.get(f'/api/jobs/{job.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['status'], response.json()['result']), ('succeeded', {'revised': True}))
+
+    def test_submit_validation(self):
+        post = lambda data: self.api.post('/api/jobs/', data, format='json')
+        self.assertEqual(post({'job_type': 'summarize', 'resume_id': 1}).status_code, 400)
+        self.assertEqual(post({'job_type': 'revise', 'resume_id': 1}).json(), {'error': 'feedback not provided'})
+        self.assertEqual(post({'job_type': 'analyze', 'resume_id': 999}).status_code, 404)
+        self.assertEqual(self.api.get(f'/api/jobs/{uuid.uuid4()}/').status_code, 404)
+        self.assertFalse(Job.objects.exists())
+
+
+class LRUCacheTests(SimpleTestCase):
+    def test_size_bounded_eviction(self):
+        lru = LRUCache(10)
+        lru.set('a', "aaaa")
+        lru.set('b', "bbbb")
+        self.assertEqual(lru.get('a'), "aaaa")
+        lru.set('c', "cccc")
+        # 'b' was the least recently used.
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual((lru.get('a'), lru.get('c')), ("aaaa", "cccc"))
+        lru.set('a', "a")
+        lru.set('d', "ddddd")
+        self.assertEqual(lru.stats()['size'], 10)
+        self.assertEqual(len(lru), 3)
+        # A value larger than the cache is not stored and evicts nothing.
+        lru.set('huge', "x" * 11)
+        self.assertIsNone(lru.get('huge'))
+        self.assertEqual(len(lru), 3)
+        self.assertEqual(lru.stats()['evictions'], 1)
+
+    def test_ttl_expiry(self):
+        lru = LRUCache(100, ttl=60)
+        with mock.patch('resume_app.caching.time.monotonic', return_value=1000):
+            lru.set('a', "a")
+            lru.set('b', "b", ttl=10)
+        with mock.patch('resume_app.caching.time.monotonic', return_value=1009):
+            self.assertEqual((lru.get('a'), lru.get('b')), ("a", "b"))
+        with mock.patch('resume_app.caching.time.monotonic', return_value=1010):
+            self.assertEqual((lru.get('a'), lru.get('b')), ("a", None))
+        with mock.patch('resume_app.caching.time.monotonic', return_value=1060):
+            self.assertIsNone(lru.get('a'))
+        self.assertEqual(lru.stats()['size'], 0)
+
+
+class PDFCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+
+    def test_hits_and_misses(self):
+        pdf_cache = PDFCache(self.directory, max_bytes=1000)
+        key = PDFCache.make_key("# Jane Doe")
+        self.assertIsNone(pdf_cache.get(key))
+        pdf_cache.store(key, b"%PDF-1")
+        self.assertEqual(pdf_cache.get(key), b"%PDF-1")
+        self.assertNotEqual(PDFCache.make_key("# John Doe"), key)
+        stats = pdf_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['size']), (1, 1, 6))
+
+    def test_evicts_least_recently_used(self):
+        pdf_cache = PDFCache(self.directory, max_bytes=350)
+        keys = [PDFCache.make_key(str(i)) for i in range(3)]
+        for age, key in zip((300, 200, 100), keys):
+            pdf_cache.store(key, b"x" * 100)
+            os.utime(pdf_cache.path(key), (time.time() - age,) * 2)
+        # Reading the oldest file makes it the most recently used.
+        self.assertIsNotNone(pdf_cache.get(keys[0]))
+        pdf_cache.store(PDFCache.make_key("3"), b"x" * 100)
+        self.assertIsNone(pdf_cache.get(keys[1]))
+        self.assertIsNotNone(pdf_cache.get(keys[0]))
+        self.assertIsNotNone(pdf_cache.get(keys[2]))
+        stats = pdf_cache.stats()
+        self.assertEqual((stats['evictions'], stats['size']), (1, 300))
+
+    def test_eviction_scan_does_not_hold_the_lock(self):
+        pdf_cache = PDFCache(self.directory, max_bytes=50)
+        key = PDFCache.make_key("a")
+        pdf_cache.store(key, b"x" * 10)
+        scanning = threading.Event()
+        release = threading.Event()
+        files = pdf_cache._files
+
+        def slow_files():
+            scanning.set()
+            release.wait(5)
+            return files()
+
+        with mock.patch.object(pdf_cache, '_files', slow_files):
+            writer = threading.Thread(target=pdf_cache.store, args=(PDFCache.make_key("b"), b"x" * 45))
+            writer.start()
+            self.assertTrue(scanning.wait(5))
+            # A lookup completes while the writer is still scanning the directory.
+            reader = threading.Thread(target=pdf_cache.get, args=(key,))
+            reader.start()
+            reader.join(2)
+            self.assertFalse(reader.is_alive())
+            self.assertEqual(pdf_cache.stats()['hits'], 1)
+            release.set()
+            writer.join(5)
+        self.assertIsNone(pdf_cache.get(key))
+        self.assertEqual((pdf_cache.stats()['evictions'], pdf_cache.stats()['size']), (1, 45))
+
+
+@skipUnless(renderer_available(), "markdown and xhtml2pdf are not installed")
+class GeneratePDFTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        patcher = mock.patch('resume_app.views.pdf_cache', PDFCache(directory, max_bytes=10 ** 6))
+        self.pdf_cache = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def generate(self, content, **headers):
+        return self.api.post('/api/generate_pdf/', {'content': content}, format='json', **headers)
+
+    def test_renders_once_and_serves_from_cache(self):
+        with mock.patch('resume_app.views.html_to_pdf', return_value=b"%PDF-1.4 fake") as render:
+            first = self.generate("# Jane Doe\n\n## Experience\n\n- Built things")
+            second = self.generate("# Jane Doe\n\n## Experience\n\n- Built things")
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.content, b"%PDF-1.4 fake")
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertEqual(self.pdf_cache.stats()['hits'], 1)
+
+    def test_matching_etag_is_not_modified(self):
+        with mock.patch('resume_app.views.html_to_pdf', return_value=b"%PDF-1.4 fake") as render:
+            etag = self.generate("# Jane Doe")['ETag']
+            response = self.generate("# Jane Doe", HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response['ETag'], etag)
+            self.assertEqual(self.generate("# Jane Doe", HTTP_IF_NONE_MATCH=f'W/{etag}').status_code, 304)
+            # A stale tag gets the full document.
+            response = self.generate("# John Doe", HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(render.call_count, 2)
+
+
+class ExtractionCacheTests(TestCase):
+    def test_memory_then_database_tier(self):
+        pages = ["Jane Doe", "Python"]
+        ExtractionCache(1024).store('d1', pages, {'is_resume': True})
+        # Another process: an empty memory tier over the same table.
+        cache = ExtractionCache(1024)
+        with self.assertNumQueries(1):
+            entry = cache.get('d1')
+            self.assertEqual(cache.get('d1'), entry)
+        self.assertEqual(entry, {'text': "Jane Doe\nPython", 'pages': pages, 'classification': {'is_resume': True}})
+        self.assertIsNone(cache.get('unknown'))
+        self.assertEqual(cache.stats()['db_hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+        self.assertEqual(cache.stats()['memory']['hits'], 1)
+
+    def test_prefix_only_entries_and_bulk_lookups(self):
+        cache = ExtractionCache(1024)
+        cache.store_many({'d1': (None, {'is_resume': False}), 'd2': (["John Roe"], None)})
+        fresh = ExtractionCache(1024)
+        entries = fresh.get_many(['d1', 'd2', 'd3'])
+        self.assertEqual(entries, {
+            'd1': {'text': None, 'pages': None, 'classification': {'is_resume': False}},
+            'd2': {'text': "John Roe", 'pages': ["John Roe"], 'classification': None},
+        })
+        self.assertEqual((fresh.db_hits, fresh.misses), (2, 1))
+
+    def test_memory_tier_is_size_bounded(self):
+        cache = ExtractionCache(1000)
+        cache.store('d1', ["x" * 300])
+        cache.store('d2', ["y" * 300])
+        self.assertEqual(cache.stats()['memory']['entries'], 1)
+        ExtractedDocument.objects.filter(sha256='d1').delete()
+        self.assertIsNone(cache.get('d1'))
+        self.assertEqual(cache.get('d2')['pages'], ["y" * 300])
+
+    def test_prune(self):
+        cache = ExtractionCache(1024)
+        cache.store_many({'old': (["a"], None), 'new': (["b"], None)})
+        ExtractedDocument.objects.filter(sha256='old').update(updated_at=timezone.now() - timedelta(days=31))
+        self.assertEqual(cache.prune(30 * 24 * 3600, dry_run=True), 1)
+        self.assertEqual(cache.prune(30 * 24 * 3600), 1)
+        self.assertEqual(list(ExtractedDocument.objects.values_list('sha256', flat=True)), ['new'])
+
+
+class AnalysisCacheTests(TestCase):
+    def test_keys_ignore_whitespace_and_unicode_form(self):
+        key = AnalysisCache.make_key("Jane  Doe\n\nPython", 'v1', 'model')
+        self.assertEqual(AnalysisCache.make_key(" Jane Doe Python ", 'v1', 'model'), key)
+        self.assertEqual(AnalysisCache.make_key("Ｊａｎｅ Doe Python", 'v1', 'model'), key)
+        self.assertNotEqual(AnalysisCache.make_key("Jane Doe Python", 'v2', 'model'), key)
+
+    def test_ttl_in_both_tiers(self):
+        cache = AnalysisCache(1024, ttl=60)
+        cache.store('k', '{"score": 7}', 'v1', 'model')
+        self.assertEqual(cache.get('k'), '{"score": 7}')
+        # Another process, after 50 seconds: served from the table, and kept
+        # in memory only for the 10 seconds the row has left.
+        fresh = AnalysisCache(1024, ttl=60)
+        AnalysisResult.objects.filter(cache_key='k').update(created_at=timezone.now() - timedelta(seconds=50))
+        with mock.patch('resume_app.caching.time.monotonic', return_value=1000):
+            self.assertEqual(fresh.get('k'), '{"score": 7}')
+        with mock.patch('resume_app.caching.time.monotonic', return_value=1011):
+            self.assertIsNone(fresh._memory.get('k'))
+        # Expired rows are misses and are deleted.
+        AnalysisResult.objects.filter(cache_key='k').update(created_at=timezone.now() - timedelta(seconds=61))
+        self.assertIsNone(AnalysisCache(1024, ttl=60).get('k'))
+        self.assertFalse(AnalysisResult.objects.exists())
+
+    def test_prune(self):
+        cache = AnalysisCache(1024, ttl=60)
+        cache.store('old', "a", 'v1', 'model')
+        cache.store('new', "b", 'v1', 'model')
+        AnalysisResult.objects.filter(cache_key='old').update(created_at=timezone.now() - timedelta(seconds=60))
+        self.assertEqual(cache.prune(dry_run=True), 1)
+        self.assertEqual(cache.prune(), 1)
+        self.assertEqual(cache.stats()['memory']['entries'], 2)
+        self.assertEqual(list(AnalysisResult.objects.values_list('cache_key', flat=True)), ['new'])
+
+
+PROMPT_FILE = """
+## greeting
+
+A test template.
+
+- budget: {budget}
+- max_new_tokens: 100
+- trim: {trim}
+
+````text
+Hello {{name}}, here is your resume:
+{{resume_text}}
+````
+"""
+
+
+class PromptTests(SimpleTestCase):
+    def write_prompts(self, budget=200, trim='resume_text'):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'prompts.md')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(PROMPT_FILE.format(budget=budget, trim=trim))
+        return path
+
+    def test_registry(self):
+        self.assertLessEqual({'analysis', 'rewrite', 'revision', 'chat'}, set(TEMPLATES))
+        self.assertIs(get_prompt('chat'), TEMPLATES['chat'])
+        with self.assertRaises(KeyError):
+            get_prompt('nonexistent')
+        template = load_prompts(self.write_prompts())['greeting']
+        self.assertEqual((template.budget, template.max_new_tokens, template.trim), (200, 100, 'resume_text'))
+        self.assertEqual(template.fields, {'name', 'resume_text'})
+        self.assertEqual(template.render(name="Jane", resume_text="Python"), "Hello Jane, here is your resume:\nPython")
+        # The version follows the text and settings of the template.
+        self.assertEqual(load_prompts(self.write_prompts())['greeting'].version, template.version)
+        self.assertNotEqual(load_prompts(self.write_prompts(budget=300))['greeting'].version, template.version)
+
+    def test_invalid_templates_are_refused_at_load(self):
+        with self.assertRaisesMessage(ValueError, "trim placeholder {summary} is not in the template"):
+            load_prompts(self.write_prompts(trim='summary'))
+        with self.assertRaisesMessage(ValueError, "invalid prompt 'greeting'"):
+            load_prompts(self.write_prompts(budget='many'))
+        with override_settings(LLM_CONTEXT_TOKENS=250):
+            with self.assertRaisesMessage(ValueError, "does not fit the 250 token context"):
+                load_prompts(self.write_prompts())
+
+    def test_count_tokens_estimate(self):
+        # A token per 4 letters of a word, per digit and per symbol.
+        self.assertEqual(count_tokens("Python"), 2)
+        self.assertEqual(count_tokens("2019 - C++"), 4 + 1 + 1 + 2)
+        self.assertEqual(count_tokens(""), 0)
+
+    def test_fit_tokens_keeps_every_section(self):
+        sections = [
+            "## Summary\nShort.",
+            "## Experience\n" + "\n".join(f"- Built system {i} with Django" for i in range(200)),
+            "## Skills\n" + " ".join(["Python"] * 300),
+        ]
+        text = "\n\n".join(sections)
+        fitted = fit_tokens(text, 300)
+        self.assertLessEqual(count_tokens(fitted), 300)
+        self.assertEqual(fit_tokens(text, 300), fitted)
+        parts = fitted.split("\n\n")
+        self.assertEqual(parts[0], sections[0])
+        self.assertTrue(parts[1].startswith("## Experience\n- Built system 0 with Django"))
+        self.assertTrue(parts[2].startswith("## Skills\nPython Python"))
+        self.assertTrue(parts[1].endswith(TRUNCATION_MARKER) and parts[2].endswith(TRUNCATION_MARKER))
+        self.assertEqual(fit_tokens("Short enough.", 300), "Short enough.")
+
+    def test_render_trims_to_the_budget(self):
+        template = load_prompts(self.write_prompts(budget=120))['greeting']
+        with self.assertLogs('resume_app.llm', 'INFO'):
+            prompt = template.render(name="Jane", resume_text="Python developer. " * 200)
+        self.assertLessEqual(count_tokens(prompt), 120)
+        self.assertTrue(prompt.startswith("Hello Jane, here is your resume:\nPython developer."))
+        with self.assertRaises(PromptBudgetError):
+            template.render(name="Jane " * 100, resume_text="Python")
+
+
+CLEAR_CV = """Jane Doe
+Senior Software Engineer
+jane.doe@example.com | +1 555 123 4567 | linkedin.com/in/janedoe
+
+Summary
+Backend developer with eight years of experience.
+
+Work Experience
+Acme Corp, 2019 - Present
+- Led the migration to Django; managed a team of five.
+Globex, 2015 - 2019
+- Developed and implemented billing services.
+
+Education
+BSc Computer Science, State University, 2011 - 2015
+
+Skills
+Python, Django, PostgreSQL, Docker
+"""
+
+INVOICE = """INVOICE #2024-117
+Acme Supplies Ltd.
+Bill to: Globex Corporation
+Item            Qty   Price
+Paper, A4       10    45.00
+Subtotal              45.00
+VAT 20%                9.00
+Total due             54.00
+Payment due within 30 days of the invoice date.
+"""
+
+MANUAL = """Chapter 3: Installation
+Contents: Installation, Troubleshooting, Warranty, Appendix
+WARNING: disconnect the power before installation.
+Caution: read this manual before use.
+Troubleshooting: if the unit does not start, see Appendix B.
+Warranty: two years from the date of purchase.
+"""
+
+# A cover letter: an email and some resume vocabulary, but no sections.
+AMBIGUOUS = """Dear hiring manager,
+I am writing about the backend developer opening. I developed and led several
+projects at my university and would welcome a chance to talk.
+jane.doe@example.com
+"""
+
+
+class LocalResumeClassifierTests(SimpleTestCase):
+    def test_clear_resume_is_accepted(self):
+        results = LocalResumeClassifier().classify(CLEAR_CV)
+        self.assertTrue(results['is_resume'])
+        self.assertEqual(results['top_label'], 'resume')
+        self.assertGreaterEqual(results['confidence'], 0.95)
+        self.assertEqual(results['details']['classifier'], 'local')
+        self.assertEqual(results['details']['features']['heading_names'],
+                         ['education', 'experience', 'skills', 'summary'])
+
+    def test_invoices_and_manuals_are_rejected(self):
+        for name, text in (('invoice', INVOICE), ('manual', MANUAL)):
+            with self.subTest(name):
+                results = LocalResumeClassifier().classify(text)
+                self.assertFalse(results['is_resume'])
+                self.assertEqual(results['top_label'], 'other')
+                self.assertGreaterEqual(results['confidence'], 0.95)
+
+    def test_ambiguous_documents_escalate(self):
+        classifier = LocalResumeClassifier()
+        self.assertIsNone(classifier.classify(AMBIGUOUS))
+        classifier.classify(CLEAR_CV)
+        classifier.classify(INVOICE)
+        stats = classifier.stats()
+        self.assertEqual((stats['accepted'], stats['rejected'], stats['escalated']), (1, 1, 1))
+        self.assertAlmostEqual(stats['escalation_rate'], 1 / 3)
+
+    @override_settings(RESUME_CLASSIFIER_ACCEPT=0.95, RESUME_CLASSIFIER_REJECT=0.99)
+    def test_zero_thresholds_are_not_unset(self):
+        # Accept everything / reject nothing, whatever the settings say.
+        self.assertTrue(LocalResumeClassifier(accept_threshold=0.0).classify(AMBIGUOUS)['is_resume'])
+        self.assertIsNone(LocalResumeClassifier(reject_threshold=0.0).classify(INVOICE))
@@ -0,0 +1,328 @@
+"""
+Admission control and rate limiting for the LLM-bound endpoints.
+
+Two layers keep a burst from one client from exhausting the inference
+quota and every worker thread:
+
+- InferenceRateThrottle, a DRF throttle, gives each user (or, for anonymous
+  requests, each IP address) a token bucket: INFERENCE_BURST requests at
+  once, refilled at the rate set for its scope in DEFAULT_THROTTLE_RATES.
+  Buckets live in Django's cache, like DRF's own throttles, so a shared
+  cache backend makes them hold across worker processes.
+- `admission` caps how many inference requests this process runs at once
+  (INFERENCE_MAX_CONCURRENT). Up to INFERENCE_QUEUE_SIZE more wait for a
+  slot in arrival order, for at most INFERENCE_QUEUE_TIMEOUT seconds;
+  anything beyond that is turned away at once. Each of those requests
+  holds a worker thread. The ASGI views (async_views.py) hold none while
+  they wait on the model, so they use `async_admission`, with the same
+  settings prefixed ASYNC_ and much larger limits.
+
+Both answer 429 Too Many Requests with a Retry-After header.
+"""
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+
+from django.conf import settings
+from django.core.cache import cache as default_cache
+from rest_framework.exceptions import Throttled
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from .log import get_logger
+
+logger = get_logger('llm')
+
+_DURATIONS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class Overloaded(Throttled):
+    """Every inference slot is taken and the wait queue is full, or the wait timed out."""
+    default_detail = 'The server is busy.'
+    default_code = 'overloaded'
+
+
+class _Waiter:
+    __slots__ = ('wake', 'granted')
+
+    def __init__(self, wake):
+        self.wake = wake
+        self.granted = False
+
+
+class AdmissionController:
+    """
+    Counting semaphore with a bounded FIFO wait queue, shared by threads and
+    event loops. release() hands the slot straight to the longest waiting
+    request, so later arrivals cannot overtake it. Its limits are the
+    settings <prefix>_MAX_CONCURRENT, <prefix>_QUEUE_SIZE and
+    <prefix>_QUEUE_TIMEOUT.
+    """
+
+    def __init__(self, prefix='INFERENCE', max_concurrent=8, queue_size=16):
+        self._prefix = prefix
+        self._defaults = {'MAX_CONCURRENT': max_concurrent, 'QUEUE_SIZE': queue_size, 'QUEUE_TIMEOUT': 10}
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiters = deque()
+        self._hold = None   # moving average of how long a slot is held, in seconds
+        self.admitted = 0
+        self.waited = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+        self.max_queued = 0
+
+    def _setting(self, name):
+        return _setting(f'{self._prefix}_{name}', self._defaults[name])
+
+    @property
+    def limit(self):
+        return self._setting('MAX_CONCURRENT')
+
+    def _retry_after(self):
+        """Seconds until a slot is likely free for one more request; called with the lock held."""
+        if self._hold is None:
+            return 1
+        return max(1, math.ceil(self._hold * (len(self._waiters) + 1) / self.limit))
+
+    def _enter(self, wake):
+        """Takes a free slot (returns None) or queues a waiter woken by `wake`; raises Overloaded."""
+        with self._lock:
+            if self._active < self.limit and not self._waiters:
+                self._active += 1
+                self.admitted += 1
+                return None
+            if len(self._waiters) >= self._setting('QUEUE_SIZE'):
+                self.rejected_full += 1
+                raise Overloaded(self._retry_after())
+            waiter = _Waiter(wake)
+            self._waiters.append(waiter)
+            self.waited += 1
+            self.max_queued = max(self.max_queued, len(self._waiters))
+            return waiter
+
+    def _abandon(self, waiter):
+        """
+        Takes a waiter out of the queue. Returns True when it was granted a
+        slot meanwhile, which is then the caller's to use or release.
+        """
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._waiters.remove(waiter)
+            return False
+
+    def _timed_out(self):
+        with self._lock:
+            self.rejected_timeout += 1
+            raise Overloaded(self._retry_after())
+
+    def acquire(self):
+        """Takes a slot, waiting in the queue if need be; raises Overloaded."""
+        event = threading.Event()
+        waiter = self._enter(event.set)
+        if waiter is None or event.wait(self._setting('QUEUE_TIMEOUT')) or self._abandon(waiter):
+            return
+        self._timed_out()
+
+    async def aacquire(self):
+        """acquire() for async code: waits on the event loop rather than a thread."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def grant():
+            if not future.done():
+                future.set_result(None)
+
+        waiter = self._enter(lambda: loop.call_soon_threadsafe(grant))
+        if waiter is None:
+            return
+        try:
+            await asyncio.wait_for(future, self._setting('QUEUE_TIMEOUT'))
+            return
+        except asyncio.TimeoutError:
+            if self._abandon(waiter):
+                return
+        except asyncio.CancelledError:
+            # The client went away while queued; pass on a slot granted meanwhile.
+            if self._abandon(waiter):
+                self.release()
+            raise
+        self._timed_out()
+
+    def release(self, held=None):
+        """Frees a slot, handing it to the next waiter; `held` is how long it was used, in seconds."""
+        with self._lock:
+            if held is not None:
+                self._hold = held if self._hold is None else 0.8 * self._hold + 0.2 * held
+            if self._waiters:
+                waiter = self._waiters.popleft()
+                waiter.granted = True
+                self.admitted += 1
+            else:
+                self._active -= 1
+                waiter = None
+        if waiter is not None:
+            waiter.wake()
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+
+    @asynccontextmanager
+    async def aslot(self):
+        await self.aacquire()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+
+    def hold(self, iterable):
+        """
+        Keeps an acquired slot until a streamed response has been sent:
+        returns an iterator over `iterable` that releases the slot when it
+        is exhausted or closed.
+        """
+        return _HeldIterator(self, iterable)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'limit': self.limit,
+                'in_flight': self._active,
+                'queued': len(self._waiters),
+                'max_queued': self.max_queued,
+                'admitted': self.admitted,
+                'waited': self.waited,
+                'rejected_queue_full': self.rejected_full,
+                'rejected_timeout': self.rejected_timeout,
+                'average_hold_seconds': round(self._hold, 3) if self._hold is not None else None,
+            }
+
+
+class _HeldIterator:
+    def __init__(self, controller, iterable):
+        self._controller = controller
+        self._iterator = iter(iterable)
+        self._started = time.monotonic()
+        self._held = True
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._iterator)
+        except BaseException:
+            self._release()
+            raise
+
+    def close(self):
+        try:
+            close = getattr(self._iterator, 'close', None)
+            if close is not None:
+                close()
+        finally:
+            self._release()
+
+    def _release(self):
+        if self._held:
+            self._held = False
+            self._controller.release(time.monotonic() - self._started)
+
+
+admission = AdmissionController()
+async_admission = AdmissionController('ASYNC_INFERENCE', max_concurrent=200, queue_size=400)
+
+
+def parse_rate(rate):
+    """'20/min' -> (20, 60): requests per period in seconds; None for no limit."""
+    if rate is None:
+        return None
+    num, period = rate.split('/')
+    return int(num), _DURATIONS[period[0]]
+
+
+class TokenBuckets:
+    """Per-client token buckets for the inference scopes, and how often each scope throttled."""
+
+    cache = default_cache
+    cache_format = 'throttle_%(scope)s_%(ident)s'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.allowed = {}
+        self.throttled = {}
+
+    def take(self, scope, ident):
+        """
+        Takes a token from the bucket of `ident` in `scope`. Returns 0 when
+        the request may go ahead, else the seconds until the next token.
+        """
+        rate = parse_rate(api_settings.DEFAULT_THROTTLE_RATES.get(scope))
+        if rate is None:
+            return 0
+        num, duration = rate
+        refill = num / duration
+        burst = _setting('INFERENCE_BURST', {}).get(scope, num)
+        key = self.cache_format % {'scope': scope, 'ident': ident}
+        with self._lock:
+            now = time.time()
+            tokens, updated = self.cache.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * refill)
+            if tokens >= 1:
+                self.cache.set(key, (tokens - 1, now), math.ceil(burst / refill))
+                self.allowed[scope] = self.allowed.get(scope, 0) + 1
+                return 0
+            self.throttled[scope] = self.throttled.get(scope, 0) + 1
+        logger.info("Throttled %s request from %s", scope, ident)
+        return (1 - tokens) / refill
+
+    def stats(self):
+        with self._lock:
+            return {
+                scope: {'allowed': self.allowed.get(scope, 0), 'throttled': self.throttled.get(scope, 0)}
+                for scope in sorted(set(self.allowed) | set(self.throttled))
+            }
+
+
+rate_limits = TokenBuckets()
+
+
+class InferenceRateThrottle(BaseThrottle):
+    """
+    Token bucket per user ('inference_user' scope), or per IP address for
+    anonymous requests ('inference_anon').
+    """
+
+    def __init__(self):
+        self._wait = None
+
+    def scope_and_ident(self, request, user):
+        if user is not None and user.is_authenticated:
+            return 'inference_user', user.pk
+        return 'inference_anon', self.get_ident(request)
+
+    def check(self, request, user):
+        """Takes a token for the caller; False when its bucket is empty (see wait())."""
+        self._wait = rate_limits.take(*self.scope_and_ident(request, user))
+        return not self._wait
+
+    def allow_request(self, request, view):
+        return self.check(request, request.user)
+
+    def wait(self):
+        return self._wait
@@ -0,0 +1,143 @@
+"""
+Streaming checks for single resume uploads (UploadResumeView, ValidateResumeView
+and the async validate_resume).
+
+PDFUploadHandler replaces Django's default upload handlers for those views.
+Uploads are written straight to a temporary file in chunks, never held in
+memory, and while the bytes go by it hashes them, stops at
+UPLOAD_MAX_BYTES, looks for the %PDF- header in the first kilobyte and for
+the page tree's /Count. A file that is too large, is not a PDF or has more
+than PDF_MAX_PAGES pages is rejected at that point, before the rest is
+read. When the file is complete its trailer is checked: %%EOF at the end
+and a startxref offset pointing at a cross-reference table or stream.
+Only then is the file handed to PyPDF2.
+"""
+import hashlib
+import re
+
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .log import get_logger
+
+logger = get_logger('pdf')
+
+# The header may be preceded by junk, within the first kilobyte (PDF 1.7, 7.5.2).
+HEADER_BYTES = 1024
+# How far from the end %%EOF and startxref are looked for.
+TRAILER_BYTES = 2048
+# Room for the multipart boundaries and the other form fields.
+MULTIPART_OVERHEAD = 64 * 1024
+
+_HEADER = b'%PDF-'
+# The /Count of a /Pages node, with its keys in either order; the largest is
+# the root's. Page trees inside compressed object streams are not visible
+# here; those documents get the page cap when PyPDF2 opens them.
+_PAGE_COUNT_RE = re.compile(
+    rb"/Type\s*/Pages\b(?:(?!>>).){0,512}?/Count\s+(\d+)|/Count\s+(\d+)(?:(?!>>).){0,512}?/Type\s*/Pages\b",
+    re.DOTALL,
+)
+_STARTXREF_RE = re.compile(rb"startxref\s+(\d+)\s+%%EOF")
+_XREF_RE = re.compile(rb"\s*(?:xref|\d+\s+\d+\s+obj\b)")
+# Overlap kept between chunks so a match split across two of them is seen.
+_OVERLAP = 1100
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class UploadRejected(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_code = 'upload_rejected'
+
+    def __init__(self, message):
+        super().__init__({'error': message})
+
+
+class UploadTooLarge(UploadRejected):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_code = 'upload_too_large'
+
+
+class PDFUploadHandler(TemporaryFileUploadHandler):
+    """
+    Streams PDF uploads to a temporary file, checking them on the way (see
+    the module docstring). Raises UploadRejected (400) or UploadTooLarge
+    (413) from the request's data parsing; the finished file gets a
+    `sha256` attribute with the hex digest of its bytes.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_bytes = _setting('UPLOAD_MAX_BYTES', 10 * 1024 * 1024)
+        self.max_pages = _setting('PDF_MAX_PAGES', 50)
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        # Refuse a body that cannot fit before reading any of it.
+        if content_length and content_length > self.max_bytes + MULTIPART_OVERHEAD:
+            raise UploadTooLarge(f"File is larger than {self.max_bytes} bytes")
+
+    def new_file(self, field_name, file_name, *args, **kwargs):
+        if not file_name.lower().endswith('.pdf'):
+            raise UploadRejected("File must be a PDF")
+        super().new_file(field_name, file_name, *args, **kwargs)
+        self._hasher = hashlib.sha256()
+        self._head = b''
+        self._tail = b''
+        self._pages = 0
+
+    def _reject(self, error):
+        self.upload_interrupted()
+        logger.info("Rejected upload %s: %s", self.file_name, error.detail['error'])
+        raise error
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > self.max_bytes:
+            self._reject(UploadTooLarge(f"File is larger than {self.max_bytes} bytes"))
+        if len(self._head) < HEADER_BYTES:
+            self._head += raw_data[:HEADER_BYTES - len(self._head)]
+            if len(self._head) == HEADER_BYTES:
+                self._check_header()
+
+        window = self._tail + raw_data
+        for match in _PAGE_COUNT_RE.finditer(window):
+            self._pages = max(self._pages, int(match.group(1) or match.group(2)))
+        if self._pages > self.max_pages:
+            self._reject(UploadRejected(f"PDF has {self._pages} pages; the limit is {self.max_pages}."))
+        self._tail = window[-_OVERLAP:]
+
+        self._hasher.update(raw_data)
+        self.file.write(raw_data)
+
+    def _check_header(self):
+        if _HEADER not in self._head:
+            self._reject(UploadRejected("File is not a PDF document"))
+
+    def file_complete(self, file_size):
+        self._check_header()
+        self.file.seek(max(0, file_size - TRAILER_BYTES))
+        trailer = self.file.read()
+        offsets = _STARTXREF_RE.findall(trailer)
+        # Offsets count from the header, after any junk before it.
+        xref = int(offsets[-1]) + self._head.find(_HEADER) if offsets else file_size
+        if xref >= file_size:
+            self._reject(UploadRejected("PDF is truncated or damaged: no valid trailer"))
+        self.file.seek(xref)
+        if not _XREF_RE.match(self.file.read(64)):
+            self._reject(UploadRejected("PDF is damaged: startxref does not point at a cross-reference table"))
+
+        uploaded = super().file_complete(file_size)
+        uploaded.sha256 = self._hasher.hexdigest()
+        return uploaded
+
+
+class PDFUploadMixin:
+    """Parses the view's multipart uploads with PDFUploadHandler instead of Django's handlers."""
+
+    def initialize_request(self, request, *args, **kwargs):
+        # Before DRF (or the CSRF check of session authentication) reads the body.
+        request.upload_handlers = [PDFUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
@@ -1,12 +1,13 @@
 from django.urls import path
-from .views import ValidateResumeView, UploadResumeView, AnalyzeResumeView, ChatView, SignupView, LoginView, LogoutView, account_detail, update_profile, update_password, delete_account, ChatMessagesView, user_conversations 
-from . import views
+from .views import ValidateResumeView, UploadResumeView, AnalyzeResumeView, ChatView, SignupView, LoginView, LogoutView, account_detail, update_profile, update_password, delete_account, ChatMessagesView, user_conversations, JobSubmitView, JobStatusView
+from . import views, async_views
 
 urlpatterns = [
     path('api/validate_resume/', ValidateResumeView.as_view(), name='validate-resume'),
     path('upload_resume/', UploadResumeView.as_view(), name='upload_resume'),
     path('analyze_resume/', AnalyzeResumeView.as_view(), name='analyze_resume'),
     path('chat/', ChatView.as_view(), name='chat'),
+    path('chat/stream/', views.ChatStreamView.as_view(), name='chat_stream'),
     path('signup/', SignupView.as_view(), name='signup'),
     path('login/', LoginView.as_view(), name='login'),
     path('logout/', LogoutView.as_view(), name='logout'),
@@ -19,7 +20,23 @@ urlpatterns = [
     
     path('rewrite_resume/', views.rewrite_resume, name='rewrite_resume'),
     path('revise_resume/', views.revise_resume, name='revise_resume'),
+    path('bulk_upload/', views.BulkUploadView.as_view(), name='bulk_upload'),
+    path('rank_resumes/', views.RankResumesView.as_view(), name='rank_resumes'),
+    path('search_resumes/', views.SearchResumesView.as_view(), name='search_resumes'),
+    path('resumes/<int:resume_id>/revisions/', views.resume_revisions, name='resume_revisions'),
+    path('resumes/<int:resume_id>/revisions/<int:number>/', views.resume_revision_detail,
+         name='resume_revision_detail'),
     path('generate_pdf/', views.generate_pdf, name='generate_pdf'),
+    path('jobs/', JobSubmitView.as_view(), name='job_submit'),
+    path('jobs/<uuid:job_id>/', JobStatusView.as_view(), name='job_status'),
+    path('metrics/cache/', views.cache_metrics, name='cache_metrics'),
+
+    # Async (ASGI) versions of the LLM-bound endpoints
+    path('async/validate_resume/', async_views.validate_resume, name='async_validate_resume'),
+    path('async/analyze_resume/', async_views.analyze_resume, name='async_analyze_resume'),
+    path('async/chat/', async_views.chat, name='async_chat'),
+    path('async/rewrite_resume/', async_views.rewrite_resume, name='async_rewrite_resume'),
+    path('async/revise_resume/', async_views.revise_resume, name='async_revise_resume'),
 
 
     
@@ -1,14 +1,42 @@
-import os, io
+import os
 from rest_framework.views import APIView
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Resume, ChatMessage
-from .serializers import ResumeSerializer, ChatMessageSerializer
-import PyPDF2
-import requests
+from .models import Resume, ResumeRevision, ChatMessage, Job
+from .serializers import (
+    ResumeSerializer, ResumeRevisionSerializer, ChatMessageSerializer, JobSerializer,
+    CHAT_MESSAGE_VALUES, chat_message_data, parse_fields,
+)
+from .revisions import RevisionNotFound, load_version
+from .bulk import BulkUploadError, collect_files, process_batch
+from .ranking import rank_resumes, ranking_available, ranking_index
+from .search import highlights, search_available, search_resumes
+from .sections import resume_prompt_text, sections_for_question
+from .prompts import PromptBudgetError, get_prompt
+from .pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_page
+from .caching import analysis_cache, extraction_cache, file_digest
+from .coalescing import coalescer
+from .uploads import PDFUploadMixin
+from .throttling import InferenceRateThrottle, admission, async_admission, rate_limits
+from .log import get_logger
+from .classifier import local_classifier
+from .services import (
+    build_chat_prompt, final_chat_reply, run_analysis, run_chat, run_rewrite, run_revision,
+)
+from .inference import (
+    BART_MNLI_MODEL, MISTRAL_MODEL, InferenceCall, InferenceError, UpstreamError, get_client, run_sync,
+)
+from .jobs import JOB_HANDLERS, REQUIRED_PARAMS, submit_job
+from .pdf_render import (
+    PDFRenderError, html_to_pdf, markdown_to_html, pdf_cache, preprocess_markdown, renderer_available,
+)
+from .pdf_extraction import (
+    PDFExtractionError, extract_pages, iter_pages, join_pages, load_resume_text, read_prefix,
+)
 import json
+from functools import partial
 from django.http import JsonResponse
 from django.conf import settings
 # For authentication views:
@@ -18,37 +46,36 @@ from rest_framework.authtoken.models import Token
 from django.contrib.auth import update_session_auth_hash
 
 
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.http import parse_etags, quote_etag
 from reportlab.lib.pagesizes import letter
-import re
 
-HF_API_KEY = "PUT-YOUR-HUGGINGFACE-API-KEY"
+logger = get_logger('llm')
+auth_logger = get_logger('auth')
+pdf_logger = get_logger('pdf')
 
+class ResumeValidator:
+    # Only this many characters are sent to the zero-shot classifier.
+    max_input_chars = 1024
 
-def clean_json_string(json_str):
-    # Replace backslash-newline sequences with a newline.
-    cleaned = json_str.replace('\\\n', '\n')
-    # Remove control characters that might invalidate the JSON.
-    cleaned = re.sub(r'[\x00-\x1F\x7F]', '', cleaned)
-    return cleaned
+    def extract_text(self, pdf_file):
+        # Extract text from PDF using the shared page-level extraction engine
+        return join_pages(extract_pages(pdf_file))
 
+    def is_resume(self, text, call_context=None):
+        return run_sync(self.classify_flow(text), call_context)
+
+    def classify_flow(self, text):
+        # Obvious resumes and non-resumes are decided locally; only ambiguous
+        # documents pay for the remote zero-shot classification.
+        if getattr(settings, 'RESUME_CLASSIFIER_LOCAL', True):
+            local_result = local_classifier.classify(text)
+            if local_result is not None:
+                return local_result["is_resume"], local_result
 
-class ResumeValidator:
-    def __init__(self):
-        self.api_url = "https://api-inference.huggingface.co/models/facebook/bart-large-mnli"
-        self.headers = {"Authorization": f"Bearer {HF_API_KEY}"}
-    
-    def extract_text(self, pdf_file):
-        # Extract text from PDF using PyPDF2
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text() or ""
-        return text  # Add this return statement
-    def is_resume(self, text):
         # Prepare payload for zero-shot classification
         payload = {
-            "inputs": text[:1024],  # Limit text length to avoid token limits
+            "inputs": text[:self.max_input_chars],  # Limit text length to avoid token limits
             "parameters": {
                 "candidate_labels": [
                     "resume", "curriculum vitae", "CV", "job application",
@@ -59,9 +86,13 @@ class ResumeValidator:
         }
         
         # Call the Hugging Face API
-        response = requests.post(self.api_url, headers=self.headers, json=payload)
-        result = response.json()
-        print (result)
+        try:
+            result = yield InferenceCall(BART_MNLI_MODEL, payload, 'classify')
+        except UpstreamError as e:
+            result = e.payload or {"error": str(e)}
+        except InferenceError as e:
+            result = {"error": str(e)}
+        logger.debug("Remote resume classification: %s", result)
         
         
         # Check if resume-related labels are ranked highest
@@ -82,8 +113,49 @@ class ResumeValidator:
         
         return False, {"error": "Classification failed", "details": result}
 
+    def validate(self, file, materialize=True):
+        return run_sync(self.validate_flow(file, materialize))
 
-class ValidateResumeView(APIView):
+    def validate_flow(self, file, materialize=True):
+        """
+        Extracts and classifies an uploaded file, reusing earlier results for
+        identical bytes so the validation pass and the real upload only pay
+        for one parse and one classifier call.
+
+        Only enough pages to fill the classifier input are parsed up front.
+        With materialize=False the rest of the document is left unparsed and
+        pages is returned as None; the real upload extracts it when needed.
+        Returns (pages, is_valid, results).
+        """
+        digest = file_digest(file)
+        cached = extraction_cache.get(digest) or {'pages': None, 'classification': None}
+        pages = cached['pages']
+        results = cached['classification']
+
+        if results is None:
+            if pages is not None:
+                prefix, exhausted = pages, True
+            else:
+                page_iter = iter_pages(file)
+                prefix, exhausted = read_prefix(page_iter, self.max_input_chars)
+            is_valid, results = yield from self.classify_flow(join_pages(prefix))
+            if pages is None and (exhausted or materialize):
+                # Resume the same parse instead of starting over.
+                pages = prefix + list(page_iter)
+            # Failed classifications are not cached so the next attempt retries.
+            if "is_resume" in results:
+                extraction_cache.store(digest, pages, results)
+            elif pages is not None:
+                extraction_cache.store(digest, pages)
+            return pages, is_valid, results
+
+        if pages is None and materialize:
+            pages = extract_pages(file)
+            extraction_cache.store(digest, pages, results)
+        return pages, results['is_resume'], results
+
+
+class ValidateResumeView(PDFUploadMixin, APIView):
     permission_classes = [AllowAny]
     
     def post(self, request, format=None):
@@ -98,16 +170,17 @@ class ValidateResumeView(APIView):
         validator = ResumeValidator()
         
         try:
-            file.seek(0)
-            text = validator.extract_text(file)
-            is_valid, results = validator.is_resume(text)
-            
+            pages, is_valid, results = validator.validate(file, materialize=False)
+
             return Response({
                 'is_resume': is_valid,
                 'confidence': results.get('confidence', 0),
                 'top_label': results.get('top_label', ''),
                 'details': results
             })
+        except PDFExtractionError as e:
+            return Response({"error": "Error processing PDF", "details": str(e)},
+                            status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response(
                 {"error": "Error validating document", "details": str(e)},
@@ -120,21 +193,53 @@ class ChatMessagesView(APIView):
 
     def get(self, request, format=None):
         """
-        GET: Retrieve all chat messages for a given resume.
-        Expects a query parameter 'resume_id'.
+        GET: Retrieve chat messages for a given resume, oldest first.
+        Query parameters:
+          - resume_id (required)
+          - limit: page size (default CHAT_PAGE_SIZE, at most CHAT_PAGE_SIZE_MAX)
+          - before: cursor; return the page of messages preceding it
+          - since: cursor or ISO 8601 timestamp; return only newer messages
+        Without before/since the most recent page is returned. The response
+        headers carry the cursors for follow-up requests: X-Cursor-Before
+        (only when older messages exist), X-Cursor-Since (the newest message
+        returned) and, for since requests, X-Has-More.
         """
-        resume_id = request.query_params.get("resume_id")
+        params = request.query_params
+        resume_id = params.get("resume_id")
         if not resume_id:
             return Response({"error": "Missing resume_id in query parameters."}, status=400)
-        
+        if "before" in params and "since" in params:
+            return Response({"error": "Use either before or since, not both."}, status=400)
+
         try:
-            resume_obj = Resume.objects.get(id=resume_id)
-        except Resume.DoesNotExist:
+            limit = int(params.get("limit", getattr(settings, 'CHAT_PAGE_SIZE', 50)))
+            before = decode_cursor(params["before"]) if "before" in params else None
+            since = decode_cursor(params["since"], allow_timestamp=True) if "since" in params else None
+        except InvalidCursor as e:
+            return Response({"error": str(e)}, status=400)
+        except ValueError:
+            return Response({"error": "limit must be an integer."}, status=400)
+        if limit < 1:
+            return Response({"error": "limit must be at least 1."}, status=400)
+        limit = min(limit, getattr(settings, 'CHAT_PAGE_SIZE_MAX', 200))
+
+        # exists() rather than get(): the resume row carries the full text.
+        if not Resume.objects.filter(id=resume_id).exists():
             return Response({"error": "Resume not found."}, status=404)
-        
-        messages = ChatMessage.objects.filter(resume=resume_obj).order_by("created_at")
-        serializer = ChatMessageSerializer(messages, many=True)
-        return Response(serializer.data)
+
+        messages = ChatMessage.objects.filter(resume_id=resume_id).values(*CHAT_MESSAGE_VALUES)
+        rows, has_more = keyset_page(messages, limit, before=before, since=since)
+
+        response = Response(chat_message_data(rows))
+        if rows:
+            response["X-Cursor-Since"] = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+        elif since is not None:
+            response["X-Cursor-Since"] = params["since"]
+        if since is not None:
+            response["X-Has-More"] = "true" if has_more else "false"
+        elif has_more:
+            response["X-Cursor-Before"] = encode_cursor(rows[0]["created_at"], rows[0]["id"])
+        return response
 
     def post(self, request, format=None):
         """
@@ -149,7 +254,7 @@ class ChatMessagesView(APIView):
             return Response({"error": "Missing resume_id, message, or sender."}, status=400)
         
         try:
-            resume_obj = Resume.objects.get(id=resume_id)
+            resume_obj = Resume.objects.only('id').get(id=resume_id)
         except Resume.DoesNotExist:
             return Response({"error": "Resume not found."}, status=404)
         
@@ -180,18 +285,14 @@ class ChatMessagesView(APIView):
         
         # Retrieve the resume
         try:
-            resume_obj = Resume.objects.get(id=resume_id)
+            resume_obj = Resume.objects.only('id').get(id=resume_id)
             # If no text has been extracted yet, try to extract from PDF
-            if not resume_obj.text:
-                with open(resume_obj.file.path, 'rb') as f:
-                    pdf_reader = PyPDF2.PdfReader(f)
-                    extracted_text = ""
-                    for page in pdf_reader.pages:
-                        extracted_text += page.extract_text() or ""
-                resume_obj.text = extracted_text
-                resume_obj.save()
+            load_resume_text(resume_obj)
         except Resume.DoesNotExist:
             return Response({"error": "Resume not found."}, status=status.HTTP_404_NOT_FOUND)
+        except PDFExtractionError as e:
+            return Response({"error": "Error processing PDF", "details": str(e)},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
         # Save the chat message. If the user is authenticated, record the user.
         chat_message = ChatMessage.objects.create(
@@ -204,12 +305,13 @@ class ChatMessagesView(APIView):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
-class UploadResumeView(APIView):
+class UploadResumeView(PDFUploadMixin, APIView):
     permission_classes = [AllowAny]  # Allow any user to upload
     
     def post(self, request, format=None):
         file = request.FILES.get('file')
         validate_only = request.data.get('validate_only', False)
+        fields = parse_fields(request.query_params.get('fields'))
         
         if not file:
             return Response({"error": "No file uploaded"}, status=status.HTTP_400_BAD_REQUEST)
@@ -219,10 +321,8 @@ class UploadResumeView(APIView):
         # Validate the resume first
         validator = ResumeValidator()
         try:
-            file.seek(0)
-            text = validator.extract_text(file)
-            is_valid, results = validator.is_resume(text)
-            
+            pages, is_valid, results = validator.validate(file, materialize=not validate_only)
+
             # If validation only, return the results without saving
             if validate_only:
                 return Response({
@@ -239,32 +339,21 @@ class UploadResumeView(APIView):
                     "details": results
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            # Continue with upload if it's a valid resume
-            resume = Resume(file=file)
-            
+            # Continue with upload if it's a valid resume. The text extracted
+            # during validation is stored directly instead of parsing again.
+            resume = Resume(file=file, text=join_pages(pages), pages=pages)
+
             # If user is authenticated, associate the resume with them
             if request.user.is_authenticated:
                 resume.user = request.user
             resume.save()
-            
-            # Extract and save text
-            file.seek(0)
-            pdf_reader = PyPDF2.PdfReader(file)
-            try:
-                extracted_text = ""
-                for page in pdf_reader.pages:
-                    extracted_text += page.extract_text() or ""
-                resume.text = extracted_text
-                resume.save()
-            except Exception as e:
-                return Response(
-                    {"error": "Error processing PDF", "details": str(e)},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
-            
-            serializer = ResumeSerializer(resume)
+
+            serializer = ResumeSerializer(resume, fields=fields)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
-            
+
+        except PDFExtractionError as e:
+            return Response({"error": "Error processing PDF", "details": str(e)},
+                            status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response(
                 {"error": "Error validating document", "details": str(e)},
@@ -272,98 +361,140 @@ class UploadResumeView(APIView):
             )
     
 
+class BulkUploadView(APIView):
+    """
+    Uploads a batch of resumes: any number of `files` parts, each a PDF or a
+    zip archive of PDFs. Every document is extracted, classified and, when
+    it is a resume, stored. The response is streamed as NDJSON, one line
+    per file in completion order:
+
+        {"file": "a.pdf", "status": "created", "resume_id": 12, "is_resume": true, ...}
+        {"file": "b.pdf", "status": "rejected", "is_resume": false, ...}
+        {"file": "c.pdf", "status": "error", "error": "..."}
+
+    followed by {"summary": {"files": ..., "created": ..., "files_per_second": ...}}.
+
+    Documents the local classifier cannot decide are sent to the remote
+    model through the inference admission queue, like the other model-backed
+    endpoints; a file turned away there is reported with an error.
+    """
+    throttle_classes = [InferenceRateThrottle]
+
+    def post(self, request, format=None):
+        uploads = request.FILES.getlist('files')
+        if not uploads:
+            return Response({"error": "No files uploaded"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            files = collect_files(uploads)
+        except BulkUploadError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        classify = partial(ResumeValidator().is_resume, call_context=admission.slot)
+        results = process_batch(files, classify, user=request.user)
+        response = StreamingHttpResponse(
+            (json.dumps(result) + "\n" for result in results),
+            content_type='application/x-ndjson',
+        )
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class RankResumesView(APIView):
+    """
+    Ranks every stored resume against a job description with BM25 over
+    precomputed term vectors (ranking.py); no model is called.
+    POST {"job_description": "...", "limit": 20} returns the best matches,
+    highest score first, and how many resumes were ranked.
+    """
+
+    def post(self, request, format=None):
+        if not ranking_available():
+            return Response({'error': 'Resume ranking requires numpy, which is missing on the server.'},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        job_description = request.data.get('job_description') or ''
+        if not job_description.strip():
+            return Response({'error': 'No job_description provided'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.data.get('limit', getattr(settings, 'RANKING_TOP_K', 20)))
+        except (TypeError, ValueError):
+            return Response({'error': 'limit must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        if limit < 1:
+            return Response({'error': 'limit must be at least 1.'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = min(limit, getattr(settings, 'RANKING_TOP_K_MAX', 200))
+
+        ranked = rank_resumes(job_description, limit)
+        resumes = Resume.objects.only('id', 'file', 'uploaded_at', 'user').in_bulk([pk for pk, _ in ranked])
+        results = [
+            {**ResumeSerializer(resumes[pk], fields=['id', 'file', 'uploaded_at', 'user']).data,
+             'score': round(score, 4)}
+            # Resumes deleted since the index last synced are skipped.
+            for pk, score in ranked if pk in resumes
+        ]
+        return Response({'results': results, 'ranked': len(ranking_index)})
+
+
+class SearchResumesView(APIView):
+    """
+    Full-text search over resume text (search.py), e.g.
+    GET ?q=python "machine learning" -intern&limit=20&offset=0
+    Every word must match; `or` between two words accepts either, -word
+    excludes and "quoted words" form a phrase. Returns the number of
+    matching resumes and one page of them, best first, each with highlighted
+    snippets of its text.
+    """
+
+    def get(self, request, format=None):
+        params = request.query_params
+        query = params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'Missing q in query parameters.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(params.get('limit', getattr(settings, 'SEARCH_PAGE_SIZE', 20)))
+            offset = int(params.get('offset', 0))
+        except ValueError:
+            return Response({'error': 'limit and offset must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+        if limit < 1 or offset < 0:
+            return Response({'error': 'limit must be at least 1 and offset not negative.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        limit = min(limit, getattr(settings, 'SEARCH_PAGE_SIZE_MAX', 100))
+        if not search_available():
+            return Response({'error': 'Resume search requires PostgreSQL or numpy, neither is available.'},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        count, hits = search_resumes(query, limit, offset)
+        ids = [pk for pk, _ in hits]
+        resumes = Resume.objects.only('id', 'file', 'uploaded_at', 'user').in_bulk(ids)
+        snippets = highlights(ids, query)
+        results = [
+            {**ResumeSerializer(resumes[pk], fields=['id', 'file', 'uploaded_at', 'user']).data,
+             'score': round(score, 4), 'highlights': snippets.get(pk, [])}
+            for pk, score in hits if pk in resumes
+        ]
+        return Response({'count': count, 'results': results})
+
+
 class AnalyzeResumeView(APIView):
     permission_classes = [AllowAny]
+    throttle_classes = [InferenceRateThrottle]
     def post(self, request, format=None):
         resume_id = request.data.get("resume_id")
         if not resume_id:
             return Response({"error": "No resume_id provided"}, status=status.HTTP_400_BAD_REQUEST)
-        
-        try:
-            resume = Resume.objects.get(id=resume_id)
-        except Resume.DoesNotExist:
-            return Response({"error": "Resume not found"}, status=status.HTTP_404_NOT_FOUND)
-        
-        if not resume.text:
-            return Response({"error": "Resume text not found"}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Create a prompt for the Hugging Face model
-        prompt = f"""
-        Analyze the following resume and return ONLY valid JSON (with no additional text or formatting) that exactly follows the structure below. Evaluate the resume and assign percentage scores (0–100) for each area 
-        scores (skills, experience, education, overall) as percentages, and. Also, provide exactly 10 key insights and exactly 10 actionable improvement suggestions referring to ATS. The key insights and improvement suggestions must cover the following areas:
-        The expected JSON structure is:
-        -  scores (skills, experience, education, overall),  key_insights (insight 1, insight 2, ... (exactly 10 insights) improvement_suggestions( suggestion 1,  suggestion 2,  ... (exactly 10 suggestions) )  ))
-        - Formatting & Readability
-        - Grammar & Language
-        - Contact & Personal Information
-        - Professional Summary or Objective
-        - Skills & Competencies
-        - Experience & Accomplishments
-        - Education & Certifications
-        - Keywords & ATS Optimization
-        - Achievements & Awards
-        - Projects & Publications (if applicable)
-        - Overall Relevance & Customization
-        - Consistency & Accuracy
-        - Professional Tone & Branding
-        - Red Flags & Gaps
-        - Contact/Call-to-Action
-        - Overall impression
-        - Recommended jobs to consider based on this CV
-        -   
-            Resume: {resume.text} 
-              """
-        
-        headers = {
-            "Authorization": f"Bearer {HF_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        payload = {"inputs": prompt, "parameters": {"max_tokens": 10000}}
 
-        try:
-            hf_response = requests.post(
-                "https://api-inference.huggingface.co/models/mistralai/Mistral-7B-Instruct-v0.2",
-                headers=headers,
-                json=payload
-            )
-            result = hf_response.json()
-            print("Hugging Face API response:", result)  # Check what the API returns
-
-            if "error" in result:
-                return Response(
-                    {"error": "Error analyzing resume", "details": result["error"]},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
-
-            if not isinstance(result, list) or len(result) == 0:
-                return Response(
-                    {"error": "Unexpected API response format", "details": result},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
-
-            analysis = result[0].get("generated_text")
-            json_start = analysis.find('{')
-            json_end = analysis.rfind('}')
-            if json_start != -1 and json_end != -1 and json_end > json_start:
-                json_str = analysis[json_start:json_end+1]
-            else:
-                json_str = analysis
+        fields = parse_fields(request.query_params.get("fields"))
+        data, status_code = run_analysis(resume_id, fields, call_context=admission.slot)
+        return Response(data, status=status_code)
 
-            resume.analysis = json_str
-            resume.save()
 
-            serializer = ResumeSerializer(resume)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        except Exception as e:
-            return Response(
-                {"error": "Error analyzing resume", "details": str(e)},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
-        
+
+def sse_event(event, data):
+    """Formats one Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 
 class ChatView(APIView):
     permission_classes = [AllowAny]  # Allow any user to chat
+    throttle_classes = [InferenceRateThrottle]
     def post(self, request, format=None):
         resume_id = request.data.get("resume_id")
         message = request.data.get("message")
@@ -371,81 +502,76 @@ class ChatView(APIView):
         
         if not resume_id or not message:
             return Response({"error": "Missing resume_id or message"}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Retrieve the resume object from the database
+
+        user = request.user if request.user.is_authenticated else None
+        with admission.slot():
+            data, status_code = run_chat(resume_id, message, user)
+        return Response(data, status=status_code)
+
+
+class ChatStreamView(APIView):
+    """
+    Streaming variant of ChatView. Tokens are forwarded to the client as
+    Server-Sent Events as the upstream generates them:
+
+        event: token   data: {"text": "..."}       (one per token)
+        event: done    data: {"reply": "..."}      (final, cleaned reply)
+        event: error   data: {"error": "...", "details": "..."}
+
+    The final AI ChatMessage is persisted once the stream completes. The
+    inference slot is held until the stream ends.
+    """
+    permission_classes = [AllowAny]
+    throttle_classes = [InferenceRateThrottle]
+
+    def post(self, request, format=None):
+        resume_id = request.data.get("resume_id")
+        message = request.data.get("message")
+
+        if not resume_id or not message:
+            return Response({"error": "Missing resume_id or message"}, status=status.HTTP_400_BAD_REQUEST)
+
         try:
-            resume_obj = Resume.objects.get(id=resume_id)
-            if resume_obj.text:
-                resume_text = resume_obj.text
-                print("DEBUG: Using stored resume text.")
-            else:
-                from PyPDF2 import PdfReader
-                with open(resume_obj.file.path, 'rb') as f:
-                    pdf_reader = PdfReader(f)
-                    extracted_text = ""
-                    for page in pdf_reader.pages:
-                        extracted_text += page.extract_text() or ""
-                resume_text = extracted_text
-                resume_obj.text = extracted_text
-                resume_obj.save()
-                print("DEBUG: Extracted resume text from PDF.")
+            resume_obj = Resume.objects.only('id').get(id=resume_id)
+            resume_text = resume_prompt_text(resume_obj, sections_for_question(message))
         except Resume.DoesNotExist:
             return Response({"error": "Resume not found"}, status=status.HTTP_404_NOT_FOUND)
-        
-        # Debug: Print the resume text for verification
-        print("DEBUG: Resume text content:")
-        print(resume_text)
-        
-        # Construct the prompt for the AI
-        chat_prompt = (
-            "You are an expert ATS resume advisor. Your answer must reference specific details from the CV provided below. "
-            "Do not provide generic advice. Instead, analyze the CV content (including skills, education, experience, achievements, etc.) "
-            "and tailor your answer based on that information. If the CV lacks sufficient details, mention it explicitly. Do not exceed 100 words.\n\n"
-            "CV Content:\n" + resume_text + "\n\n" +
-            "Based on the CV above, please answer the following question, referencing specific details from the CV:\n" +
-            "User: " + message + "\n" +
-            "AI:"
-        )
-        
+        except PDFExtractionError as e:
+            return Response({"error": "Error processing PDF", "details": str(e)},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        try:
+            prompt = build_chat_prompt(resume_text, message)
+        except PromptBudgetError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
         payload = {
-            "inputs": chat_prompt,
-            "parameters": {"max_tokens": 500}
-        }
-        headers = {
-            "Authorization": f"Bearer {HF_API_KEY}",
-            "Content-Type": "application/json"
+            "inputs": prompt,
+            "parameters": {"max_new_tokens": get_prompt('chat').max_new_tokens, "return_full_text": False}
         }
-        
-        try:
-            ai_response = requests.post(
-                "https://api-inference.huggingface.co/models/mistralai/Mistral-7B-Instruct-v0.2",
-                headers=headers,
-                json=payload
-            )
-            print("DEBUG: Hugging Face API raw response:", ai_response.text)
-            ai_result = ai_response.json()
-            if isinstance(ai_result, list) and len(ai_result) > 0:
-                reply = ai_result[0].get("generated_text", "Sorry, no response from AI.")
-            else:
-                reply = "Sorry, no response from AI."
-            
-            # Split the reply on "AI:" and return only the final segment
-            parts = reply.split("AI:")
-            final_reply = parts[-1].strip() if parts else reply
-            
-            # If the user is authenticated, save the AI response in the database
-            if request.user.is_authenticated:
-                ChatMessage.objects.create(
-                    resume=resume_obj,
-                    user=request.user,
-                    sender='ai',
-                    message=final_reply
-                )
-            
-            return Response({"reply": final_reply}, status=status.HTTP_200_OK)
-        except Exception as e:
-            return Response({"error": "Chat processing failed", "details": str(e)},
-                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        user = request.user if request.user.is_authenticated else None
+
+        def events():
+            tokens = []
+            try:
+                for token in get_client().stream(MISTRAL_MODEL, payload, endpoint='chat'):
+                    tokens.append(token)
+                    yield sse_event('token', {'text': token})
+            except InferenceError as e:
+                yield sse_event('error', {'error': 'Chat processing failed', 'details': str(e)})
+                return
+
+            final_reply = final_chat_reply("".join(tokens)) or "Sorry, no response from AI."
+            if user is not None:
+                ChatMessage.objects.create(resume=resume_obj, user=user, sender='ai', message=final_reply)
+            yield sse_event('done', {'reply': final_reply})
+
+        admission.acquire()
+        response = StreamingHttpResponse(admission.hold(events()), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Stop nginx from buffering the stream.
+        response['X-Accel-Buffering'] = 'no'
+        return response
 
 
 
@@ -454,8 +580,8 @@ class SignupView(APIView):
     permission_classes = [AllowAny]
     
     def post(self, request, format=None):
-        print("Signup attempt with data:", request.data)
         username = request.data.get("username")
+        auth_logger.info("Signup attempt for username %r", username)
         email = request.data.get("email")
         password = request.data.get("password")
         if not username or not email or not password:
@@ -478,7 +604,7 @@ class SignupView(APIView):
                 "user": {"username": user.username, "email": user.email}
             }, status=status.HTTP_201_CREATED)
         except Exception as e:
-            print("Signup error:", str(e))
+            auth_logger.exception("Signup error for username %r", username)
             return Response(
                 {"error": "Signup failed", "details": str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -488,8 +614,8 @@ class LoginView(APIView):
     permission_classes = [AllowAny]
     
     def post(self, request, format=None):
-        print("Login attempt with data:", request.data)
         username = request.data.get("username")
+        auth_logger.info("Login attempt for username %r", username)
         password = request.data.get("password")
         if not username or not password:
             return Response(
@@ -533,8 +659,7 @@ class LogoutView(APIView):
 @permission_classes([IsAuthenticated])
 def account_detail(request):
     
-    print("DEBUG: Request user:", request.user)
-    print("DEBUG: Is authenticated?", request.user.is_authenticated)
+    auth_logger.debug("Account detail for user %s", request.user)
     user = request.user
     data = {
         "name": user.username,
@@ -609,7 +734,7 @@ def user_conversations(request):
     Each conversation is represented by a resume.
     """
     # Retrieve resumes uploaded by the user.
-    resumes = Resume.objects.filter(user=request.user).order_by('-uploaded_at')
+    resumes = Resume.objects.filter(user=request.user).only('id').order_by('-uploaded_at')
     conversations = [
         {
             "resume_id": resume.id,
@@ -633,6 +758,7 @@ def delete_account(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([InferenceRateThrottle])
 def rewrite_resume(request):
     """
     Endpoint to rewrite a resume using AI, requesting and parsing JSON output,
@@ -642,306 +768,8 @@ def rewrite_resume(request):
     if not resume_id:
         return Response({'error': 'Resume ID not provided'}, status=status.HTTP_400_BAD_REQUEST)
 
-    try:
-        # --- Get the original resume content ---
-        resume = Resume.objects.get(id=resume_id)
-
-        # Check if text is available, if not extract it
-        if not resume.text:
-            try:
-                # Ensure the file path is correct and accessible
-                if not resume.file or not hasattr(resume.file, 'path') or not os.path.exists(resume.file.path):
-                     raise FileNotFoundError(f"Resume file path not found or invalid: {getattr(resume.file, 'path', 'N/A')}")
-
-                with open(resume.file.path, 'rb') as f:
-                    pdf_reader = PyPDF2.PdfReader(f)
-                    extracted_text = ""
-                    if not pdf_reader.pages:
-                         # Handle case where PDF has no pages or is encrypted badly
-                         print(f"Warning: PDF for resume {resume_id} has no pages or could not be read.")
-                         raise ValueError("PDF contains no pages or is unreadable.")
-                    for page in pdf_reader.pages:
-                        page_text = page.extract_text()
-                        if page_text:
-                             extracted_text += page_text + "\n" # Add newline between pages
-
-                if not extracted_text.strip():
-                    # Handle case where text extraction yields nothing
-                    print(f"Warning: Could not extract text from PDF for resume {resume_id}.")
-                    raise ValueError("Could not extract text from PDF.")
-
-                resume.text = extracted_text
-                resume.save(update_fields=['text']) # Save only the text field
-                print(f"DEBUG: Extracted text from PDF for resume {resume_id}")
-            except (FileNotFoundError, ValueError, PyPDF2.errors.PdfReadError, Exception) as extraction_error:
-                 print(f"Error extracting text from PDF for resume {resume_id}: {extraction_error}")
-                 # Provide a more specific error message if possible
-                 error_detail = str(extraction_error)
-                 if isinstance(extraction_error, PyPDF2.errors.PdfReadError):
-                     error_detail = "Could not read the PDF file, it might be corrupted or encrypted."
-
-                 return Response(
-                     {'error': 'Failed to process the original resume PDF.', 'details': error_detail},
-                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                 )
-
-        original_content = resume.text
-        if not original_content or not original_content.strip():
-             # This case should be less likely after the extraction improvements, but keep as safety
-             print(f"ERROR: Original resume content is empty for resume {resume_id} even after extraction attempt.")
-             return Response({'error': 'Original resume content is empty.'}, status=status.HTTP_400_BAD_REQUEST)
-
-        # --- Create prompt for Hugging Face API (Requesting JSON) ---
-        # (Keep the same detailed JSON prompt as provided in the previous answer)
-        prompt = f"""
-You are an expert ATS resume writer and formatter. Your task is to rewrite the provided raw resume text to be highly impactful, professional, ATS-optimized, and structured precisely in Markdown format.
-
-**Core Instructions:**
-1.  **Maintain Information:** Preserve ALL original information (names, dates, companies, skills, descriptions, locations, contact details etc.). Do not invent or omit details present in the original.
-2.  **Enhance Wording:** Improve clarity, use strong action verbs, quantify achievements, and ensure professional language.
-3.  **ATS Optimization:** Naturally integrate relevant keywords.
-4.  **Markdown Structure:** Format the rewritten resume using the standard Markdown structure provided below (Headers, bullets, bolding). Use '*' for ALL bullet points.
-5.  **Output Format:** Respond ONLY with a valid JSON object containing a single key "rewritten_markdown". The value associated with this key MUST be a string containing the complete, rewritten resume in Markdown format, starting directly with the '# Full Name' heading.
-6.  **Strictness:** Do NOT include any introductory text, explanations, apologies, code block markers (like ```json), or any text whatsoever before or after the single JSON object in your response.
-
-**Markdown Structure Template (for the value of "rewritten_markdown"):**
-
-# [Full Name Extracted from Original]
-[City, State (if available)] | [Phone Number (if available)] | [Email Address] | [LinkedIn Profile URL (if available, otherwise omit)]
-
-## Summary
-[Rewritten summary text...]
-
-## Skills
-*   **Programming Languages:** [Comma-separated list]
-*   **Frameworks & Libraries:** [Comma-separated list]
-*   [...]
-
-## Experience
-### [Job Title]
-**[Company Name]** | [City, State] | [Start Month, Year] – [End Month, Year or Present]
-*   [Rewritten responsibility/achievement 1...]
-*   [Rewritten responsibility/achievement 2...]
-
-### [Previous Job Title]
-**[Previous Company Name]** | [...]
-*   [...]
-
-## Education
-### [Degree Name]
-**[Institution Name]** | [...]
-*   [Optional bullet...]
-
-## Projects (Include ONLY if distinct)
-### [Project Name 1]
-*   [Description...]
-
-## Certifications (Include ONLY if mentioned)
-*   [Certification Name...]
-
----
-
-**Original Resume Text (Raw):**
-
-
-{original_content}
-
-
-
-**Your Response (JSON Object Only):**
-"""
-
-        headers = {
-            "Authorization": f"Bearer {HF_API_KEY}",
-            "Content-Type": "application/json"
-        }
-
-        payload = {
-            "inputs": prompt,
-            "parameters": {
-                 "max_new_tokens": 2500,
-                 "return_full_text": False,
-                 "temperature": 0.7,
-                 "do_sample": True,
-                 # Consider adding repetition penalty if needed: "repetition_penalty": 1.1
-                 }
-        }
-
-        rewritten_content = None # Initialize variable
-
-        try:
-            # --- Try sending request to Hugging Face API ---
-            print(f"DEBUG: Sending request to Hugging Face API for resume {resume_id}")
-            response = requests.post(
-                "https://api-inference.huggingface.co/models/mistralai/Mistral-7B-Instruct-v0.2", # Or your chosen model
-                headers=headers,
-                json=payload,
-                timeout=45
-            )
-            response.raise_for_status() # Raise HTTPError for bad responses (4xx or 5xx)
-
-            result = response.json()
-            raw_generated_text = "" # Initialize
-
-            # Handle potential variations in successful response structure
-            if isinstance(result, list) and len(result) > 0 and "generated_text" in result[0]:
-                 raw_generated_text = result[0].get("generated_text", "")
-            elif isinstance(result, dict) and "generated_text" in result:
-                 raw_generated_text = result.get("generated_text", "")
-            else:
-                 print(f"Unexpected API response format: {result}")
-                 raise Exception("Unexpected response format from AI service")
-
-            print(f"DEBUG: Raw AI Response Text for resume {resume_id}:\n---\n{raw_generated_text}\n---")
-
-            # --- Attempt to parse JSON output ---
-            try:
-                json_start = raw_generated_text.find('{')
-                json_end = raw_generated_text.rfind('}')
-                if json_start != -1 and json_end != -1 and json_end > json_start:
-                    json_str = raw_generated_text[json_start: json_end + 1]
-                    print(f"DEBUG: Extracted Raw JSON String:\n---\n{json_str}\n---")
-
-                    # --- Use the cleaning function ---
-                    cleaned_json_str = clean_json_string(json_str)
-                    print(f"DEBUG: Cleaned JSON String for Parsing:\n---\n{cleaned_json_str}\n---")
-
-                    try:
-                        parsed_json = json.loads(cleaned_json_str)
-                        if "rewritten_markdown" in parsed_json and isinstance(parsed_json["rewritten_markdown"], str):
-                            rewritten_content = parsed_json["rewritten_markdown"].strip()
-                            # Further clean common AI artifacts if necessary
-                            rewritten_content = rewritten_content.replace("```json\n", "").replace("\n```", "")
-                            print("DEBUG: Successfully parsed CLEANED JSON and extracted rewritten_markdown.")
-                        else:
-                            print("DEBUG: Cleaned JSON parsed, but 'rewritten_markdown' key missing or not a string.")
-                            raise ValueError("Invalid JSON structure received from AI (after cleaning).")
-                    except json.JSONDecodeError as e:
-                        print(f"DEBUG: JSON decoding error after cleaning: {e}")
-                        # Optionally, you can add another cleaning attempt here
-                else:
-                    print("DEBUG: JSON markers ({...}) not found in the response.")
-                    raise ValueError("Could not find JSON object markers in AI response.")
-
-
-            except (json.JSONDecodeError, ValueError) as parse_error:
-                print(f"Warning: Failed to parse JSON from AI response ({parse_error}). Attempting fallback.")
-                # --- Fallback: Try Marker-Based Extraction ---
-                # Use a marker expected *after* the main instructions
-                marker = "**Your Response (JSON Object Only):**"
-
-                if marker in raw_generated_text:
-                    # Get content *after* the final instruction marker
-                    parts = raw_generated_text.rsplit(marker, 1)
-                    if len(parts) > 1:
-                         potential_content = parts[1].strip()
-                         # Basic check if it looks like markdown start
-                         if potential_content.startswith("#"):
-                              rewritten_content = potential_content
-                              # Clean potential stray ``` markers from fallback too
-                              rewritten_content = rewritten_content.replace("```json\n", "").replace("\n```", "").replace("```", "")
-                              print("DEBUG: Fallback marker extraction successful.")
-                         else:
-                              print(f"DEBUG: Fallback marker found, but content doesn't look like expected markdown. Starts with: {potential_content[:50]}...")
-                    else:
-                         print("DEBUG: Fallback marker found, but split failed.")
-                else:
-                     print("DEBUG: Fallback marker also not found.")
-                # If fallback also failed, rewritten_content will still be None here
-
-
-        except requests.exceptions.RequestException as api_error:
-            print(f"Error calling Hugging Face API: {api_error}")
-            # Log more details if possible (e.g., response content for 4xx/5xx errors)
-            if hasattr(api_error, 'response') and api_error.response is not None:
-                print(f"API Error Response Status: {api_error.response.status_code}")
-                print(f"API Error Response Body: {api_error.response.text[:500]}...") # Log first 500 chars
-            # Keep rewritten_content as None to trigger mock data below
-
-        except Exception as e:
-             # Catch other unexpected errors during API call/processing
-             print(f"Unexpected error during AI processing: {e}")
-             import traceback
-             traceback.print_exc() # Log full traceback for server logs
-             # Keep rewritten_content as None
-
-
-        # --- Final Check and Mock Data Fallback ---
-        if rewritten_content is None or not rewritten_content.strip(): # Check if it's None or empty/whitespace
-            print("ERROR: Failed to get valid content from AI after JSON and fallback attempts. Using mock data.")
-            # Your existing mock data fallback
-            rewritten_content = f"""
-# JOHN DOE
-New York, NY | (555) 123-4567 | johndoe@email.com | linkedin.com/in/johndoe
-
-## Summary
-Results-driven software engineer with 5+ years of experience building scalable web applications. Expertise in React, Node.js, and cloud architecture. Strong problem-solving skills with a focus on delivering high-quality code and excellent user experiences.
-
-## Skills
-*   **Programming Languages:** JavaScript, Python, TypeScript, SQL
-*   **Frameworks & Libraries:** React, Node.js, Express, Django, Redux, TailwindCSS
-*   **Tools & Platforms:** Git, Docker, AWS, CI/CD, Jira, Agile methodologies
-
-## Experience
-### SENIOR SOFTWARE ENGINEER
-**ABC Tech** | New York, NY | January 2020 – Present
-*   Led development of new customer portal that improved user engagement by 35%.
-*   Architected microservice infrastructure that reduced deployment time by 40%.
-*   Mentored 5 junior developers, conducting code reviews and technical training.
-
-### SOFTWARE ENGINEER
-**XYZ Solutions** | Boston, MA | June 2017 – December 2019
-*   Developed RESTful APIs for integration with partner platforms, increasing revenue by 20%.
-*   Optimized database queries, reducing page load times by 60%.
-*   Implemented automated testing suite that increased code coverage from 65% to 92%.
-
-## Education
-### MASTER OF SCIENCE IN COMPUTER SCIENCE
-**Massachusetts Institute of Technology** | Cambridge, MA | 2017
-
-### BACHELOR OF SCIENCE IN COMPUTER ENGINEERING
-**University of California, Berkeley** | Berkeley, CA | 2015
-
-[Note: This is mock data as the AI service response could not be processed reliably.]
-"""
-            message = "Resume rewrite failed to process AI response, using placeholder data."
-        else:
-            message = "Resume rewrite processed successfully using AI response."
-
-
-        # --- Store the rewritten content in the database ---
-        try:
-            resume.rewritten_content = rewritten_content
-            resume.save(update_fields=['rewritten_content'])
-            print(f"DEBUG: Saved rewritten content (length: {len(rewritten_content)}) for resume {resume_id}")
-        except Exception as db_error:
-             print(f"ERROR: Failed to save rewritten content to database for resume {resume_id}: {db_error}")
-             # Decide how to handle this - return error? Return content without saving?
-             return Response(
-                {'error': 'Failed to save the rewritten resume content.', 'details': str(db_error)},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-             )
-
-
-        return Response({
-            'rewritten_content': rewritten_content,
-            'message': message # Updated message reflects outcome
-        }, status=status.HTTP_200_OK)
-
-    except Resume.DoesNotExist:
-        return Response(
-            {'error': 'Resume not found'},
-            status=status.HTTP_404_NOT_FOUND
-        )
-    except Exception as e:
-        # Catch-all for unexpected errors (e.g., database connection issues)
-        print(f"Fatal error in rewrite_resume view for resume {resume_id}: {e}")
-        import traceback
-        traceback.print_exc() # Print full traceback for server logs
-        return Response(
-            {'error': 'An unexpected server error occurred.', 'details': str(e)},
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
+    data, status_code = run_rewrite(resume_id, call_context=admission.slot)
+    return Response(data, status=status_code)
 
 
 
@@ -950,263 +778,116 @@ Results-driven software engineer with 5+ years of experience building scalable w
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([InferenceRateThrottle])
 def revise_resume(request):
     """
     Endpoint to revise a rewritten resume based on user feedback,
     with improved JSON handling and error recovery identical to rewrite_resume.
+    The latest stored version is revised unless `version` names another one;
+    `current_version` (the full text) is still accepted from older clients.
     """
     resume_id = request.data.get('resume_id')
     feedback = request.data.get('feedback')
-    current_version = request.data.get('current_version')
     
     if not resume_id:
         return Response({'error': 'Resume ID not provided'}, status=status.HTTP_400_BAD_REQUEST)
     
     if not feedback:
         return Response({'error': 'Feedback not provided'}, status=status.HTTP_400_BAD_REQUEST)
-    
-    if not current_version:
-        return Response({'error': 'Current resume version not provided'}, status=status.HTTP_400_BAD_REQUEST)
-
-    try:
-        # Get the resume
-        resume = Resume.objects.get(id=resume_id)
-        
-        # Create prompt for Hugging Face API (Requesting JSON)
-        prompt = f"""
-You are an expert ATS resume writer and formatter. Your task is to revise the provided resume based on the user's feedback, while maintaining professional ATS formatting and style.
 
-**Core Instructions:**
-1.  **Make Requested Changes:** Apply the user's feedback carefully, preserving the overall professional quality.
-2.  **Maintain Information:** Preserve ALL original information that the user doesn't ask to change.
-3.  **Enhance Wording:** Improve clarity, use strong action verbs, quantify achievements, and ensure professional language.
-4.  **ATS Optimization:** Naturally integrate relevant keywords.
-5.  **Markdown Structure:** Format the revised resume using the standard Markdown structure provided below.
-6.  **Output Format:** Respond ONLY with a valid JSON object containing a single key "revised_markdown". The value associated with this key MUST be a string containing the complete, revised resume in Markdown format, starting directly with the '# Full Name' heading.
-7.  **Strictness:** Do NOT include any introductory text, explanations, apologies, code block markers (like ```json), or any text whatsoever before or after the single JSON object in your response.
+    data, status_code = run_revision(
+        resume_id, feedback, request.data.get('current_version'), request.data.get('version'),
+        call_context=admission.slot,
+    )
+    return Response(data, status=status_code)
 
-**Markdown Structure Template (for the value of "revised_markdown"):**
 
-# [Full Name]
-[City, State (if available)] | [Phone Number (if available)] | [Email Address] | [LinkedIn Profile URL (if available, otherwise omit)]
-
-## Summary
-[Revised summary text...]
-
-## Skills
-*   **Programming Languages:** [Comma-separated list]
-*   **Frameworks & Libraries:** [Comma-separated list]
-*   [...]
-
-## Experience
-### [Job Title]
-**[Company Name]** | [City, State] | [Start Month, Year] – [End Month, Year or Present]
-*   [Revised responsibility/achievement 1...]
-*   [Revised responsibility/achievement 2...]
-
-### [Previous Job Title]
-**[Previous Company Name]** | [...]
-*   [...]
-
-## Education
-### [Degree Name]
-**[Institution Name]** | [...]
-*   [Optional bullet...]
-
-## Projects (Include ONLY if distinct)
-### [Project Name 1]
-*   [Description...]
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def resume_revisions(request, resume_id):
+    """Lists the stored versions of a resume's rewrite, newest first, without their text."""
+    if not Resume.objects.filter(id=resume_id).exists():
+        return Response({'error': 'Resume not found'}, status=status.HTTP_404_NOT_FOUND)
+    revisions = (
+        ResumeRevision.objects.filter(resume_id=resume_id).select_related('parent')
+        .defer('data', 'parent__data').order_by('-number')
+    )
+    return Response(ResumeRevisionSerializer(revisions, many=True).data)
 
-## Certifications (Include ONLY if mentioned)
-*   [Certification Name...]
 
----
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def resume_revision_detail(request, resume_id, number):
+    """Returns the full text of one version of a resume's rewrite."""
+    try:
+        content = load_version(resume_id, number)
+    except RevisionNotFound as e:
+        return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
+    return Response({'resume_id': resume_id, 'version': number, 'content': content})
 
-**Current Resume:**
-{current_version}
 
-**User Feedback:**
-{feedback}
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def cache_metrics(request):
+    """
+    Returns hit/miss counters for this worker process's caches, how often
+    the local resume classifier had to escalate to the remote model, the
+    size of the ranking index, how many LLM requests were coalesced, and
+    the inference admission queue and rate limit rejections.
+    """
+    return Response({
+        'extraction_cache': extraction_cache.stats(),
+        'analysis_cache': analysis_cache.stats(),
+        'resume_classifier': local_classifier.stats(),
+        'pdf_cache': pdf_cache.stats(),
+        'ranking_index': ranking_index.stats(),
+        'coalescing': coalescer.stats(),
+        'admission': admission.stats(),
+        'async_admission': async_admission.stats(),
+        'rate_limits': rate_limits.stats(),
+    })
+
+
+class JobSubmitView(APIView):
+    """
+    Queues an analyze / rewrite / revise request and returns immediately with
+    a job id. Poll JobStatusView for the result. Submissions count against
+    the caller's inference rate limit; the job workers bound concurrency.
+    """
+    permission_classes = [AllowAny]
+    throttle_classes = [InferenceRateThrottle]
 
-**Your Response (JSON Object Only):**
-"""
-        
-        headers = {
-            "Authorization": f"Bearer {HF_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "inputs": prompt,
-            "parameters": {
-                 "max_new_tokens": 2500,
-                 "return_full_text": False,
-                 "temperature": 0.7,
-                 "do_sample": True,
-                 # Consider adding repetition penalty if needed: "repetition_penalty": 1.1
-            }
-        }
-        
-        revised_content = None  # Initialize variable
-        
-        try:
-            # --- Try sending request to Hugging Face API ---
-            print(f"DEBUG: Sending request to Hugging Face API for resume revision {resume_id}")
-            response = requests.post(
-                "https://api-inference.huggingface.co/models/mistralai/Mistral-7B-Instruct-v0.2",
-                headers=headers,
-                json=payload,
-                timeout=45
-            )
-            response.raise_for_status()  # Raise HTTPError for bad responses (4xx or 5xx)
-            
-            result = response.json()
-            raw_generated_text = ""  # Initialize
-            
-            # Handle potential variations in successful response structure
-            if isinstance(result, list) and len(result) > 0 and "generated_text" in result[0]:
-                raw_generated_text = result[0].get("generated_text", "")
-            elif isinstance(result, dict) and "generated_text" in result:
-                raw_generated_text = result.get("generated_text", "")
-            else:
-                print(f"Unexpected API response format: {result}")
-                raise Exception("Unexpected response format from AI service")
-            
-            print(f"DEBUG: Raw AI Response Text for resume revision {resume_id}:\n---\n{raw_generated_text}\n---")
-            
-            # --- Attempt to parse JSON output ---
-            try:
-                json_start = raw_generated_text.find('{')
-                json_end = raw_generated_text.rfind('}')
-                if json_start != -1 and json_end != -1 and json_end > json_start:
-                    json_str = raw_generated_text[json_start: json_end + 1]
-                    print(f"DEBUG: Extracted Raw JSON String:\n---\n{json_str}\n---")
-                    
-                    # --- Use the cleaning function ---
-                    cleaned_json_str = clean_json_string(json_str)
-                    print(f"DEBUG: Cleaned JSON String for Parsing:\n---\n{cleaned_json_str}\n---")
-                    
-                    try:
-                        parsed_json = json.loads(cleaned_json_str)
-                        if "revised_markdown" in parsed_json and isinstance(parsed_json["revised_markdown"], str):
-                            revised_content = parsed_json["revised_markdown"].strip()
-                            # Further clean common AI artifacts if necessary
-                            revised_content = revised_content.replace("```json\n", "").replace("\n```", "")
-                            print("DEBUG: Successfully parsed CLEANED JSON and extracted revised_markdown.")
-                        else:
-                            print("DEBUG: Cleaned JSON parsed, but 'revised_markdown' key missing or not a string.")
-                            raise ValueError("Invalid JSON structure received from AI (after cleaning).")
-                    except json.JSONDecodeError as e:
-                        print(f"DEBUG: JSON decoding error after cleaning: {e}")
-                        # Optionally, you can add another cleaning attempt here
-                else:
-                    print("DEBUG: JSON markers ({...}) not found in the response.")
-                    raise ValueError("Could not find JSON object markers in AI response.")
-                
-            except (json.JSONDecodeError, ValueError) as parse_error:
-                print(f"Warning: Failed to parse JSON from AI response ({parse_error}). Attempting fallback.")
-                # --- Fallback: Try Marker-Based Extraction ---
-                # Use a marker expected *after* the main instructions
-                marker = "**Your Response (JSON Object Only):**"
-                
-                if marker in raw_generated_text:
-                    # Get content *after* the final instruction marker
-                    parts = raw_generated_text.rsplit(marker, 1)
-                    if len(parts) > 1:
-                        potential_content = parts[1].strip()
-                        # Basic check if it looks like markdown start
-                        if potential_content.startswith("#"):
-                            revised_content = potential_content
-                            # Clean potential stray ``` markers from fallback too
-                            revised_content = revised_content.replace("```json\n", "").replace("\n```", "").replace("```", "")
-                            print("DEBUG: Fallback marker extraction successful.")
-                        else:
-                            print(f"DEBUG: Fallback marker found, but content doesn't look like expected markdown. Starts with: {potential_content[:50]}...")
-                    else:
-                        print("DEBUG: Fallback marker found, but split failed.")
-                else:
-                    print("DEBUG: Fallback marker also not found.")
-                    
-        except requests.exceptions.RequestException as api_error:
-            print(f"Error calling Hugging Face API: {api_error}")
-            # Log more details if possible (e.g., response content for 4xx/5xx errors)
-            if hasattr(api_error, 'response') and api_error.response is not None:
-                print(f"API Error Response Status: {api_error.response.status_code}")
-                print(f"API Error Response Body: {api_error.response.text[:500]}...")  # Log first 500 chars
-            # Keep revised_content as None to trigger mock data below
-            
-        except Exception as e:
-            # Catch other unexpected errors during API call/processing
-            print(f"Unexpected error during AI processing: {e}")
-            import traceback
-            traceback.print_exc()  # Log full traceback for server logs
-            # Keep revised_content as None
-            
-        # --- Final Check and Mock Data Fallback ---
-        if revised_content is None or not revised_content.strip():  # Check if it's None or empty/whitespace
-            print("ERROR: Failed to get valid content from AI after JSON and fallback attempts. Using existing content with feedback note.")
-            # Add the feedback as a note to the existing content
-            revised_content = current_version + f"\n\n# REVISION BASED ON FEEDBACK: \n{feedback}\n\n[Note: This is a placeholder as the AI service response could not be processed reliably.]"
-            message = "Resume revision failed to process AI response, using placeholder data with feedback note."
-        else:
-            message = "Resume revision processed successfully using AI response."
-            
-        # --- Additional cleaning to ensure proper formatting for PDF generation ---
-        # Remove any triple backticks that might interfere with markdown parsing
-        revised_content = revised_content.replace("```markdown", "").replace("```", "")
-        
-        # Ensure proper line breaks for markdown
-        revised_content = re.sub(r'\n{3,}', '\n\n', revised_content)  # Replace excessive newlines
-        
-        # Make sure all bullets are properly formatted for markdown-to-html conversion
-        revised_content = re.sub(r'(?<=\n)\s*\*\s+', '* ', revised_content)
-        
-        # --- Store the revised content in the database ---
-        try:
-            resume.rewritten_content = revised_content
-            resume.save(update_fields=['rewritten_content'])
-            print(f"DEBUG: Saved revised content (length: {len(revised_content)}) for resume {resume_id}")
-        except Exception as db_error:
-            print(f"ERROR: Failed to save revised content to database for resume {resume_id}: {db_error}")
+    def post(self, request, format=None):
+        job_type = request.data.get('job_type')
+        if job_type not in JOB_HANDLERS:
             return Response(
-                {'error': 'Failed to save the revised resume content.', 'details': str(db_error)},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                {'error': f"job_type must be one of: {', '.join(JOB_HANDLERS)}"},
+                status=status.HTTP_400_BAD_REQUEST
             )
-            
-        return Response({
-            'revised_content': revised_content,
-            'message': message  # Updated message reflects outcome
-        }, status=status.HTTP_200_OK)
-        
-    except Resume.DoesNotExist:
-        return Response(
-            {'error': 'Resume not found'},
-            status=status.HTTP_404_NOT_FOUND
-        )
-    except Exception as e:
-        # Catch-all for unexpected errors (e.g., database connection issues)
-        print(f"Fatal error in revise_resume view for resume {resume_id}: {e}")
-        import traceback
-        traceback.print_exc()  # Print full traceback for server logs
-        return Response(
-            {'error': 'An unexpected server error occurred.', 'details': str(e)},
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
 
+        params = {}
+        for name in REQUIRED_PARAMS[job_type]:
+            value = request.data.get(name)
+            if not value:
+                return Response({'error': f'{name} not provided'}, status=status.HTTP_400_BAD_REQUEST)
+            params[name] = value
+
+        if not Resume.objects.filter(id=params['resume_id']).exists():
+            return Response({'error': 'Resume not found'}, status=status.HTTP_404_NOT_FOUND)
 
+        job = submit_job(job_type, params, user=request.user if request.user.is_authenticated else None)
+        return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
 
 
-try:
-    from markdown import markdown
-except ImportError:
-    markdown = None
-    print("ERROR: 'markdown' library not found. pip install markdown")
+class JobStatusView(APIView):
+    permission_classes = [AllowAny]
 
-try:
-    from xhtml2pdf import pisa
-except ImportError:
-    pisa = None
-    print("ERROR: 'xhtml2pdf' library not found. pip install xhtml2pdf")
+    def get(self, request, job_id, format=None):
+        try:
+            job = Job.objects.get(id=job_id)
+        except Job.DoesNotExist:
+            return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(JobSerializer(job).data)
 
 
 @api_view(['POST'])
@@ -1215,8 +896,11 @@ def generate_pdf(request):
     """
     Endpoint to generate a PDF from markdown content using xhtml2pdf,
     with improved preprocessing of markdown content for better rendering.
+
+    Rendered files are cached by content hash, which is also sent as the
+    ETag; a request with a matching If-None-Match gets a 304.
     """
-    if not markdown or not pisa:
+    if not renderer_available():
         return Response(
             {'error': 'Required PDF generation libraries (markdown, xhtml2pdf) are missing on the server.'},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -1228,224 +912,68 @@ def generate_pdf(request):
 
     try:
         # 0. Preprocess markdown for better conversion
-        print("DEBUG: Starting markdown preprocessing")
-        
-        # Remove any lingering code block markers
-        content_md = content_md.replace("```markdown", "").replace("```json", "").replace("```", "")
-        
-        # Ensure proper line breaks
-        content_md = re.sub(r'\n{3,}', '\n\n', content_md)  # Replace excessive newlines
-        
-        # Ensure bullet points are properly formatted
-        content_md = re.sub(r'(?<=\n)\s*\*\s+', '* ', content_md)
-        
-        # Ensure headings have proper spacing
-        content_md = re.sub(r'(?<=\n)#{1,6}\s*', lambda m: m.group().strip() + ' ', content_md)
-        
-        # 1. Convert Markdown to HTML
-        print("DEBUG: Starting Markdown to HTML conversion.")
-        html_content = markdown(content_md, extensions=['fenced_code', 'tables', 'nl2br'])
-        print("DEBUG: Markdown to HTML conversion finished.")
-
-        # 2. Add CSS classes to enhance structure for PDF generation
-        print("DEBUG: Adding structure for PDF formatting")
-        # Add classes to job entries for better page breaks
-        html_content = re.sub(r'<h3>(.*?)</h3>', r'<h3 class="job-title">\1</h3>', html_content)
-        
-        # Wrap each job section in a div with a class
-        sections = re.findall(r'<h3 class="job-title">.*?(?=<h3 class="job-title">|<h2|$)', html_content, re.DOTALL)
-        for section in sections:
-            html_content = html_content.replace(section, f'<div class="job-entry">{section}</div>')
-        
-        # Same for education sections
-        html_content = re.sub(r'<h3>(.*?University.*?|.*?College.*?|.*?School.*?|.*?Institute.*?)</h3>', 
-                             r'<h3 class="education-title">\1</h3>', html_content)
-        
-        sections = re.findall(r'<h3 class="education-title">.*?(?=<h3|<h2|$)', html_content, re.DOTALL)
-        for section in sections:
-            html_content = html_content.replace(section, f'<div class="education-entry">{section}</div>')
-        
-        css_content = """
-        @page {
-            size: letter;
-            margin: 0.75in;
-        }
-
-        html {
-            font-variant-ligatures: common-ligatures;
-        }
-
-        body {
-            font-family: "Helvetica", "Arial", sans-serif;
-            font-size: 10pt;
-            line-height: 1.4;
-            color: #333;
-            /* Ensure content is allowed to flow without fixed constraints */
-            overflow: visible;
-        }
-
-        h1, h2, h3, h4, h5, h6 {
-            font-weight: bold;
-            color: #000;
-            margin-top: 1.2em;
-            margin-bottom: 0.6em;
-            /* Avoid forcing elements into the same page if possible */
-            page-break-after: avoid;
-            page-break-before: avoid;
-        }
-
-        h1 {
-            font-size: 18pt;
-            margin-top: 0;
-            text-align: center;
-        }
-
-        h2 {
-            font-size: 14pt;
-            border-bottom: 1px solid #eee;
-            padding-bottom: 3pt;
-        }
-
-        h3 {
-            font-size: 11pt;
-        }
-
-        p {
-            margin-top: 0;
-            margin-bottom: 0.8em;
-            text-align: left;
-            orphans: 3;
-            widows: 3;
-            /* Let paragraphs break naturally */
-            page-break-inside: avoid;
-        }
-
-        ul, ol {
-            padding-left: 20pt;
-            margin-top: 0.5em;
-            margin-bottom: 0.8em;
-        }
-
-        li {
-            margin-bottom: 0.4em;
-        }
-
-        .job-entry, .education-entry, .project-entry {
-            page-break-inside: avoid;
-            margin-bottom: 1.5em;
-        }
-
-        p.contact-info {
-            text-align: center;
-            font-size: 9pt;
-            margin-bottom: 1.5em;
-            color: #555;
-            border-bottom: 1px solid #ccc;
-            padding-bottom: 8pt;
-            page-break-after: avoid;
-        }
-
-        p.location-date {
-            font-size: 10pt;
-            font-style: italic;
-            color: #666;
-            margin-top: -0.4em;
-            margin-bottom: 0.6em;
-        }
-
-        strong, b {
-            font-weight: bold;
-        }
-
-        em, i {
-            font-style: italic;
-        }
-
-        table {
-            width: 100%;
-            border-collapse: collapse;
-            margin-bottom: 1em;
-        }
-
-        th, td {
-            border: 1px solid #ddd;
-            padding: 6pt;
-            text-align: left;
-        }
-
-        thead {
-            display: table-header-group;
-            font-weight: bold;
-            background-color: #f2f2f2;
-        }
-
-        tr {
-            page-break-inside: avoid;
-            page-break-after: auto;
-        }
-        """
-        
-        # Combine HTML and CSS
-        full_html = f"<!DOCTYPE html><html><head><meta charset=\"UTF-8\"><style>{css_content}</style></head><body>{html_content}</body></html>"
-
-        # --- SAVE INTERMEDIATE HTML FOR DEBUGGING ---
-        try:
-            # Save in a predictable location, maybe MEDIA_ROOT or a specific debug folder
-            # Ensure the target directory exists and has write permissions
-            debug_dir = os.path.join(settings.BASE_DIR, 'debug_output') # Or settings.MEDIA_ROOT
-            os.makedirs(debug_dir, exist_ok=True)
-            debug_html_path = os.path.join(debug_dir, "debug_resume_output.html")
-            with open(debug_html_path, "w", encoding="utf-8") as f:
-                f.write(full_html)
-            print(f"DEBUG: Saved intermediate HTML to {debug_html_path}")
-        except Exception as html_save_error:
-            print(f"Warning: Could not save debug HTML file: {html_save_error}")
-        # --- END OF SAVE HTML ---
-
-        # 3. Create PDF using pisa
-        print("DEBUG: Starting PDF generation with pisa.")
-        pdf_buffer = io.BytesIO()
-        pisa_status = pisa.CreatePDF(
-            src=io.BytesIO(full_html.encode('UTF-8')),
-            dest=pdf_buffer,
-            encoding='UTF-8'
-            # link_callback=link_callback # Uncomment if using local images/resources
-        )
-        print(f"DEBUG: pisa.CreatePDF finished. Success: {not pisa_status.err}")
-
-        # 4. Check for errors during PDF generation
-        if pisa_status.err:
-            print(f"xhtml2pdf Error Code: {pisa_status.err}") # Log the error code
-            # Attempt to get more detailed logging from pisa if available
-            error_details = f"PDF Generation Error Code: {pisa_status.err}"
-            detailed_log = pisa_status.log # Accessing the log attribute
-            if detailed_log:
-                 print("--- xhtml2pdf Log Messages ---")
-                 log_str = ""
-                 for msg_type, msg, line, col in detailed_log:
-                      log_line = f"Type: {msg_type}, Line: {line}, Col: {col}, Msg: {msg}"
-                      print(log_line)
-                      log_str += log_line + "\n"
-                 print("-----------------------------")
-                 error_details += "\nLog:\n" + log_str
-            else:
-                 print("No detailed log messages available from xhtml2pdf.")
-
-            # Also include the first part of the HTML that failed
-            error_details += f"\n\n--- Failing HTML (approx first 500 chars) ---\n{full_html[:500]}"
+        pdf_logger.debug("Starting markdown preprocessing")
+        content_md = preprocess_markdown(content_md)
+
+        # The same markdown always renders to the same bytes, so the content
+        # hash identifies the file without rendering it.
+        etag = quote_etag(pdf_cache.make_key(content_md))
+        if etag_matches(request.headers.get('If-None-Match', ''), etag):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+            response['ETag'] = etag
+            return response
+
+        key = etag.strip('"')
+        pdf_data = pdf_cache.get(key)
+        if pdf_data is not None:
+            pdf_logger.debug("Serving PDF from the render cache.")
+        else:
+            full_html = markdown_to_html(content_md)
+
+            # --- SAVE INTERMEDIATE HTML FOR DEBUGGING (full-payload debug mode only) ---
+            if getattr(settings, 'LOG_FULL_PAYLOADS', False):
+                try:
+                    # Save in a predictable location, maybe MEDIA_ROOT or a specific debug folder
+                    # Ensure the target directory exists and has write permissions
+                    debug_dir = os.path.join(settings.BASE_DIR, 'debug_output') # Or settings.MEDIA_ROOT
+                    os.makedirs(debug_dir, exist_ok=True)
+                    debug_html_path = os.path.join(debug_dir, "debug_resume_output.html")
+                    with open(debug_html_path, "w", encoding="utf-8") as f:
+                        f.write(full_html)
+                    pdf_logger.debug("Saved intermediate HTML to %s", debug_html_path)
+                except Exception as html_save_error:
+                    pdf_logger.warning("Could not save debug HTML file: %s", html_save_error)
+            # --- END OF SAVE HTML ---
+
+            # 3. Create PDF using pisa
+            try:
+                pdf_data = html_to_pdf(full_html)
+            except PDFRenderError as e:
+                return Response({'error': 'PDF generation failed', 'details': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-            return Response({'error': 'PDF generation failed', 'details': error_details}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            try:
+                pdf_cache.store(key, pdf_data)
+            except OSError as cache_error:
+                pdf_logger.warning("Could not store rendered PDF in the cache: %s", cache_error)
 
         # 5. Prepare and Return Successful Response
-        print("DEBUG: PDF generated successfully. Preparing response.")
-        pdf_buffer.seek(0)
-        response = HttpResponse(pdf_buffer, content_type='application/pdf')
+        pdf_logger.debug("PDF generated successfully. Preparing response.")
+        response = HttpResponse(pdf_data, content_type='application/pdf')
         response['Content-Disposition'] = 'attachment; filename="improved_resume.pdf"'
+        response['ETag'] = etag
+        # Let clients keep the file but revalidate it, which costs at most a 304.
+        response['Cache-Control'] = 'private, no-cache'
         return response
 
     except Exception as e:
         # Catch-all for other errors
-        print(f"Error in generate_pdf view: {e}")
-        import traceback
-        traceback.print_exc()
-        return Response({'error': 'An internal server error occurred during PDF generation.', 'details': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        pdf_logger.exception("Error in generate_pdf view: %s", e)
+        return Response({'error': 'An internal server error occurred during PDF generation.', 'details': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def etag_matches(if_none_match, etag):
+    """Weak comparison of an If-None-Match header against our ETag."""
+    candidates = parse_etags(if_none_match)
+    if '*' in candidates:
+        return True
+    return etag in (c[2:] if c.startswith('W/') else c for c in candidates)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -50,6 +51,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'resume_app.middleware.JSONGZipMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -146,9 +148,204 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # Refill rates of the per-user / per-IP token buckets of the LLM-bound
+    # endpoints (see resume_app/throttling.py).
+    'DEFAULT_THROTTLE_RATES': {
+        'inference_user': '30/min',
+        'inference_anon': '10/min',
+    },
 }
 
 
 # Add these settings
 CORS_ALLOW_ALL_ORIGINS = True  # For development only
-CORS_ALLOW_CREDENTIALS = True
\ No newline at end of file
+CORS_ALLOW_CREDENTIALS = True
+# Let the frontend read pagination cursors and cache validators.
+CORS_EXPOSE_HEADERS = ['X-Cursor-Before', 'X-Cursor-Since', 'X-Has-More', 'ETag', 'Retry-After']
+
+# JSON responses smaller than this are sent uncompressed.
+GZIP_MIN_BYTES = 1024
+
+# Rewrite history (revisions.py): a full snapshot is stored at least every
+# this many versions, bounding the deltas applied to rebuild any version.
+REVISION_SNAPSHOT_INTERVAL = 10
+
+# Chat history pages (ChatMessagesView): default and maximum page size.
+CHAT_PAGE_SIZE = 50
+CHAT_PAGE_SIZE_MAX = 200
+
+# Resume processing
+# Upper bound (in bytes of extracted text) of the per-process extraction cache.
+EXTRACTION_CACHE_MAX_BYTES = 32 * 1024 * 1024
+# `manage.py prune_caches` deletes stored extractions not written for
+# EXTRACTION_CACHE_MAX_AGE seconds, and analyses older than ANALYSIS_CACHE_TTL.
+EXTRACTION_CACHE_MAX_AGE = 30 * 24 * 60 * 60
+# Generated analyses are reused for identical text, prompt version and model
+# for ANALYSIS_CACHE_TTL seconds.
+ANALYSIS_CACHE_MAX_BYTES = 16 * 1024 * 1024
+ANALYSIS_CACHE_TTL = 7 * 24 * 60 * 60
+
+# Uploads are first scored by the local resume classifier (resume_app/classifier.py);
+# scores at or above RESUME_CLASSIFIER_ACCEPT / at or below RESUME_CLASSIFIER_REJECT
+# are decided locally, everything in between goes to the remote zero-shot model.
+RESUME_CLASSIFIER_LOCAL = True
+RESUME_CLASSIFIER_ACCEPT = 0.95
+RESUME_CLASSIFIER_REJECT = 0.05
+
+# Rendered resume PDFs are cached on disk by content hash (also used as ETag),
+# evicting least recently used files beyond PDF_CACHE_MAX_BYTES. They live
+# outside the source tree; point PDF_CACHE_DIR at a persistent volume to keep
+# them across reboots.
+PDF_CACHE_DIR = Path(tempfile.gettempdir()) / 'aires_pdf_cache'
+PDF_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# PDF text extraction: uploads with more pages than PDF_MAX_PAGES are rejected,
+# documents with at least PDF_PARALLEL_MIN_PAGES pages are split across
+# PDF_EXTRACTION_WORKERS processes (defaults to min(4, cpu count)), and the
+# whole extraction must finish within PDF_EXTRACTION_TIME_BUDGET seconds.
+PDF_MAX_PAGES = 50
+PDF_PARALLEL_MIN_PAGES = 8
+PDF_EXTRACTION_WORKERS = None
+PDF_EXTRACTION_TIME_BUDGET = 20
+# Single uploads (upload_resume, validate_resume) larger than this are refused
+# while they stream in; see resume_app/uploads.py.
+UPLOAD_MAX_BYTES = 10 * 1024 * 1024
+
+# Bulk upload (bulk.py): batch limits, how many documents are classified at
+# once, and how many accepted resumes are inserted per bulk_create.
+BULK_UPLOAD_MAX_FILES = 1000
+BULK_UPLOAD_MAX_FILE_BYTES = 10 * 1024 * 1024
+BULK_UPLOAD_MAX_BYTES = 256 * 1024 * 1024
+BULK_CLASSIFY_CONCURRENCY = 8
+BULK_CREATE_BATCH_SIZE = 50
+# Django rejects multipart bodies with more files than this (default 100).
+DATA_UPLOAD_MAX_NUMBER_FILES = BULK_UPLOAD_MAX_FILES
+
+# Job-description ranking (ranking.py): BM25 parameters, and the default and
+# maximum number of resumes returned by RankResumesView.
+RANKING_BM25_K1 = 1.2
+RANKING_BM25_B = 0.75
+RANKING_TOP_K = 20
+RANKING_TOP_K_MAX = 200
+
+# Full-text resume search (search.py). 'auto' searches a GIN-indexed tsvector
+# column on PostgreSQL and the in-process index of ranking.py elsewhere;
+# 'postgres' or 'index' force one. Changing SEARCH_CONFIG needs the stored
+# tsvectors rebuilt.
+SEARCH_BACKEND = 'auto'
+SEARCH_CONFIG = 'english'
+SEARCH_PAGE_SIZE = 20
+SEARCH_PAGE_SIZE_MAX = 100
+SEARCH_HIGHLIGHT_FRAGMENTS = 3
+
+# Background job queue for analyze / rewrite / revise (see resume_app/jobs.py).
+# With JOB_WORKERS_IN_PROCESS the web process runs JOB_WORKER_CONCURRENCY worker
+# threads; set it to False when running `manage.py run_job_workers` instead.
+JOB_WORKER_CONCURRENCY = 4
+JOB_WORKERS_IN_PROCESS = True
+JOB_POLL_INTERVAL = 1.0
+# Running jobs whose worker has not sent a heartbeat (every third of this) for
+# this many seconds are assumed orphaned and re-queued.
+JOB_STALE_AFTER = 300
+
+# Single-flight coalescing of duplicate analyze / rewrite / revise requests
+# (see resume_app/coalescing.py). A duplicate waits for the running request's
+# result, polling at most every COALESCE_POLL_INTERVAL seconds; a lease older
+# than COALESCE_LEASE seconds is presumed dead and taken over. Results are
+# also served to repeats for COALESCE_RESULT_TTL seconds after they finish.
+COALESCE_REQUESTS = True
+COALESCE_LEASE = 300
+COALESCE_RESULT_TTL = 5
+COALESCE_POLL_INTERVAL = 0.5
+
+# Admission control of the LLM-bound endpoints (see resume_app/throttling.py).
+# Each process runs at most INFERENCE_MAX_CONCURRENT of them at once; up to
+# INFERENCE_QUEUE_SIZE more wait for a slot, for at most INFERENCE_QUEUE_TIMEOUT
+# seconds, and the rest get 429 at once. INFERENCE_BURST is how many requests
+# a client's token bucket holds, per DEFAULT_THROTTLE_RATES scope.
+INFERENCE_MAX_CONCURRENT = 8
+INFERENCE_QUEUE_SIZE = 16
+INFERENCE_QUEUE_TIMEOUT = 10
+# The same for the ASGI views (resume_app/async_views.py). They hold no thread
+# while waiting on the model, so their limit follows HF_ASYNC_MAX_CONNECTIONS.
+ASYNC_INFERENCE_MAX_CONCURRENT = 200
+ASYNC_INFERENCE_QUEUE_SIZE = 400
+ASYNC_INFERENCE_QUEUE_TIMEOUT = 10
+INFERENCE_BURST = {
+    'inference_user': 10,
+    'inference_anon': 5,
+}
+
+# Hugging Face inference client (see resume_app/inference.py). Point
+# HF_INFERENCE_BASE_URL at a local stand-in server to run without the real API.
+HF_INFERENCE_BASE_URL = "https://api-inference.huggingface.co/models"
+HF_POOL_SIZE = 20
+# Connection limit of the async client used by the ASGI views (resume_app/async_views.py).
+HF_ASYNC_MAX_CONNECTIONS = 200
+HF_MAX_RETRIES = 3
+HF_BACKOFF_BASE = 0.5
+HF_BACKOFF_MAX = 8
+# Read timeouts (seconds) per endpoint: classify, analyze, chat, rewrite, revise.
+HF_TIMEOUTS = {
+    'classify': 15,
+    'analyze': 60,
+    'chat': 30,
+    'rewrite': 45,
+    'revise': 45,
+}
+HF_CIRCUIT_FAILURE_THRESHOLD = 5
+HF_CIRCUIT_RESET_TIMEOUT = 30
+
+# Prompt templates and their token budgets live in resume_app/prompts.md (see
+# resume_app/prompts.py). A template's budget plus its reply length must fit
+# LLM_CONTEXT_TOKENS, the context of MISTRAL_MODEL. Set PROMPT_TOKENIZER_FILE to
+# the model's tokenizer.json (with the `tokenizers` package installed) for exact
+# token counts instead of a conservative estimate.
+LLM_CONTEXT_TOKENS = 32768
+PROMPT_TOKENIZER_FILE = None
+
+# Logging (see resume_app/log.py). Records are written by a background thread;
+# string arguments longer than LOG_PAYLOAD_MAX_CHARS are truncated and only
+# LOG_DEBUG_SAMPLE_RATE of DEBUG records are kept. Levels are set per category.
+# LOG_FULL_PAYLOADS is an opt-in debug mode that logs complete resume texts and
+# model output without truncation or sampling; keep it off in production.
+LOG_FULL_PAYLOADS = False
+LOG_PAYLOAD_MAX_CHARS = 500
+LOG_DEBUG_SAMPLE_RATE = 0.05
+LOG_LEVELS = {
+    'resume_app': 'INFO',
+    'resume_app.llm': 'INFO',
+    'resume_app.pdf': 'WARNING',
+    'resume_app.auth': 'INFO',
+    'resume_app.payloads': 'DEBUG' if LOG_FULL_PAYLOADS else 'WARNING',
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'truncate': {
+            '()': 'resume_app.log.TruncateFilter',
+            'max_chars': None if LOG_FULL_PAYLOADS else LOG_PAYLOAD_MAX_CHARS,
+        },
+        'sample_debug': {
+            '()': 'resume_app.log.SampleFilter',
+            'rate': 1.0 if LOG_FULL_PAYLOADS else LOG_DEBUG_SAMPLE_RATE,
+        },
+    },
+    'formatters': {
+        'standard': {'format': '%(asctime)s %(levelname)s %(name)s: %(message)s'},
+    },
+    'handlers': {
+        'queue': {
+            '()': 'resume_app.log.QueueingHandler',
+            'formatter': 'standard',
+            'filters': ['sample_debug', 'truncate'],
+        },
+    },
+    'root': {'handlers': ['queue'], 'level': 'WARNING'},
+    'loggers': {
+        'django': {'handlers': ['queue'], 'level': 'INFO', 'propagate': False},
+        **{name: {'level': level} for name, level in LOG_LEVELS.items()},
+    },
+}
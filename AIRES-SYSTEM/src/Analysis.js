@@ -21,7 +21,7 @@ function Analysis({ resumeId }) {
     setLoading(true);
     try {
       const response = await axios.post(
-        'http://localhost:8000/api/analyze_resume/',
+        'http://localhost:8000/api/analyze_resume/?fields=id,analysis',
         { resume_id: resumeId }
       );
       const analysisText = response.data.analysis;
@@ -61,15 +61,22 @@ function Analysis({ resumeId }) {
   }, [token, fetchConversations]);
   
 
-  // Load conversation messages for a given resume (from chat-messages endpoint)
+  // Load conversation messages for a given resume (from chat-messages endpoint).
+  // The endpoint returns the newest page; older pages are fetched with the
+  // X-Cursor-Before cursor until the whole history is loaded.
   const loadConversation = async (selectedResumeId) => {
     try {
-      const response = await axios.get('http://localhost:8000/api/chat-messages/', {
-        params: { resume_id: selectedResumeId },
-        headers: token ? { Authorization: `Token ${token}` } : {}
-      });
-      // Assuming the response data is an array of messages
-      setMessages(response.data);
+      let history = [];
+      let before = null;
+      do {
+        const response = await axios.get('http://localhost:8000/api/chat-messages/', {
+          params: before ? { resume_id: selectedResumeId, before } : { resume_id: selectedResumeId },
+          headers: token ? { Authorization: `Token ${token}` } : {}
+        });
+        history = [...response.data, ...history];
+        before = response.headers['x-cursor-before'];
+      } while (before);
+      setMessages(history);
       // Optionally, set resumeId to the selected one (if needed)
     } catch (error) {
       console.error("Failed to load conversation:", error);
@@ -13,6 +13,7 @@ function ResumeRewrite({ resumeId, originalContent }) {
   const { toast } = useToast();
   const [loading, setLoading] = useState(false);
   const [rewrittenResume, setRewrittenResume] = useState(null);
+  const [version, setVersion] = useState(null);
   const [previewMode, setPreviewMode] = useState('side-by-side');
   const [feedback, setFeedback] = useState('');
   const [error, setError] = useState(null);
@@ -29,6 +30,7 @@ function ResumeRewrite({ resumeId, originalContent }) {
       );
       
       setRewrittenResume(response.data.rewritten_content);
+      setVersion(response.data.version);
       toast({
         title: "Resume rewritten successfully",
         description: "Your resume has been enhanced with AI",
@@ -66,12 +68,13 @@ function ResumeRewrite({ resumeId, originalContent }) {
         { 
           resume_id: resumeId,
           feedback: feedback,
-          current_version: rewrittenResume
+          version: version
         }
       );
       
       // Handle the response the same way as rewrite_resume
       setRewrittenResume(response.data.revised_content);
+      setVersion(response.data.version);
       setFeedback('');
       toast({
         title: "Resume revised successfully",
@@ -69,7 +69,7 @@ function ResumeUpload({ onUploadSuccess = (data) => console.log('Upload success:
     formData.append('file', selectedFile);
 
     try {
-      const response = await axios.post('http://localhost:8000/api/upload_resume/', formData, {
+      const response = await axios.post('http://localhost:8000/api/upload_resume/?fields=id', formData, {
         headers: { 'Content-Type': 'multipart/form-data' }
       });
       console.log('Server response:', response.data);